@@ -0,0 +1,16 @@
+"""Timing helper shared by the benchmarks."""
+import time
+
+import cupy as cp
+
+
+def time_per_call(func, repeat=3):
+    """Mean wall time of `repeat` calls of `func`, in seconds, after a
+    warm-up call, including the completion of all queued device work."""
+    func()  # warm up kernel compilation and caches
+    cp.cuda.Device().synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    cp.cuda.Device().synchronize()
+    return (time.perf_counter() - start) / repeat
@@ -0,0 +1,50 @@
+"""Gradient and curvature anisotropic diffusion: cuCIM versus ITK's CPU
+filters, and the per-iteration cost of the device loop.
+
+Run with ``python benchmarks/bench_anisotropic_diffusion.py``.
+"""
+import cupy as cp
+import itk
+import numpy as np
+
+from itk_cucim.filtering import anisotropic_smoothing
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    shape = (128, 192, 192)
+    array = rng.normal(100, 20, shape).astype(np.float32)
+    cu_array = cp.asarray(array)
+    image = itk.image_from_array(array)
+    for name, curvature in [('gradient', False), ('curvature', True)]:
+        itk_filter = getattr(itk, f'{name}_anisotropic_diffusion_image_filter')
+        cucim_filter = getattr(
+            anisotropic_smoothing,
+            f'cucim_{name}_anisotropic_diffusion_image_filter',
+        )
+        for number_of_iterations in [1, 5, 20]:
+            kwargs = dict(
+                time_step=0.05, number_of_iterations=number_of_iterations
+            )
+            t_device = time_per_call(
+                lambda: anisotropic_smoothing._anisotropic_diffusion(
+                    cu_array, (1.0, 1.0, 1.0), curvature, **kwargs
+                )
+            )
+            t_wrapper = time_per_call(lambda: cucim_filter(image, **kwargs))
+            t_itk = time_per_call(
+                lambda: itk_filter(image, **kwargs), repeat=1
+            )
+            print(
+                f"{name:9s} iterations {number_of_iterations:3d}  "
+                f"itk: {1e3 * t_itk:9.1f} ms  "
+                f"cucim: {1e3 * t_wrapper:8.1f} ms  "
+                f"device: {1e3 * t_device:7.2f} ms "
+                f"({1e3 * t_device / number_of_iterations:6.2f} ms/iteration)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Per-call overhead of the array fast path versus the ITK path.
+
+Run with ``python benchmarks/bench_array_path.py``.
+"""
+import cupy as cp
+import itk
+import numpy as np
+
+from itk_cucim.filtering import smoothing
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for shape in [(16, 16), (64, 64), (32, 32, 32), (128, 128, 64)]:
+        array = rng.standard_normal(shape, dtype=np.float32)
+        image = itk.image_from_array(array)
+        cu_array = cp.asarray(array)
+        kwargs = dict(variance=2.0)
+        f = smoothing.cucim_discrete_gaussian_image_filter
+        t_itk = time_per_call(lambda: f(image, **kwargs), repeat=200)
+        t_numpy = time_per_call(lambda: f(array, **kwargs), repeat=200)
+        t_cupy = time_per_call(lambda: f(cu_array, **kwargs), repeat=200)
+        print(
+            f"{str(shape):>16}  itk.Image: {1e6 * t_itk:9.1f} us  "
+            f"numpy: {1e6 * t_numpy:9.1f} us  cupy: {1e6 * t_cupy:9.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
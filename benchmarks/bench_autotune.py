@@ -0,0 +1,70 @@
+"""Autotuned strategies: the cost of the first (tuning) call, the
+per-strategy timings and the dispatched calls that follow.
+
+Run with ``python benchmarks/bench_autotune.py``. Tuning, including the
+FFT strategies, is enabled for the run, and a temporary tuning cache is
+used, so the cache in the home directory is left untouched.
+"""
+import os
+import tempfile
+import time
+
+import cupy as cp
+import numpy as np
+
+from itk_cucim.filtering import autotune, image_feature, smoothing
+
+from _timing import time_per_call
+
+
+def _time_once(func):
+    cp.cuda.Device().synchronize()
+    start = time.perf_counter()
+    func()
+    cp.cuda.Device().synchronize()
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    cases = [
+        ('median uint8 r=2', smoothing.cucim_median_image_filter,
+         rng.integers(0, 256, (128, 256, 256), dtype=np.uint8),
+         dict(radius=2)),
+        ('median float32 r=1', smoothing.cucim_median_image_filter,
+         rng.normal(100, 20, (128, 256, 256)).astype(np.float32),
+         dict(radius=1)),
+        ('gaussian derivative var=4',
+         image_feature.cucim_discrete_gaussian_derivative_image_filter,
+         rng.normal(100, 20, (128, 256, 256)).astype(np.float32),
+         dict(variance=4.0, order=[1, 0, 0])),
+        ('gaussian derivative var=100',
+         image_feature.cucim_discrete_gaussian_derivative_image_filter,
+         rng.normal(100, 20, (128, 256, 256)).astype(np.float32),
+         dict(variance=100.0, order=[1, 0, 0], maximum_kernel_width=64)),
+    ]
+    os.environ['ITK_CUCIM_AUTOTUNE'] = '1'
+    os.environ['ITK_CUCIM_AUTOTUNE_FFT'] = '1'
+    with tempfile.TemporaryDirectory() as directory:
+        tuning_cache = autotune.TuningCache(directory)
+        autotune.set_tuning_cache(tuning_cache)
+        for name, cucim_filter, array, kwargs in cases:
+            cu_array = cp.asarray(array)
+            t_tuning = _time_once(lambda: cucim_filter(cu_array, **kwargs))
+            t_tuned = time_per_call(lambda: cucim_filter(cu_array, **kwargs))
+            print(
+                f"{name:28s} first call: {1e3 * t_tuning:8.1f} ms  "
+                f"tuned: {1e3 * t_tuned:7.2f} ms"
+            )
+        for operation, entries in tuning_cache.entries().items():
+            for key, entry in entries.items():
+                timings = '  '.join(
+                    f"{s}: " + ('n/a' if t is None else f"{1e3 * t:.2f} ms")
+                    for s, t in entry['timings'].items()
+                )
+                print(f"  {operation} {key} -> {entry['choice']}  ({timings})")
+        autotune.set_tuning_cache(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Binary dilation with ball kernels: distance transform thresholding versus
+the footprint method and ITK's CPU filter.
+
+Run with ``python benchmarks/bench_binary_morphology.py``.
+"""
+import cupy as cp
+import itk
+import numpy as np
+
+from itk_cucim.filtering import binary_mathematical_morphology as morphology
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    shape = (192, 192, 192)
+    mask = cp.asarray(rng.random(shape) > 0.9995)
+    array = (cp.asnumpy(mask) * 255).astype(np.uint8)
+    image = itk.image_from_array(array)
+    for radius in [2, 5, 10, 20]:
+        kernel = itk.FlatStructuringElement[3].Ball((radius, ) * 3)
+        footprint = cp.asarray(morphology._kernel_footprint(kernel))
+        ball_radius = (radius, ) * 3
+        t_footprint = time_per_call(
+            lambda: morphology._dilate(mask, footprint, None)
+        )
+        t_distance = time_per_call(
+            lambda: morphology._dilate(mask, footprint, ball_radius)
+        )
+        t_itk = time_per_call(
+            lambda: itk.binary_dilate_image_filter(image, kernel=kernel),
+            repeat=1,
+        )
+        print(
+            f"radius {radius:3d}  itk: {1e3 * t_itk:9.1f} ms  "
+            f"footprint: {1e3 * t_footprint:9.1f} ms  "
+            f"distance transform: {1e3 * t_distance:9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Danielsson distance map on the GPU versus ITK's CPU filter.
+
+Run with ``python benchmarks/bench_danielsson_distance_map.py``.
+"""
+import itk
+import numpy as np
+
+from itk_cucim.filtering import distance_map
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for shape in [(512, 512), (2048, 2048), (64, 64, 64), (192, 192, 192)]:
+        array = (rng.random(shape) > 0.999).astype(np.uint8)
+        array *= rng.integers(1, 256, shape, dtype=np.uint8)
+        image = itk.image_from_array(array)
+        output_type = itk.Image[itk.F, len(shape)]
+
+        def itk_danielsson():
+            ref_filt = itk.DanielssonDistanceMapImageFilter[
+                type(image), output_type
+            ].New(image)
+            ref_filt.Update()
+
+        def cucim_danielsson():
+            distance_map.cucim_danielsson_distance_map_image_filter(image)
+
+        t_itk = time_per_call(itk_danielsson, repeat=1)
+        t_cucim = time_per_call(cucim_danielsson, repeat=5)
+        print(
+            f"{str(shape):>16}  itk: {1e3 * t_itk:9.1f} ms  "
+            f"cucim: {1e3 * t_cucim:9.1f} ms  "
+            f"speedup: {t_itk / t_cucim:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Steady-state per-call time of filter objects versus the functions.
+
+Run with ``python benchmarks/bench_image_filter_objects.py``.
+"""
+import itk
+import numpy as np
+
+from itk_cucim.filtering import smoothing
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for shape in [(32, 32, 32), (64, 64, 64), (128, 128, 128)]:
+        array = rng.standard_normal(shape, dtype=np.float32)
+        image = itk.image_from_array(array)
+        smoother = smoothing.CucimDiscreteGaussianImageFilter.New(variance=2)
+        median = smoothing.CucimMedianImageFilter.New(radius=1)
+        timings = [
+            ("gaussian function",
+             lambda: smoothing.cucim_discrete_gaussian_image_filter(
+                 image, variance=2)),
+            ("gaussian object", lambda: smoother(image)),
+            ("median function",
+             lambda: smoothing.cucim_median_image_filter(image, radius=1)),
+            ("median object", lambda: median(image)),
+        ]
+        for name, func in timings:
+            t = time_per_call(func, repeat=100)
+            print(f"{str(shape):>16}  {name:>18}: {1e3 * t:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
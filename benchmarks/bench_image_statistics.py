@@ -0,0 +1,73 @@
+"""Image statistics and Otsu thresholding on the GPU versus ITK's CPU
+filters.
+
+Each volume is the head MR test image, tiled to larger sizes, in its
+uint8 pixel type and as int16 and float32. Both sides start from an
+``itk.Image`` in host memory.
+
+Run with ``python benchmarks/bench_image_statistics.py``.
+"""
+from pathlib import Path
+
+import itk
+import numpy as np
+
+from itk_cucim.filtering import image_statistics, thresholding
+
+from _timing import time_per_call
+
+_HEAD_MR = (
+    Path(__file__).absolute().parent.parent / "test" / "input" / "head_mr.mha"
+)
+
+
+def _itk_update(filter_type, image, **kwargs):
+    def update():
+        filter_type.New(image, **kwargs).Update()
+    return update
+
+
+def main():
+    head = itk.array_from_image(itk.imread(_HEAD_MR))
+    for tiles in [(1, 1, 1), (2, 2, 2), (4, 4, 4)]:
+        tiled = np.tile(head, tiles)
+        labels = (tiled > 40).astype(np.uint8)
+        labels += tiled > 120
+        label_image = itk.image_from_array(labels)
+        for dtype in [np.uint8, np.int16, np.float32]:
+            image = itk.image_from_array(tiled.astype(dtype))
+            label_statistics = itk.LabelStatisticsImageFilter[
+                type(image), type(label_image)
+            ]
+            cases = [
+                ('minimum_maximum',
+                 _itk_update(itk.MinimumMaximumImageFilter, image),
+                 lambda: image_statistics.cucim_minimum_maximum_image_filter(
+                     image)),
+                ('statistics',
+                 _itk_update(itk.StatisticsImageFilter, image),
+                 lambda: image_statistics.cucim_statistics_image_filter(
+                     image)),
+                ('label_statistics',
+                 _itk_update(label_statistics, image,
+                             label_input=label_image, use_histograms=True),
+                 lambda: image_statistics.cucim_label_statistics_image_filter(  # noqa
+                     image, label_input=label_image, use_histograms=True)),
+                ('otsu_threshold',
+                 _itk_update(itk.OtsuThresholdImageFilter, image),
+                 lambda: thresholding.cucim_otsu_threshold_image_filter(
+                     image)),
+            ]
+            for name, itk_func, cucim_func in cases:
+                t_itk = time_per_call(itk_func, repeat=1)
+                t_cucim = time_per_call(cucim_func)
+                print(
+                    f"{str(tiled.shape):>16} {np.dtype(dtype).name:>8} "
+                    f"{name:>17}  itk: {1e3 * t_itk:8.1f} ms  "
+                    f"cucim: {1e3 * t_cucim:8.1f} ms  "
+                    f"speedup: {t_itk / t_cucim:6.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Resampling: cuCIM versus ITK's CPU filter, for the strided, separable
+and general affine paths.
+
+Run with ``python benchmarks/bench_resample.py``.
+"""
+import itk
+import numpy as np
+
+from itk_cucim.filtering import image_grid
+
+from _timing import time_per_call
+
+
+def _cases(image):
+    size = list(itk.size(image))
+    spacing = list(image.GetSpacing())
+    scale = itk.ScaleTransform[itk.D, 3].New()
+    scale.SetScale([1.3, 0.7, 1.1])
+    euler = itk.Euler3DTransform[itk.D].New()
+    euler.SetRotation(0.1, -0.2, 0.3)
+    euler.SetCenter([s * n / 2 for s, n in zip(spacing, size)])
+    return [
+        ('strided x2', dict(
+            size=[n // 2 for n in size],
+            output_spacing=[2 * s for s in spacing],
+        )),
+        ('separable', dict(transform=scale, size=size)),
+        ('affine', dict(transform=euler, size=size)),
+    ]
+
+
+def main():
+    rng = np.random.default_rng(0)
+    shape = (160, 256, 256)
+    array = rng.normal(100, 20, shape).astype(np.float32)
+    image = itk.image_from_array(array)
+    for name, kwargs in _cases(image):
+        t_itk = time_per_call(
+            lambda: itk.resample_image_filter(image, **kwargs), repeat=1
+        )
+        t_cucim = time_per_call(
+            lambda: image_grid.cucim_resample_image_filter(image, **kwargs)
+        )
+        t_array = time_per_call(
+            lambda: image_grid.cucim_resample_image_filter(array, **kwargs)
+        )
+        print(
+            f"{name:12s} itk: {1e3 * t_itk:9.1f} ms  "
+            f"cucim: {1e3 * t_cucim:8.1f} ms  "
+            f"array path: {1e3 * t_array:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Steady-state loops over same-shaped images, with the scratch buffer
+pool and with a zero memory cap, under which every buffer is allocated
+from CuPy's memory pool.
+
+Run with ``python benchmarks/bench_scratch_pool.py``.
+"""
+import itk
+import numpy as np
+
+from itk_cucim.filtering import distance_map, image_grid, scratch, smoothing
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    shape = (128, 256, 256)
+    image = itk.image_from_array(
+        rng.normal(100, 20, shape).astype(np.float32)
+    )
+    binary = itk.image_from_array(
+        (rng.random(shape) > 0.5).astype(np.uint8)
+    )
+    cases = [
+        ('discrete gaussian', lambda: smoothing.cucim_discrete_gaussian_image_filter(  # noqa
+            image, variance=4.0)),
+        ('resample x0.5', lambda: image_grid.cucim_resample_image_filter(
+            image, size=[128, 128, 64], output_spacing=[2.0, 2.0, 2.0])),
+        ('signed maurer', lambda: distance_map.cucim_signed_maurer_distance_map_image_filter(  # noqa
+            binary)),
+    ]
+    for name, func in cases:
+        pool = scratch.ScratchPool()
+        scratch.set_scratch_pool(pool)
+        t_pool = time_per_call(func, repeat=5)
+        stats = pool.statistics()
+        scratch.set_scratch_pool(scratch.ScratchPool(max_bytes=0))
+        t_no_pool = time_per_call(func, repeat=5)
+        print(
+            f"{name:18s} pool: {1e3 * t_pool:7.1f} ms  "
+            f"no pool: {1e3 * t_no_pool:7.1f} ms  "
+            f"reuse rate: {stats.reuse_rate:.2f}  "
+            f"peak: {stats.peak_nbytes / 2**20:.0f} MiB"
+        )
+    scratch.set_scratch_pool(None)
+
+
+if __name__ == "__main__":
+    main()
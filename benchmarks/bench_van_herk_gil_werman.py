@@ -0,0 +1,51 @@
+"""Grayscale erosion with box kernels: van Herk/Gil-Werman versus the
+footprint method and ITK's CPU filter.
+
+Run with ``python benchmarks/bench_van_herk_gil_werman.py``.
+"""
+import cupy as cp
+import cupyx.scipy.ndimage as ndi
+import itk
+import numpy as np
+
+from itk_cucim.filtering import mathematical_morphology
+from itk_cucim.filtering._van_herk_gil_werman import minimum_filter
+
+from _timing import time_per_call
+
+
+def main():
+    rng = np.random.default_rng(0)
+    shape = (192, 192, 192)
+    array = rng.integers(0, 256, shape, dtype=np.uint8)
+    cu_array = cp.asarray(array)
+    image = itk.image_from_array(array)
+    for radius in [1, 3, 7, 15]:
+        size = 2 * radius + 1
+        kernel = itk.FlatStructuringElement[3].Box((radius, ) * 3)
+        t_van_herk = time_per_call(
+            lambda: minimum_filter(cu_array, (radius, ) * 3)
+        )
+        footprint = cp.ones((size, ) * 3, dtype=bool)
+        t_footprint = time_per_call(
+            lambda: ndi.minimum_filter(cu_array, footprint=footprint)
+        )
+        t_wrapper = time_per_call(
+            lambda: mathematical_morphology.cucim_grayscale_erode_image_filter(
+                image, kernel=kernel
+            )
+        )
+        t_itk = time_per_call(
+            lambda: itk.grayscale_erode_image_filter(image, kernel=kernel),
+            repeat=1,
+        )
+        print(
+            f"radius {radius:3d}  itk: {1e3 * t_itk:9.1f} ms  "
+            f"cucim: {1e3 * t_wrapper:9.1f} ms  "
+            f"van Herk/Gil-Werman: {1e3 * t_van_herk:7.2f} ms  "
+            f"footprint: {1e3 * t_footprint:9.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
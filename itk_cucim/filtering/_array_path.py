@@ -0,0 +1,235 @@
+"""Array-in/array-out dispatch that bypasses ITK objects."""
+import functools
+import inspect
+import sys
+
+import cupy as cp
+import itk
+import numpy as np
+from itk.support import helpers
+
+
+def _container_type(image):
+    """Name of the array container of `image`, or None for other inputs."""
+    if isinstance(image, itk.Object):
+        return None
+    if isinstance(image, cp.ndarray):
+        return 'cupy'
+    # Only check for PyTorch and xarray if they were already imported by the
+    # caller; an input cannot be of a type from a module that was not loaded.
+    torch = sys.modules.get('torch')
+    if torch is not None and isinstance(image, torch.Tensor):
+        return 'torch'
+    xr = sys.modules.get('xarray')
+    if xr is not None and isinstance(image, xr.DataArray):
+        return 'xarray'
+    if helpers.is_arraylike(image):
+        return 'numpy'
+    return None
+
+
+def _xarray_spatial_dims(data_array):
+    """The dims of `data_array` if they are in ITK's scalar image order."""
+    ordered_dims = ('t', 'z', 'y', 'x')[-data_array.ndim:]
+    if data_array.ndim > 4 or tuple(data_array.dims) != ordered_dims:
+        return None
+    return ordered_dims
+
+
+def _to_array(image, container):
+    """View `image` as a NumPy or CuPy array without copying.
+
+    Returns
+    -------
+    array : numpy.ndarray or cupy.ndarray or None
+        None if `image` cannot be handled by the array path.
+    spacing : tuple of float or None
+        Spacing in array axis order, if stored with `image`.
+    """
+    if container == 'cupy':
+        return image, None
+    if container == 'numpy':
+        return np.asarray(image), None
+    if container == 'torch':
+        # As in itk.support.helpers, a leading dimension of size > 1 denotes
+        # the components of a vector image.
+        if image.ndim == 0 or image.shape[0] > 1:
+            return None, None
+        image = image.detach()
+        if image.is_cuda:
+            return cp.from_dlpack(image), None
+        return image.numpy(), None
+    if container == 'xarray':
+        dims = _xarray_spatial_dims(image)
+        if dims is None:
+            return None, None
+        spacing = []
+        for dim in dims:
+            coords = image.coords[dim] if dim in image.coords else None
+            if coords is not None and coords.shape[0] > 1:
+                spacing.append(float(coords[1]) - float(coords[0]))
+            else:
+                spacing.append(1.0)
+        data = image.data
+        if not isinstance(data, cp.ndarray):
+            data = np.asarray(data)
+        return data, tuple(spacing)
+    return None, None
+
+
+def _from_array(result, image, container, grid=None):
+    """Wrap `result` in the same container type as the input `image`.
+
+    `grid` gives, per axis, the ``(start, step)`` of the output samples in
+    input index units when the output is not on the input's sampling grid.
+    A tuple of results is wrapped element-wise. A result with one more
+    dimension than the input is a vector image with the components along
+    the last axis. Results that are not arrays, e.g. the named tuples of
+    the statistics filters, are returned as is.
+    """
+    if not isinstance(result, (tuple, np.ndarray, cp.ndarray)) or hasattr(
+        result, '_fields'
+    ):
+        return result
+    if isinstance(result, tuple):
+        return tuple(_from_array(r, image, container, grid) for r in result)
+    if container == 'cupy':
+        return cp.asarray(result)
+    if container == 'numpy':
+        return cp.asnumpy(result)
+    if container == 'torch':
+        import torch
+        if image.is_cuda:
+            return torch.from_dlpack(cp.asarray(result))
+        return torch.from_numpy(cp.asnumpy(result))
+    # xarray
+    import xarray as xr
+    if not isinstance(image.data, cp.ndarray):
+        result = cp.asnumpy(result)
+    dims = tuple(image.dims)
+    if result.ndim == len(dims) + 1:
+        dims = dims + ('c', )
+    coords = {}
+    for ax, dim in enumerate(image.dims):
+        if dim not in image.coords:
+            continue
+        dim_coords = np.asarray(image.coords[dim], dtype=np.float64)
+        if grid is not None:
+            start, step = grid[ax]
+            if dim_coords.shape[0] > 1:
+                origin = dim_coords[0]
+                spacing = dim_coords[1] - dim_coords[0]
+            else:
+                origin, spacing = dim_coords[0], 1.0
+            index = start + step * np.arange(result.shape[ax])
+            dim_coords = origin + index * spacing
+        coords[dim] = dim_coords
+    return xr.DataArray(
+        result, name=image.name, dims=dims, coords=coords,
+        attrs=image.attrs,
+    )
+
+
+def accept_array_like_fast_path(array_filter, output_grid=None):
+    """Decorator dispatching array inputs directly to an array filter.
+
+    The decorated function is the ITK implementation of a filter, typically
+    already decorated with ``helpers.accept_array_like_xarray_torch``. When
+    the first positional argument is a NumPy array-like, CuPy array,
+    ``torch.Tensor`` or ``xarray.DataArray`` and all keyword arguments are
+    understood by `array_filter`, the filter is applied to the array
+    directly: no ``itk.Image``, reference filter or ``PyImageFilter`` is
+    created, and the result is returned in the same container type as the
+    input. PyTorch tensors and CuPy arrays are exchanged without copying via
+    DLPack or the array interface. Otherwise, the call is forwarded to the
+    ITK implementation.
+
+    Parameters
+    ----------
+    array_filter : callable
+        ``array_filter(image, spacing, **kwargs)`` where `image` is a NumPy or
+        CuPy array, `spacing` is a tuple of floats in array axis order and
+        `kwargs` are the snake_case parameters of the ITK filter. Returns a
+        NumPy or CuPy array, or a tuple of them for filters with several
+        outputs, or the values computed by statistics filters.
+    output_grid : callable, optional
+        For filters whose output is not on the input grid,
+        ``output_grid(shape, spacing, **kwargs)`` returns the
+        ``(start, step)`` of the output samples along each axis in input
+        index units. Used to compute the coordinates of ``xarray.DataArray``
+        outputs.
+
+    Notes
+    -----
+    The decorated function also accepts a `spacing` keyword argument for
+    array inputs, in ITK's ``(x, y, z)`` order as for ``SetSpacing``. It
+    takes precedence over spacing derived from ``xarray.DataArray`` coords.
+    Inputs without spacing are assumed to have unit spacing.
+    """
+    parameters = list(inspect.signature(array_filter).parameters)[2:]
+    supported_kwargs = set(parameters) | {'spacing'}
+
+    def decorator(image_filter):
+        @functools.wraps(image_filter)
+        def wrapper(*args, **kwargs):
+            image = args[0] if args else None
+            container = _container_type(image)
+            array = None
+            if (
+                container is not None
+                and len(args) == 1
+                and supported_kwargs.issuperset(kwargs)
+            ):
+                array, array_spacing = _to_array(image, container)
+            if array is None:
+                if container == 'cupy':
+                    raise TypeError(
+                        "CuPy inputs are not supported with arguments: "
+                        f"{sorted(set(kwargs) - supported_kwargs)}"
+                    )
+                if 'spacing' in kwargs:
+                    raise TypeError(
+                        "spacing is only supported for scalar array inputs"
+                    )
+                return image_filter(*args, **kwargs)
+
+            filter_kwargs = kwargs.copy()
+            spacing = filter_kwargs.pop('spacing', None)
+            if spacing is not None:
+                spacing = np.broadcast_to(spacing, (array.ndim,))
+                array_spacing = tuple(float(s) for s in reversed(spacing))
+            elif array_spacing is None:
+                array_spacing = (1.0, ) * array.ndim
+            result = array_filter(array, array_spacing, **filter_kwargs)
+            grid = None
+            if output_grid is not None:
+                grid = output_grid(
+                    array.shape, array_spacing, **filter_kwargs
+                )
+            return _from_array(result, image, container, grid)
+        return wrapper
+    return decorator
+
+
+def itk_to_array_order(value, ndim, dtype=float):
+    """Convert a scalar or ITK ``(x, y, z)`` ordered parameter to a tuple in
+    array axis order."""
+    if np.isscalar(value):
+        return (dtype(value), ) * ndim
+    value = tuple(dtype(v) for v in value)
+    if len(value) != ndim:
+        raise ValueError(
+            "parameter must be a scalar or a sequence of length image.ndim"
+        )
+    return value[::-1]
+
+
+def itk_radius_to_footprint(radius, ndim):
+    """Box footprint of an ITK neighborhood radius, as of
+    ``itk.MedianImageFilter``.
+
+    Returns the radius in array axis order and the footprint as a CuPy
+    array.
+    """
+    radius = itk_to_array_order(radius, ndim, dtype=int)
+    return radius, cp.ones([r*2+1 for r in radius])
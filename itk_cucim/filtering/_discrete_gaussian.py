@@ -1,9 +1,14 @@
+import functools
 import math
+import warnings
 
 import cupy as cp
 import numpy as np
 import cupyx.scipy.ndimage as ndi
 
+from . import autotune
+from .scratch import get_scratch_pool
+
 try:
     # Use Bessel functions from SciPy.
     # (we only call these with scalar values, so a CPU-based implementation is
@@ -249,7 +254,7 @@ def _discrete_gaussian_derivative_kernel(
 
 def discrete_gaussian_filter(
     img, sigma=0.0, max_error=0.01, max_half_width=31, spacing=1.0,
-    normalize_across_scale=False
+    normalize_across_scale=False, output=None,
 ):
     return discrete_gaussian_derivative_filter(
         img=img,
@@ -258,13 +263,14 @@ def discrete_gaussian_filter(
         max_error=max_error,
         max_half_width=max_half_width,
         spacing=spacing,
-        normalize_across_scale=normalize_across_scale
+        normalize_across_scale=normalize_across_scale,
+        output=output,
     )
 
 
 def discrete_gaussian_derivative_filter(
     img, sigma=0.0, order=1, max_error=0.01, max_half_width=31, spacing=1.0,
-    normalize_across_scale=False,
+    normalize_across_scale=False, output=None,
 ):
     """Discrete Gaussian derivative filter.
 
@@ -282,6 +288,8 @@ def discrete_gaussian_derivative_filter(
         The maximum width of the generated kernel will be constrained to size
         ``2*max_half_width + 1``. If `max_half_width` is reached, a
         UserWarning will be raised.
+    output : cupy.ndarray, optional
+        Array of the shape and dtype of `img` to write the result into.
 
     Returns
     -------
@@ -312,7 +320,161 @@ def discrete_gaussian_derivative_filter(
         ITK. The Insight Journal - 2007 July - December.
         https://doi.org/10.54294/mrg5is
     """
-    ndim = img.ndim
+    kernels = discrete_gaussian_derivative_kernels(
+        img.ndim, sigma=sigma, order=order, max_error=max_error,
+        max_half_width=max_half_width, spacing=spacing,
+        normalize_across_scale=normalize_across_scale)
+    return tuned_separable_convolve(
+        img, [cp.asarray(h) for h in kernels], output=output
+    )
+
+
+def separable_convolve(img, kernels, output=None, scratch=None):
+    """Convolve `img` with one 1D kernel per axis.
+
+    Parameters
+    ----------
+    img : cupy.ndarray
+        The image to convolve.
+    kernels : sequence of cupy.ndarray
+        The kernel for each axis of `img`.
+    output : cupy.ndarray, optional
+        Array of the shape and dtype of `img` to write the result into.
+    scratch : sequence of cupy.ndarray, optional
+        Up to two arrays of the shape and dtype of `img` to hold the
+        intermediate results of the per-axis passes. If not provided, they
+        are drawn from the scratch pool.
+
+    Returns
+    -------
+    out : cupy.ndarray
+        The convolved image (`output`, if provided).
+    """
+    last = len(kernels) - 1
+    if scratch is None and last > 0:
+        with get_scratch_pool().scope() as buffers:
+            scratch = [
+                buffers.empty(img.shape, img.dtype)
+                for _ in range(min(last, 2))
+            ]
+            return separable_convolve(img, kernels, output, scratch)
+    for ax, h in enumerate(kernels):
+        if ax == last:
+            out = output
+        elif scratch is not None:
+            out = scratch[ax % 2]
+        else:
+            out = None
+        img = ndi.convolve1d(img, h, axis=ax, output=out, mode='nearest')
+    return img
+
+
+def _fft_convolve1d(img, h, axis):
+    """`ndi.convolve1d` of a floating point `img` with ``mode='nearest'``,
+    computed with FFTs."""
+    radius = h.size // 2
+    pad = [(0, 0)] * img.ndim
+    pad[axis] = (radius, radius)
+    padded = cp.pad(img, pad, mode='edge')
+    n = padded.shape[axis] + h.size - 1
+    fft_h = cp.fft.rfft(h.astype(img.dtype), n)
+    fft_h = fft_h.reshape((-1, ) + (1, ) * (img.ndim - 1 - axis))
+    spectrum = cp.fft.rfft(padded, n, axis=axis) * fft_h
+    full = cp.fft.irfft(spectrum, n, axis=axis)
+    valid = [slice(None)] * img.ndim
+    valid[axis] = slice(2 * radius, 2 * radius + img.shape[axis])
+    return full[tuple(valid)].astype(img.dtype, copy=False)
+
+
+def _fft_separable_convolve(img, kernels, output=None):
+    """`separable_convolve` with FFT convolutions along the axes with long
+    kernels."""
+    for ax, h in enumerate(kernels):
+        if h.size >= _FFT_MIN_KERNEL_SIZE:
+            img = _fft_convolve1d(img, h, ax)
+        else:
+            img = ndi.convolve1d(img, h, axis=ax, mode='nearest')
+    if output is None:
+        return img
+    output[...] = img
+    return output
+
+
+def _tiled_separable_convolve(img, kernels, output=None, tile=16):
+    """`separable_convolve` of slabs of `tile` planes along the first axis.
+
+    Each slab is extended by the kernel radius, so the result is identical
+    to that of `separable_convolve`.
+    """
+    if output is None:
+        output = cp.empty(img.shape, img.dtype)
+    halo = kernels[0].size // 2
+    n = img.shape[0]
+    pool = get_scratch_pool()
+    for start in range(0, n, tile):
+        stop = min(start + tile, n)
+        lo, hi = max(start - halo, 0), min(stop + halo, n)
+        slab = img[lo:hi]
+        slab = separable_convolve(
+            slab, kernels, output=pool.empty(slab.shape, slab.dtype)
+        )
+        output[start:stop] = slab[start - lo:stop - lo]
+        pool.release(slab)
+    return output
+
+
+# Kernels shorter than this are always applied directly.
+_FFT_MIN_KERNEL_SIZE = 31
+
+_TILE_SIZES = (16, 64)
+
+
+def tuned_separable_convolve(img, kernels, output=None):
+    """`separable_convolve` with the fastest strategy for the input.
+
+    The candidates are direct convolution of the whole image and direct
+    convolution of slabs along the first axis, which give identical
+    results, and, if `autotune.fft_enabled`, FFT convolution along the
+    axes with long kernels (floating point images), which differs by
+    rounding. The choice is made per shape class by `autotune.dispatch`.
+    """
+    strategies = dict(direct=separable_convolve)
+    sizes = [h.size for h in kernels]
+    if (
+        autotune.fft_enabled()
+        and img.dtype.kind == 'f'
+        and max(sizes) >= _FFT_MIN_KERNEL_SIZE
+    ):
+        strategies['fft'] = _fft_separable_convolve
+    for tile in _TILE_SIZES:
+        if 2 * (sizes[0] // 2) <= tile < img.shape[0]:
+            strategies[f'tiled{tile}'] = functools.partial(
+                _tiled_separable_convolve, tile=tile
+            )
+    key = autotune.shape_class(
+        img.shape, img.dtype, 'x'.join(str(s) for s in sizes)
+    )
+    return autotune.dispatch(
+        'separable_convolve', key, strategies, img, kernels, output=output
+    )
+
+
+def discrete_gaussian_derivative_kernels(
+    ndim, sigma=0.0, order=1, max_error=0.01, max_half_width=31, spacing=1.0,
+    normalize_across_scale=False,
+):
+    """Generate the 1D kernels of a separable discrete Gaussian derivative.
+
+    Parameters are as for `discrete_gaussian_derivative_filter`, with
+    `ndim` giving the number of image dimensions.
+
+    Returns
+    -------
+    kernels : list of ndarray
+        One host (NumPy) kernel per axis. The halo required along axis ``i``
+        to compute the filter without boundary effects is
+        ``kernels[i].size // 2``.
+    """
     order = _to_seq(order, ndim)
     max_error = _to_seq(max_error, ndim)
     spacing = _to_seq(spacing, ndim)
@@ -329,11 +491,52 @@ def discrete_gaussian_derivative_filter(
     if len(spacing) != ndim:
         raise ValueError(
             "spacing must be a scalar or a sequence of length img.ndim")
-    for ax, (sig, o, e, s) in enumerate(zip(sigma, order, max_error, spacing)):
+    kernels = []
+    for sig, o, e, s in zip(sigma, order, max_error, spacing):
         h = _discrete_gaussian_derivative_kernel(
             sigma=sig, order=o, max_error=e,
             max_half_width=max_half_width, spacing=s,
             normalize_across_scale=normalize_across_scale)
-        h = cp.asarray(h)
-        img = ndi.convolve1d(img, h, axis=ax, mode='nearest')
-    return img
+        kernels.append(h)
+    return kernels
+
+
+def normalized_discrete_gaussian_filter(
+    img, mask, sigma=0.0, max_error=0.01, max_half_width=31, spacing=1.0,
+):
+    """Discrete Gaussian filter restricted to the voxels of a mask.
+
+    Normalized convolution: the Gaussian of the masked image is divided by
+    the Gaussian of the mask, so that voxels outside of `mask` do not
+    contribute to the result.
+
+    Parameters
+    ----------
+    img : cupy.ndarray
+        The image to smooth.
+    mask : cupy.ndarray
+        Boolean array of the same shape as `img`.
+
+    Other parameters are as for `discrete_gaussian_filter`.
+
+    Returns
+    -------
+    out : cupy.ndarray
+        Floating point result. Voxels whose neighborhood does not intersect
+        the mask are set to 0.
+    """
+    if img.shape != mask.shape:
+        raise ValueError("mask must have the same shape as img")
+    float_dtype = cp.promote_types(img.dtype, cp.float32)
+    weights = mask.astype(float_dtype)
+    kwargs = dict(
+        sigma=sigma, max_error=max_error, max_half_width=max_half_width,
+        spacing=spacing
+    )
+    numerator = discrete_gaussian_filter(img * weights, **kwargs)
+    denominator = discrete_gaussian_filter(weights, **kwargs)
+    # The numerator is also zero wherever the (non-negative) kernel does not
+    # overlap the mask, so dividing by 1 there leaves those voxels at 0.
+    denominator[denominator == 0] = 1
+    numerator /= denominator
+    return numerator
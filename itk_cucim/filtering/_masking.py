@@ -0,0 +1,102 @@
+"""Restrict filters to the bounding box of a mask."""
+import cupy as cp
+import itk
+import numpy as np
+
+
+def as_mask_array(mask, shape):
+    """Return `mask` as a boolean array of the given `shape`.
+
+    `mask` may be an ``itk.Image``, a NumPy array-like or an array exposing
+    ``__cuda_array_interface__`` (CuPy, PyTorch CUDA tensors). Nonzero
+    voxels are inside of the mask.
+    """
+    if isinstance(mask, itk.Image):
+        mask = itk.array_view_from_image(mask)
+    if hasattr(mask, '__cuda_array_interface__'):
+        mask = cp.asarray(mask)
+    else:
+        mask = np.asarray(mask)
+    if mask.shape != tuple(shape):
+        raise ValueError(
+            f"mask shape {mask.shape} does not match image shape {tuple(shape)}"
+        )
+    if mask.dtype == np.uint8:
+        # can avoid copy from uint8->bool
+        return mask.view(bool)
+    return mask.astype(bool, copy=False)
+
+
+def mask_bounding_box(mask, halo):
+    """Bounding box of the nonzero voxels of `mask`, padded by `halo`.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray or cupy.ndarray
+        Boolean mask.
+    halo : sequence of int
+        Number of voxels to pad the bounding box by along each axis.
+
+    Returns
+    -------
+    bbox : tuple of slice
+        The bounding box of the mask.
+    padded : tuple of slice
+        `bbox` padded by `halo`, clipped to the extent of `mask`.
+    inner : tuple of slice
+        `bbox` relative to the origin of `padded`.
+
+    All three are ``None`` if the mask is empty.
+    """
+    xp = cp.get_array_module(mask)
+    bbox, padded, inner = [], [], []
+    for ax, (size, h) in enumerate(zip(mask.shape, halo)):
+        other_axes = tuple(a for a in range(mask.ndim) if a != ax)
+        nonzero = xp.flatnonzero(mask.any(axis=other_axes))
+        if nonzero.size == 0:
+            return None, None, None
+        start, stop = int(nonzero[0]), int(nonzero[-1]) + 1
+        pad_start, pad_stop = max(start - h, 0), min(stop + h, size)
+        bbox.append(slice(start, stop))
+        padded.append(slice(pad_start, pad_stop))
+        inner.append(slice(start - pad_start, stop - pad_start))
+    return tuple(bbox), tuple(padded), tuple(inner)
+
+
+def masked_filter(func, image, mask, halo, output):
+    """Apply `func` only around `mask`, writing masked voxels to `output`.
+
+    Only the bounding box of `mask` padded by `halo` is transferred to the
+    device and filtered, so the cost scales with the size of that box rather
+    than with the size of `image`. Voxels of `output` outside of `mask` are
+    left untouched.
+
+    Parameters
+    ----------
+    func : callable
+        ``func(image_crop, mask_crop)`` taking CuPy arrays and returning a
+        CuPy array of the same shape as ``image_crop`` and the dtype of
+        `output`.
+    image : numpy.ndarray or cupy.ndarray
+        The input image.
+    mask : numpy.ndarray or cupy.ndarray
+        Boolean mask of the same shape as `image`, located on the same
+        device as `output`.
+    halo : sequence of int
+        The radius of the filter along each axis. For results inside the
+        mask to be identical to filtering the whole image, `func` must only
+        depend on values within `halo` voxels of each output voxel.
+    output : numpy.ndarray or cupy.ndarray
+        Array to write the result into.
+    """
+    bbox, padded, inner = mask_bounding_box(mask, halo)
+    if bbox is None:
+        return output
+    cu_image = cp.asarray(image[padded])
+    cu_mask = cp.asarray(mask[padded])
+    result = func(cu_image, cu_mask)[inner]
+    xp = cp.get_array_module(output)
+    if xp is np:
+        result = result.get()
+    xp.copyto(output[bbox], result, casting='unsafe', where=mask[bbox])
+    return output
@@ -0,0 +1,589 @@
+"""Fused single-pass reduction of image statistics.
+
+One kernel computes the count, minimum, maximum, sum and sum of squares
+of an image and, optionally, its histogram. With a label image, the same
+statistics, histograms and bounding boxes are computed per label in the
+same pass.
+
+Each lane of a warp accumulates the voxels of a label run (consecutive
+voxels of the lane with the same label, and the same histogram bin) in
+registers and only flushes them to the device accumulators with atomics
+when the label or bin changes, so that the number of atomics scales with
+the number of label boundaries rather than the number of voxels. Without
+labels, the lanes of a warp are combined with shuffles before flushing
+and histograms with few bins are accumulated in shared memory.
+"""
+import collections
+import functools
+
+import cupy as cp
+import numpy as np
+
+_C_TYPES = {
+    np.dtype(np.uint8): 'unsigned char',
+    np.dtype(np.int8): 'signed char',
+    np.dtype(np.uint16): 'unsigned short',
+    np.dtype(np.int16): 'short',
+    np.dtype(np.uint32): 'unsigned int',
+    np.dtype(np.int32): 'int',
+    np.dtype(np.uint64): 'unsigned long long',
+    np.dtype(np.int64): 'long long',
+    np.dtype(np.float32): 'float',
+    np.dtype(np.float64): 'double',
+}
+
+# Histograms with at most this many bins are accumulated per block in
+# shared memory.
+_MAX_SHARED_BINS = 4096
+
+# Largest number of (label, bin) histogram entries for which labels of 8
+# and 16 bit label images are used as indices directly rather than being
+# mapped to consecutive indices first.
+_MAX_LABEL_TABLE_BINS = 1 << 20
+
+_THREADS_PER_BLOCK = 256
+
+# Voxels read by each lane per tile of a warp.
+_ITEMS_PER_LANE = 8
+
+_EPSILON = np.finfo(np.float64).eps
+
+_reduction_source = r'''
+#define FULL_MASK 0xffffffffu
+#define TILE (32 * ITEMS_PER_LANE)
+
+struct Accumulator {
+    unsigned long long count;
+    K minimum;
+    K maximum;
+    S sum;
+    Q sum_of_squares;
+#if BOUNDING_BOX
+    int start[NDIM];
+    int stop[NDIM];
+#endif
+};
+
+__device__ __forceinline__ void reset(Accumulator& a)
+{
+    a.count = 0;
+    a.minimum = (K)~(K)0;
+    a.maximum = 0;
+    a.sum = 0;
+    a.sum_of_squares = 0;
+#if BOUNDING_BOX
+    for (int ax = 0; ax < NDIM; ++ax) {
+        a.start[ax] = 0x7fffffff;
+        a.stop[ax] = -1;
+    }
+#endif
+}
+
+__device__ __forceinline__ void flush(
+    const Accumulator& a, const long long label,
+    unsigned long long* count, K* minimum, K* maximum, S* sum,
+    Q* sum_of_squares, int* start, int* stop)
+{
+    if (a.count == 0) {
+        return;
+    }
+    atomicAdd(count + label, a.count);
+    atomicMin(minimum + label, a.minimum);
+    atomicMax(maximum + label, a.maximum);
+#if EXACT_SUM
+    // two's complement addition of the signed sums
+    atomicAdd(
+        (unsigned long long*)(sum + label), (unsigned long long)a.sum
+    );
+#else
+    atomicAdd(sum + label, a.sum);
+#endif
+    atomicAdd(sum_of_squares + label, a.sum_of_squares);
+#if BOUNDING_BOX
+    for (int ax = 0; ax < NDIM; ++ax) {
+        atomicMin(start + label * NDIM + ax, a.start[ax]);
+        atomicMax(stop + label * NDIM + ax, a.stop[ax]);
+    }
+#endif
+}
+
+#if HISTOGRAM == 1
+// Bin of `v` as found by itk::Statistics::Histogram::GetIndex with clipped
+// end bins: bin b holds [edges[b], edges[b + 1]); -1 if out of range.
+__device__ __forceinline__ int find_bin(
+    const double v, const double* edges, const double inverse_width)
+{
+    // the comparisons of ITK: with the NaN first edge of an overflowing bin
+    // width, all values below the last edge are counted in bin 0
+    if (v < edges[0] || !(v < edges[N_BINS])) {
+        return -1;
+    }
+    // the edges are only approximately equidistant
+    const double t = (v - edges[0]) * inverse_width;
+    int b = t >= N_BINS - 1 ? N_BINS - 1 : (t > 0 ? (int)t : 0);
+    while (b > 0 && v < edges[b]) {
+        --b;
+    }
+    while (b < N_BINS - 1 && v >= edges[b + 1]) {
+        ++b;
+    }
+    return b;
+}
+#endif
+
+#if HISTOGRAM
+__device__ __forceinline__ void add_frequency(
+    unsigned int* block_histogram, unsigned long long* histogram,
+    const long long h, const unsigned int frequency)
+{
+#if SHARED_HISTOGRAM
+    atomicAdd(block_histogram + h, frequency);
+#else
+    atomicAdd(histogram + h, (unsigned long long)frequency);
+#endif
+}
+#endif
+
+extern "C" __global__ void cucim_statistics_reduction(
+    const T* image, const L* labels, const long long size,
+    const double* edges, const double inverse_width, const INDEX_T* shape,
+    unsigned long long* count, K* minimum, K* maximum, S* sum,
+    Q* sum_of_squares, int* start, int* stop, unsigned long long* histogram)
+{
+#if SHARED_HISTOGRAM
+    __shared__ unsigned int block_histogram[N_BINS];
+    for (int b = threadIdx.x; b < N_BINS; b += blockDim.x) {
+        block_histogram[b] = 0;
+    }
+    __syncthreads();
+#else
+    unsigned int* block_histogram = 0;
+#endif
+    const int lane = threadIdx.x & 31;
+    const long long warp =
+        ((long long)blockIdx.x * blockDim.x + threadIdx.x) >> 5;
+    const long long n_warps = ((long long)gridDim.x * blockDim.x) >> 5;
+
+    Accumulator a;
+    reset(a);
+    long long label = 0;
+#if LABELED
+    long long run_label = -1;
+#endif
+#if HISTOGRAM
+    long long run_bin = -1;
+    unsigned int run_frequency = 0;
+#endif
+    // each warp reads tiles of consecutive voxels, each lane every 32nd
+    // voxel of a tile, so that reads are coalesced and the voxels of a lane
+    // are spatially close
+    for (long long base = warp * TILE; base < size; base += n_warps * TILE) {
+        for (int k = 0; k < ITEMS_PER_LANE; ++k) {
+            const long long i = base + k * 32 + lane;
+            if (i >= size) {
+                break;
+            }
+            const T x = image[i];
+#if LABELED
+            label = (long long)labels[i] + LABEL_OFFSET;
+            if (label != run_label) {
+                if (run_label >= 0) {
+                    flush(a, run_label, count, minimum, maximum, sum,
+                          sum_of_squares, start, stop);
+                }
+                reset(a);
+                run_label = label;
+            }
+#endif
+            const K key = to_key(x);
+            a.count += 1;
+            a.minimum = key < a.minimum ? key : a.minimum;
+            a.maximum = key > a.maximum ? key : a.maximum;
+            a.sum += (S)x;
+            a.sum_of_squares += (Q)x * (Q)x;
+#if BOUNDING_BOX
+            INDEX_T r = (INDEX_T)i;
+            for (int ax = NDIM - 1; ax > 0; --ax) {
+                const int c = (int)(r % shape[ax]);
+                r /= shape[ax];
+                a.start[ax] = c < a.start[ax] ? c : a.start[ax];
+                a.stop[ax] = c > a.stop[ax] ? c : a.stop[ax];
+            }
+            a.start[0] = (int)r < a.start[0] ? (int)r : a.start[0];
+            a.stop[0] = (int)r > a.stop[0] ? (int)r : a.stop[0];
+#endif
+#if HISTOGRAM
+#if HISTOGRAM == 1
+            const int b = find_bin((double)x, edges, inverse_width);
+#else
+            const int b = (int)x - VALUE_LOWER;
+#endif
+            if (b >= 0) {
+                const long long h = label * N_BINS + b;
+                if (h != run_bin) {
+                    if (run_frequency) {
+                        add_frequency(block_histogram, histogram, run_bin,
+                                      run_frequency);
+                    }
+                    run_bin = h;
+                    run_frequency = 0;
+                }
+                ++run_frequency;
+            }
+#endif
+        }
+    }
+#if HISTOGRAM
+    if (run_frequency) {
+        add_frequency(block_histogram, histogram, run_bin, run_frequency);
+    }
+#endif
+#if LABELED
+    if (run_label >= 0) {
+        flush(a, run_label, count, minimum, maximum, sum, sum_of_squares,
+              start, stop);
+    }
+#else
+    for (int offset = 16; offset > 0; offset >>= 1) {
+        const K other_minimum = __shfl_down_sync(FULL_MASK, a.minimum, offset);
+        const K other_maximum = __shfl_down_sync(FULL_MASK, a.maximum, offset);
+        a.count += __shfl_down_sync(FULL_MASK, a.count, offset);
+        a.minimum = other_minimum < a.minimum ? other_minimum : a.minimum;
+        a.maximum = other_maximum > a.maximum ? other_maximum : a.maximum;
+        a.sum += __shfl_down_sync(FULL_MASK, a.sum, offset);
+        a.sum_of_squares += __shfl_down_sync(
+            FULL_MASK, a.sum_of_squares, offset
+        );
+    }
+    if (lane == 0) {
+        flush(a, 0, count, minimum, maximum, sum, sum_of_squares, start,
+              stop);
+    }
+#endif
+#if SHARED_HISTOGRAM
+    __syncthreads();
+    for (int b = threadIdx.x; b < N_BINS; b += blockDim.x) {
+        if (block_histogram[b]) {
+            atomicAdd(histogram + b, (unsigned long long)block_histogram[b]);
+        }
+    }
+#endif
+}
+'''
+
+
+def _key_dtype(dtype):
+    """dtype of the order preserving unsigned integer keys of `dtype`,
+    whose minimum and maximum are found with integer atomics."""
+    return np.dtype(np.uint64 if dtype.itemsize == 8 else np.uint32)
+
+
+def _to_key_source(dtype):
+    if dtype.kind == 'f':
+        if dtype.itemsize == 8:
+            return (
+                '__device__ __forceinline__ K to_key(const T x) {\n'
+                '    const K b = (K)__double_as_longlong(x);\n'
+                '    return (b >> 63) ? ~b : (b | 0x8000000000000000ull);\n'
+                '}\n'
+            )
+        return (
+            '__device__ __forceinline__ K to_key(const T x) {\n'
+            '    const K b = __float_as_uint(x);\n'
+            '    return (b >> 31) ? ~b : (b | 0x80000000u);\n'
+            '}\n'
+        )
+    if dtype.kind == 'i':
+        sign = '0x8000000000000000ull' if dtype.itemsize == 8 else (
+            '0x80000000u'
+        )
+        signed = 'long long' if dtype.itemsize == 8 else 'int'
+        return (
+            '__device__ __forceinline__ K to_key(const T x) {\n'
+            f'    return (K)({signed})x ^ {sign};\n'
+            '}\n'
+        )
+    return '__device__ __forceinline__ K to_key(const T x) { return x; }\n'
+
+
+def _from_keys(keys, dtype):
+    """Invert the key mapping of `_to_key_source`."""
+    key_dtype = keys.dtype
+    sign = key_dtype.type(1 << (8 * key_dtype.itemsize - 1))
+    if dtype.kind == 'f':
+        bits = np.where(keys & sign, keys ^ sign, ~keys)
+        return bits.view(np.dtype(f'f{key_dtype.itemsize}')).astype(dtype)
+    if dtype.kind == 'i':
+        signed = np.dtype(f'i{key_dtype.itemsize}')
+        return (keys ^ sign).view(signed).astype(dtype)
+    return keys.astype(dtype)
+
+
+def _exact_sum(dtype):
+    """Whether sums of `dtype` are accumulated exactly in 64 bit integers."""
+    return dtype.kind in 'iu' and dtype.itemsize <= 2
+
+
+@functools.lru_cache(maxsize=None)
+def _reduction_kernel(
+    dtype, label_dtype, label_offset, histogram, n_bins, shared_histogram,
+    ndim, index_type,
+):
+    """Reduction kernel for images of `dtype`.
+
+    `label_dtype` is None without labels. `histogram` is 0 without
+    histogram, 1 for bins given by their edges and 2 for one bin per value.
+    `ndim` is the dimension of the bounding boxes, 0 if none are computed.
+    """
+    exact = _exact_sum(dtype)
+    types = dict(
+        T=_C_TYPES[dtype],
+        K=_C_TYPES[_key_dtype(dtype)],
+        S='long long' if exact else 'double',
+        Q='unsigned long long' if exact else 'double',
+        L=_C_TYPES[label_dtype] if label_dtype is not None else 'char',
+        INDEX_T=index_type,
+    )
+    macros = dict(
+        ITEMS_PER_LANE=_ITEMS_PER_LANE,
+        EXACT_SUM=int(exact),
+        LABELED=int(label_dtype is not None),
+        LABEL_OFFSET=f'({label_offset}ll)',
+        HISTOGRAM=histogram,
+        N_BINS=n_bins,
+        SHARED_HISTOGRAM=int(shared_histogram),
+        BOUNDING_BOX=int(ndim > 0),
+        NDIM=max(ndim, 1),
+        VALUE_LOWER=f'({_value_bins(dtype)[0] if histogram == 2 else 0})',
+    )
+    source = ''.join(
+        [f'typedef {ctype} {name};\n' for name, ctype in types.items()]
+        + [f'#define {name} {value}\n' for name, value in macros.items()]
+        + [_to_key_source(dtype), _reduction_source]
+    )
+    return cp.RawKernel(source, 'cucim_statistics_reduction')
+
+
+@functools.lru_cache(maxsize=None)
+def _max_blocks():
+    """Number of blocks that keep all multiprocessors of the device busy."""
+    device = cp.cuda.Device()
+    return 8 * device.attributes['MultiProcessorCount']
+
+
+def _value_bins(dtype):
+    """``(lower, n_bins)`` of the histograms with one bin per value of an 8
+    or 16 bit integer `dtype`."""
+    info = np.iinfo(dtype)
+    return int(info.min), int(info.max) - int(info.min) + 1
+
+
+def pixel_type_range(dtype):
+    """``(NonpositiveMin, max)`` of ``itk::NumericTraits`` for `dtype`, as
+    Python floats."""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        info = np.finfo(dtype)
+        return -float(info.max), float(info.max)
+    info = np.iinfo(dtype)
+    return float(info.min), float(info.max)
+
+
+def histogram_bin_edges(n_bins, lower, upper):
+    """Bin edges of an ``itk.Histogram`` initialized with `n_bins` bins
+    between `lower` and `upper`.
+
+    As in ITK, the bin width is computed in single precision, and the last
+    bin ends at `upper`. Bin ``b`` holds the values in
+    ``[edges[b], edges[b + 1])``.
+    """
+    n_bins = int(n_bins)
+    with np.errstate(invalid='ignore', over='ignore'):
+        width = (
+            (np.float32(upper) - np.float32(lower)) / np.float32(n_bins)
+        )
+        starts = np.arange(n_bins, dtype=np.float32) * width
+        return np.append(
+            float(lower) + starts.astype(np.float64), float(upper)
+        )
+
+
+def _counted_upper(upper):
+    """Exclusive bound of the values counted in the last histogram bin.
+
+    ``itk.Histogram`` counts values almost equal to the end of the last bin
+    in that bin, in the sense of ``itk::Math::FloatAlmostEqual``.
+    """
+    upper = np.float64(upper)
+    bound = upper
+    with np.errstate(over='ignore'):
+        for _ in range(5):
+            bound = np.nextafter(bound, np.inf)
+        return max(bound, np.nextafter(upper + 0.1 * _EPSILON, np.inf))
+
+
+def rebin(frequencies, values, edges):
+    """Histogram with bins `edges` of the `frequencies` of `values`."""
+    n_bins = edges.size - 1
+    inside = ~(values < edges[0]) & (values < _counted_upper(edges[-1]))
+    bins = np.searchsorted(edges[:-1], values[inside], side='right') - 1
+    return np.bincount(
+        bins, weights=frequencies[inside], minlength=n_bins
+    ).astype(np.int64)
+
+
+StatisticsReduction = collections.namedtuple(
+    'StatisticsReduction',
+    ['labels', 'count', 'minimum', 'maximum', 'sum', 'sum_of_squares',
+     'bounding_box', 'histogram'],
+)
+
+
+def _label_indices(labels, n_bins):
+    """``(indices, offset, label_values)`` of a CuPy label array.
+
+    Labels of 8 and 16 bit label arrays are used as indices, offset by
+    ``-min`` of their dtype; otherwise the labels are mapped to the
+    indices of the sorted label values.
+    """
+    dtype = labels.dtype
+    if dtype == bool:
+        labels, dtype = labels.view(np.uint8), np.dtype(np.uint8)
+    if dtype.kind not in 'iu':
+        raise TypeError("labels must be of an integer dtype")
+    if dtype.itemsize <= 2:
+        lower, n_labels = _value_bins(dtype)
+        if n_labels * max(n_bins, 1) <= _MAX_LABEL_TABLE_BINS:
+            values = np.arange(lower, lower + n_labels).astype(dtype)
+            return labels, -lower, values
+    values = cp.unique(labels)
+    return cp.searchsorted(values, labels), 0, values.get()
+
+
+def reduce_statistics(image, labels=None, bins=None, bounding_box=False):
+    """Statistics of a CuPy array, computed in a single pass.
+
+    Parameters
+    ----------
+    image : cupy.ndarray
+        Integer or floating point image.
+    labels : cupy.ndarray, optional
+        Integer label image of the shape of `image`. If given, all
+        statistics are computed per label.
+    bins : str or numpy.ndarray, optional
+        If ``'values'``, a histogram with one bin per value of the 8 or 16
+        bit integer dtype of `image`, starting at the minimum of the dtype.
+        Otherwise the edges of the histogram bins, see
+        `histogram_bin_edges`; values outside of the bins are not counted,
+        except, as in ITK, values almost equal to the last edge.
+    bounding_box : bool, optional
+        Whether to compute the bounding box of each label.
+
+    Returns
+    -------
+    StatisticsReduction
+        Named tuple of NumPy arrays with one entry per label occurring in
+        `labels`, in ascending label order, or a single entry without
+        labels. ``labels`` are the label values, None without labels.
+        ``minimum`` and ``maximum`` are of the dtype of `image`. ``sum``
+        and ``sum_of_squares`` are exact 64 bit integers for 8 and 16 bit
+        integer images and float64 otherwise. ``bounding_box`` holds the
+        first and last index along each axis, in array axis order, with
+        shape ``(n, ndim, 2)``; ``histogram`` has shape ``(n, n_bins)``.
+    """
+    image = cp.ascontiguousarray(image)
+    dtype = image.dtype
+    if dtype not in _C_TYPES:
+        raise TypeError(f"unsupported image dtype: {dtype}")
+    if bins is None:
+        histogram_mode, n_bins = 0, 0
+    elif isinstance(bins, str):
+        if bins != 'values' or dtype.kind not in 'iu' or dtype.itemsize > 2:
+            raise ValueError(
+                "bins='values' requires an 8 or 16 bit integer image"
+            )
+        histogram_mode, n_bins = 2, _value_bins(dtype)[1]
+    else:
+        edges = np.asarray(bins, dtype=np.float64)
+        histogram_mode, n_bins = 1, edges.size - 1
+        if n_bins < 1:
+            raise ValueError("bins must hold at least two edges")
+
+    if labels is None:
+        label_dtype, label_offset, label_values = None, 0, None
+        n_labels = 1
+        label_indices = image
+    else:
+        labels = cp.asarray(labels)
+        if labels.shape != image.shape:
+            raise ValueError("labels must have the shape of the image")
+        label_indices, label_offset, label_values = _label_indices(
+            cp.ascontiguousarray(labels), n_bins
+        )
+        label_dtype = label_indices.dtype
+        n_labels = label_values.size
+    shared_histogram = (
+        labels is None and 0 < n_bins <= _MAX_SHARED_BINS
+    )
+    ndim = image.ndim if bounding_box and labels is not None else 0
+    index_type = (
+        'unsigned int' if image.size < 2**32 else 'unsigned long long'
+    )
+    index_dtype = np.uint32 if image.size < 2**32 else np.uint64
+
+    key_dtype = _key_dtype(dtype)
+    exact = _exact_sum(dtype)
+    count = cp.zeros(n_labels, np.uint64)
+    minimum = cp.full(n_labels, np.iinfo(key_dtype).max, key_dtype)
+    maximum = cp.zeros(n_labels, key_dtype)
+    total = cp.zeros(n_labels, np.int64 if exact else np.float64)
+    squares = cp.zeros(n_labels, np.uint64 if exact else np.float64)
+    start = cp.full((n_labels, max(ndim, 1)), np.iinfo(np.int32).max,
+                    np.int32)
+    stop = cp.full((n_labels, max(ndim, 1)), -1, np.int32)
+    histogram = cp.zeros((n_labels, max(n_bins, 1)), np.uint64)
+    if histogram_mode == 1:
+        device_edges = cp.asarray(
+            np.append(edges[:-1], _counted_upper(edges[-1]))
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_width = np.float64(n_bins) / (edges[-1] - edges[0])
+        if not np.isfinite(inverse_width):
+            inverse_width = np.float64(0)
+    else:
+        device_edges = histogram
+        inverse_width = np.float64(0)
+    shape = cp.asarray(image.shape, dtype=index_dtype)
+
+    if image.size:
+        kernel = _reduction_kernel(
+            dtype, label_dtype, label_offset, histogram_mode, max(n_bins, 1),
+            shared_histogram, ndim, index_type,
+        )
+        n_tiles = -(-image.size // (32 * _ITEMS_PER_LANE))
+        warps_per_block = _THREADS_PER_BLOCK // 32
+        blocks = min(-(-n_tiles // warps_per_block), _max_blocks())
+        kernel(
+            (blocks, ), (_THREADS_PER_BLOCK, ),
+            (image, label_indices, np.int64(image.size), device_edges,
+             inverse_width, shape, count, minimum, maximum, total, squares,
+             start, stop, histogram),
+        )
+
+    count = count.get().astype(np.int64)
+    present = slice(None) if labels is None else count > 0
+    return StatisticsReduction(
+        labels=None if labels is None else label_values[present],
+        count=count[present],
+        minimum=_from_keys(minimum.get()[present], dtype),
+        maximum=_from_keys(maximum.get()[present], dtype),
+        sum=total.get()[present],
+        sum_of_squares=squares.get()[present],
+        bounding_box=(
+            np.stack([start.get(), stop.get()], axis=-1)[present]
+            if ndim else None
+        ),
+        histogram=(
+            histogram.get()[present].astype(np.int64) if n_bins else None
+        ),
+    )
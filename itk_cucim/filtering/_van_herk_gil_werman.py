@@ -0,0 +1,139 @@
+"""Separable minimum and maximum filters for box footprints.
+
+The van Herk/Gil-Werman algorithm [1]_, [2]_ splits each line into blocks of
+the window width and computes prefix and suffix extrema within each block.
+The extremum over any window is then that of one suffix and one prefix, for
+about three comparisons per voxel and axis independent of the radius.
+
+References
+----------
+.. [1] M. van Herk, "A fast algorithm for local minimum and maximum filters
+    on rectangular and octagonal kernels," Pattern Recognition Letters,
+    vol. 13, no. 7, pp. 517-521, 1992.
+    :DOI:`10.1016/0167-8655(92)90069-C`
+.. [2] J. Gil and M. Werman, "Computing 2-D min, median, and max filters,"
+    IEEE Transactions on Pattern Analysis and Machine Intelligence, vol. 15,
+    no. 5, pp. 504-507, 1993. :DOI:`10.1109/34.211471`
+"""
+import functools
+
+import cupy as cp
+import numpy as np
+
+# Indexing of an array of shape (outer, axis_size, inner), where axis_size is
+# the length of the filtered axis and inner the product of the sizes of the
+# later axes.
+_block_scan_operation = '''
+    const ptrdiff_t j = i % inner;
+    const ptrdiff_t block = (i / inner) % n_blocks;
+    const ptrdiff_t base = (i / (inner * n_blocks)) * axis_size * inner + j;
+    const ptrdiff_t start = block * width;
+    const ptrdiff_t stop = min(start + width, (ptrdiff_t)axis_size);
+    ptrdiff_t k = base + start * inner;
+    T acc = x[k];
+    prefix[k] = acc;
+    for (ptrdiff_t m = start + 1; m < stop; m++) {
+        k = base + m * inner;
+        acc = EXTREMUM(acc, x[k]);
+        prefix[k] = acc;
+    }
+    k = base + (stop - 1) * inner;
+    acc = x[k];
+    suffix[k] = acc;
+    for (ptrdiff_t m = stop - 2; m >= start; m--) {
+        k = base + m * inner;
+        acc = EXTREMUM(acc, x[k]);
+        suffix[k] = acc;
+    }
+'''
+
+# The window [m - radius, m + radius] is clipped to the line, so voxels
+# outside of the image are ignored.
+_combine_operation = '''
+    const ptrdiff_t m = (i / inner) % axis_size;
+    const ptrdiff_t base = i - m * inner;
+    const ptrdiff_t lo = max(m - radius, (ptrdiff_t)0);
+    const ptrdiff_t hi = min(m + radius, (ptrdiff_t)axis_size - 1);
+    if (lo / width == hi / width) {
+        // a prefix of the block, or a suffix of the last, truncated block
+        y = (lo % width == 0) ? prefix[base + hi * inner]
+                              : suffix[base + lo * inner];
+    } else {
+        y = EXTREMUM(suffix[base + lo * inner], prefix[base + hi * inner]);
+    }
+'''
+
+
+@functools.lru_cache(maxsize=None)
+def _kernels(extremum):
+    preamble = (
+        f"#define EXTREMUM(a, b) ((b) {'<' if extremum == 'min' else '>'} "
+        "(a) ? (b) : (a))\n"
+    )
+    block_scan = cp.ElementwiseKernel(
+        'raw T x, int64 axis_size, int64 inner, int64 width, int64 n_blocks',
+        'raw T prefix, raw T suffix',
+        _block_scan_operation,
+        f'cucim_van_herk_block_scan_{extremum}',
+        preamble=preamble,
+    )
+    combine = cp.ElementwiseKernel(
+        'raw T prefix, raw T suffix, int64 axis_size, int64 inner, int64 radius, '
+        'int64 width',
+        'T y',
+        _combine_operation,
+        f'cucim_van_herk_combine_{extremum}',
+        preamble=preamble,
+    )
+    return block_scan, combine
+
+
+def _extremum_filter(image, radius, extremum, output):
+    image = cp.asarray(image)
+    if output is None:
+        output = cp.empty(image.shape, image.dtype)
+    if output is not image:
+        output[...] = image
+    if not output.flags.c_contiguous:
+        raise ValueError("output must be C contiguous")
+    if output.size == 0:
+        return output
+    block_scan, combine = _kernels(extremum)
+    prefix = suffix = None
+    for ax, r in enumerate(radius):
+        n = output.shape[ax]
+        if r == 0 or n == 1:
+            continue
+        if prefix is None:
+            prefix = cp.empty_like(output)
+            suffix = cp.empty_like(output)
+        width = 2 * r + 1
+        n_blocks = -(-n // width)
+        inner = int(np.prod(output.shape[ax + 1:], dtype=np.int64))
+        outer = output.size // (n * inner)
+        block_scan(
+            output, n, inner, width, n_blocks, prefix, suffix,
+            size=outer * n_blocks * inner,
+        )
+        # the output only depends on prefix and suffix, so it is updated
+        # in place
+        combine(prefix, suffix, n, inner, r, width, output)
+    return output
+
+
+def minimum_filter(image, radius, output=None):
+    """Minimum over a box of the given `radius` (in array axis order).
+
+    Voxels outside of the image are ignored. `output`, if given, must be a
+    C contiguous array of the shape and dtype of `image`; it may be `image`
+    itself.
+    """
+    return _extremum_filter(image, radius, 'min', output)
+
+
+def maximum_filter(image, radius, output=None):
+    """Maximum over a box of the given `radius` (in array axis order).
+
+    See `minimum_filter`.
+    """
+    return _extremum_filter(image, radius, 'max', output)
@@ -0,0 +1,418 @@
+"""cuCIM accelerated filters of ITK's AnisotropicSmoothing module.
+
+The diffusion iterations run entirely on the device: the image is kept in
+two preallocated buffers that are swapped after each iteration, and the
+conductance is scaled with an average gradient magnitude that is reduced
+into a device scalar. An iteration therefore allocates no memory, does not
+synchronize with the host and does not touch ITK objects.
+"""
+import functools
+import warnings
+
+import cupy as cp
+import itk
+import numpy as np
+from itk.support import helpers
+
+from ._array_path import accept_array_like_fast_path
+
+# Number of partial sums of the average gradient magnitude reduction
+_N_PARTIAL_SUMS = 65536
+
+_preamble = '''
+#define X(offset) (x[i + (offset)])
+
+// Offsets of the neighbors of voxel i along each axis, clamped to the image
+// as by ITK's zero flux Neumann boundary condition.
+__device__ void neighbor_offsets(
+    ptrdiff_t i, const ptrdiff_t* shape, ptrdiff_t* forward,
+    ptrdiff_t* backward)
+{
+    ptrdiff_t stride = 1;
+    for (int a = NDIM - 1; a >= 0; a--) {
+        const ptrdiff_t k = i % shape[a];
+        i /= shape[a];
+        forward[a] = k + 1 < shape[a] ? stride : 0;
+        backward[a] = k > 0 ? -stride : 0;
+        stride *= shape[a];
+    }
+}
+'''
+
+# As ITK's ScalarAnisotropicDiffusionFunction::
+# CalculateAverageGradientMagnitudeSquared with a grid-stride loop: each
+# thread sums the squared gradient magnitude of every `_ind.size()`-th voxel.
+_gradient_magnitude_operation = '''
+    double sum = 0.0;
+    ptrdiff_t forward[NDIM], backward[NDIM];
+    for (ptrdiff_t v = i; v < n_voxels; v += _ind.size()) {
+        neighbor_offsets(v, shape, forward, backward);
+        for (int a = 0; a < NDIM; a++) {
+            const double d = (double)(x[v + forward[a]] - x[v + backward[a]])
+                             / -2.0 * scale[a];
+            sum += d * d;
+        }
+    }
+    partial_sum = sum;
+'''
+
+# Shared by both update functions: the centralized derivatives and the
+# conductance parameter K. Differences of pixels are computed in the pixel
+# type, as by ITK.
+_derivatives = '''
+    ptrdiff_t forward[NDIM], backward[NDIM];
+    neighbor_offsets(i, shape, forward, backward);
+    const double k = average_gradient_magnitude_squared[0] * conductance
+                     * conductance * -2.0;
+    double dx[NDIM];
+    for (int a = 0; a < NDIM; a++) {
+        dx[a] = (double)(X(forward[a]) - X(backward[a])) / 2.0 * scale[a];
+    }
+'''
+
+# Gradient magnitudes along axis a at the forward and backward half voxel
+_half_gradient_magnitudes = '''
+        double grad_mag_sq = dx_forward[a] * dx_forward[a];
+        double grad_mag_sq_d = dx_backward[a] * dx_backward[a];
+        for (int b = 0; b < NDIM; b++) {
+            if (b == a) {
+                continue;
+            }
+            const double dx_aug = (double)(
+                X(forward[a] + forward[b]) - X(forward[a] + backward[b])
+            ) / 2.0 * scale[b];
+            const double dx_dim = (double)(
+                X(backward[a] + forward[b]) - X(backward[a] + backward[b])
+            ) / 2.0 * scale[b];
+            grad_mag_sq += 0.25 * (dx[b] + dx_aug) * (dx[b] + dx_aug);
+            grad_mag_sq_d += 0.25 * (dx[b] + dx_dim) * (dx[b] + dx_dim);
+        }
+        double cx = 0.0, cxd = 0.0;
+        if (k != 0.0) {
+            cx = exp(grad_mag_sq / k);
+            cxd = exp(grad_mag_sq_d / k);
+        }
+'''
+
+_half_derivatives = '''
+    double dx_forward[NDIM], dx_backward[NDIM];
+    for (int a = 0; a < NDIM; a++) {
+        dx_forward[a] = (double)(X(forward[a]) - X(0)) * scale[a];
+        dx_backward[a] = (double)(X(0) - X(backward[a])) * scale[a];
+    }
+'''
+
+# The update is rounded to the pixel type before and after the
+# multiplication with the time step, as with ITK's update buffer.
+_apply_update = '''
+    const T update = (T)delta;
+    y = X(0) + (T)((double)update * time_step);
+'''
+
+# GradientNDAnisotropicDiffusionFunction::ComputeUpdate
+_gradient_update_operation = _derivatives + _half_derivatives + '''
+    double delta = 0.0;
+    for (int a = 0; a < NDIM; a++) {
+''' + _half_gradient_magnitudes + '''
+        delta += dx_forward[a] * cx - dx_backward[a] * cxd;
+    }
+''' + _apply_update
+
+# CurvatureNDAnisotropicDiffusionFunction::ComputeUpdate
+_curvature_update_operation = _derivatives + _half_derivatives + '''
+    double speed = 0.0;
+    for (int a = 0; a < NDIM; a++) {
+''' + _half_gradient_magnitudes + '''
+        speed += dx_forward[a] / sqrt(1.0e-10 + grad_mag_sq) * cx
+                 - dx_backward[a] / sqrt(1.0e-10 + grad_mag_sq_d) * cxd;
+    }
+    // upwind gradient magnitude
+    double propagation_gradient = 0.0;
+    for (int a = 0; a < NDIM; a++) {
+        const double b = speed > 0 ? min(dx_backward[a], 0.0)
+                                   : max(dx_backward[a], 0.0);
+        const double f = speed > 0 ? max(dx_forward[a], 0.0)
+                                   : min(dx_forward[a], 0.0);
+        propagation_gradient += b * b + f * f;
+    }
+    const double delta = sqrt(propagation_gradient) * speed;
+''' + _apply_update
+
+
+@functools.lru_cache(maxsize=None)
+def _kernels(ndim):
+    """``(gradient_magnitude, gradient_update, curvature_update)`` kernels
+    for images of dimension `ndim`.
+
+    The shape and the spacing scale coefficients are passed as scalars so
+    that a kernel is compiled once per dimension and pixel type.
+    """
+    sizes = [f'size_{a}' for a in range(ndim)]
+    scales = [f'scale_{a}' for a in range(ndim)]
+    geometry_params = ''.join(
+        [f', int64 {s}' for s in sizes] + [f', float64 {s}' for s in scales]
+    )
+    geometry = (
+        f"const ptrdiff_t shape[NDIM] = {{{', '.join(sizes)}}};\n"
+        f"const double scale[NDIM] = {{{', '.join(scales)}}};\n"
+    )
+    preamble = f'#define NDIM {ndim}\n' + _preamble
+    gradient_magnitude = cp.ElementwiseKernel(
+        'raw T x, int64 n_voxels' + geometry_params,
+        'float64 partial_sum',
+        geometry + _gradient_magnitude_operation,
+        f'cucim_anisotropic_diffusion_gradient_magnitude_{ndim}d',
+        preamble=preamble,
+    )
+    update_params = (
+        'raw T x, raw float64 average_gradient_magnitude_squared, '
+        'float64 conductance, float64 time_step' + geometry_params
+    )
+    gradient_update = cp.ElementwiseKernel(
+        update_params,
+        'T y',
+        geometry + _gradient_update_operation,
+        f'cucim_gradient_anisotropic_diffusion_{ndim}d',
+        preamble=preamble,
+    )
+    curvature_update = cp.ElementwiseKernel(
+        update_params,
+        'T y',
+        geometry + _curvature_update_operation,
+        f'cucim_curvature_anisotropic_diffusion_{ndim}d',
+        preamble=preamble,
+    )
+    return gradient_magnitude, gradient_update, curvature_update
+
+
+@functools.lru_cache(maxsize=None)
+def _average_kernel():
+    # average of the squared gradient magnitude from the partial sums
+    return cp.ReductionKernel(
+        'float64 partial_sum, int64 n_voxels',
+        'float64 average',
+        'partial_sum',
+        'a + b',
+        'average = a / n_voxels',
+        '0',
+        'cucim_anisotropic_diffusion_average_gradient_magnitude',
+    )
+
+
+def _anisotropic_diffusion(
+    image,
+    spacing,
+    curvature,
+    time_step=None,
+    conductance_parameter=1.0,
+    conductance_scaling_update_interval=1,
+    fixed_average_gradient_magnitude=None,
+    number_of_iterations=1,
+    use_image_spacing=True,
+):
+    """Iterate the gradient (or, if `curvature`, the curvature) anisotropic
+    diffusion update of ITK on `image`.
+
+    `time_step` defaults to ``0.5 / 2**ndim`` as for the ITK filters. If
+    `fixed_average_gradient_magnitude` is given, it is used instead of the
+    average gradient magnitude of the image to scale the conductance.
+    """
+    if conductance_scaling_update_interval < 1:
+        raise ValueError(
+            "conductance_scaling_update_interval must be at least 1"
+        )
+    ndim = image.ndim
+    if time_step is None:
+        time_step = 0.5 / 2 ** ndim
+    if use_image_spacing:
+        scale = tuple(1.0 / s for s in spacing)
+        minimum_spacing = min(spacing)
+    else:
+        scale = (1.0, ) * ndim
+        minimum_spacing = 1.0
+    stable_time_step = minimum_spacing / 2 ** (ndim + 1)
+    if time_step > stable_time_step:
+        warnings.warn(
+            f"Anisotropic diffusion unstable time step: {time_step}. Stable "
+            f"time step for this image must be smaller than "
+            f"{stable_time_step}"
+        )
+
+    dtype = np.promote_types(image.dtype, np.float32)
+    # the iterations alternate between the two buffers
+    current = cp.array(image, dtype=dtype, order='C').reshape(-1)
+    following = cp.empty_like(current)
+    if current.size == 0 or number_of_iterations == 0:
+        return current.reshape(image.shape)
+    gradient_magnitude, gradient_update, curvature_update = _kernels(ndim)
+    update = curvature_update if curvature else gradient_update
+    geometry = tuple(image.shape) + scale
+    average = cp.empty((), cp.float64)
+    if fixed_average_gradient_magnitude is not None:
+        average.fill(fixed_average_gradient_magnitude ** 2)
+    else:
+        partial_sums = cp.empty(
+            min(current.size, _N_PARTIAL_SUMS), cp.float64
+        )
+
+    for iteration in range(number_of_iterations):
+        if (
+            fixed_average_gradient_magnitude is None
+            and iteration % conductance_scaling_update_interval == 0
+        ):
+            gradient_magnitude(
+                current, current.size, *geometry, partial_sums
+            )
+            _average_kernel()(partial_sums, current.size, out=average)
+        update(
+            current, average, conductance_parameter, time_step, *geometry,
+            following,
+        )
+        current, following = following, current
+    return current.reshape(image.shape)
+
+
+def _gradient_anisotropic_diffusion_array(
+    image,
+    spacing,
+    time_step=None,
+    conductance_parameter=1.0,
+    conductance_scaling_update_interval=1,
+    fixed_average_gradient_magnitude=None,
+    number_of_iterations=1,
+    use_image_spacing=True,
+):
+    """Array implementation of
+    `cucim_gradient_anisotropic_diffusion_image_filter`.
+
+    `image` is a NumPy or CuPy array and `spacing` is in array axis order.
+    Other parameters are as for
+    ``itk.GradientAnisotropicDiffusionImageFilter``, see
+    `_anisotropic_diffusion`. Integer images are filtered as float32.
+    """
+    return _anisotropic_diffusion(
+        image, spacing, False, time_step, conductance_parameter,
+        conductance_scaling_update_interval, fixed_average_gradient_magnitude,
+        number_of_iterations, use_image_spacing,
+    )
+
+
+def _curvature_anisotropic_diffusion_array(
+    image,
+    spacing,
+    time_step=None,
+    conductance_parameter=1.0,
+    conductance_scaling_update_interval=1,
+    fixed_average_gradient_magnitude=None,
+    number_of_iterations=1,
+    use_image_spacing=True,
+):
+    """Array implementation of
+    `cucim_curvature_anisotropic_diffusion_image_filter`.
+
+    Parameters are as for `_gradient_anisotropic_diffusion_array`.
+    """
+    return _anisotropic_diffusion(
+        image, spacing, True, time_step, conductance_parameter,
+        conductance_scaling_update_interval, fixed_average_gradient_magnitude,
+        number_of_iterations, use_image_spacing,
+    )
+
+
+def _fixes_average_gradient_magnitude(kwargs):
+    """Whether `kwargs` of an ITK filter's ``New`` set the fixed average
+    gradient magnitude, in either of the spellings ITK accepts."""
+    return any(
+        name in kwargs
+        for name in (
+            'fixed_average_gradient_magnitude',
+            'FixedAverageGradientMagnitude',
+        )
+    )
+
+
+def _run_diffusion_image_filter(input_image, ref_filt, array_filter, fixed):
+    """Execute `array_filter` in a ``PyImageFilter`` with the parameters and
+    output information of `ref_filt`.
+
+    `fixed` tells whether the average gradient magnitude of `ref_filt` has
+    been fixed, which cannot be queried from the ITK filter.
+    """
+    wrapper = itk.PyImageFilter.New(input_image)
+
+    def generate_output_information(wrapper):
+        ref_filt.UpdateOutputInformation()
+        ref_output = ref_filt.GetOutput()
+        wrapper_output = wrapper.GetOutput()
+        # Copy image metadata as computed by the reference CPU filter
+        wrapper_output.CopyInformation(ref_output)
+    wrapper.SetPyGenerateOutputInformation(generate_output_information)
+
+    def generate_data(wrapper):
+        input_image = wrapper.GetInput()
+        input_array = itk.array_view_from_image(input_image)
+
+        output_image = wrapper.GetOutput()
+        output_image.SetBufferedRegion(output_image.GetRequestedRegion())
+        output_image.Allocate()
+        output_array = itk.array_view_from_image(output_image)
+
+        fixed_average_gradient_magnitude = None
+        if fixed:
+            fixed_average_gradient_magnitude = (
+                ref_filt.GetFixedAverageGradientMagnitude()
+            )
+        output = array_filter(
+            input_array,
+            tuple(input_image.GetSpacing())[::-1],
+            time_step=ref_filt.GetTimeStep(),
+            conductance_parameter=ref_filt.GetConductanceParameter(),
+            conductance_scaling_update_interval=(
+                ref_filt.GetConductanceScalingUpdateInterval()
+            ),
+            fixed_average_gradient_magnitude=fixed_average_gradient_magnitude,
+            number_of_iterations=ref_filt.GetNumberOfIterations(),
+            use_image_spacing=ref_filt.GetUseImageSpacing(),
+        )
+        output_array[:] = output.get()[:]
+    wrapper.SetPyGenerateData(generate_data)
+
+    wrapper.Update()
+
+    return wrapper.GetOutput()
+
+
+@accept_array_like_fast_path(_gradient_anisotropic_diffusion_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_gradient_anisotropic_diffusion_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.gradient_anisotropic_diffusion_image_filter``.
+
+    Array inputs are processed without creating ITK objects, see
+    `accept_array_like_fast_path`.
+    """
+    input_image = args[0]
+    ref_filt = itk.GradientAnisotropicDiffusionImageFilter.New(
+        *args, **kwargs
+    )
+    return _run_diffusion_image_filter(
+        input_image, ref_filt, _gradient_anisotropic_diffusion_array,
+        _fixes_average_gradient_magnitude(kwargs),
+    )
+
+
+@accept_array_like_fast_path(_curvature_anisotropic_diffusion_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_curvature_anisotropic_diffusion_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.curvature_anisotropic_diffusion_image_filter``.
+
+    Array inputs are processed without creating ITK objects, see
+    `accept_array_like_fast_path`.
+    """
+    input_image = args[0]
+    ref_filt = itk.CurvatureAnisotropicDiffusionImageFilter.New(
+        *args, **kwargs
+    )
+    return _run_diffusion_image_filter(
+        input_image, ref_filt, _curvature_anisotropic_diffusion_array,
+        _fixes_average_gradient_magnitude(kwargs),
+    )
@@ -0,0 +1,196 @@
+"""Run cuCIM accelerated filters from asyncio code."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cupy as cp
+import itk
+import numpy as np
+
+from ._array_path import _container_type
+
+_thread_local = threading.local()
+
+
+def _input_nbytes(args, kwargs):
+    """Number of bytes of the image and array arguments of a filter call."""
+    nbytes = 0
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, itk.ImageBase):
+            # any image with a NumPy view, e.g. an itk.VectorImage
+            nbytes += itk.array_view_from_image(value).nbytes
+        elif _container_type(value) is not None:
+            itemsize = np.dtype(value.dtype).itemsize
+            nbytes += int(np.prod(value.shape)) * itemsize
+    return nbytes
+
+
+def _run_on_stream(func, args, kwargs):
+    """Run `func` on a CUDA stream owned by the calling worker thread.
+
+    Each worker thread uses its own non-blocking stream, so that the host
+    to device transfers of one request overlap with the kernels of others.
+    """
+    stream = getattr(_thread_local, 'stream', None)
+    if stream is None:
+        stream = cp.cuda.Stream(non_blocking=True)
+        _thread_local.stream = stream
+    with stream:
+        result = func(*args, **kwargs)
+        # results may be device arrays used from another thread
+        stream.synchronize()
+    return result
+
+
+class FilterExecutor:
+    """Awaitable executor for the ``cucim_*`` filters.
+
+    Filter calls are run on a managed thread pool, so they do not block the
+    event loop. Each worker thread uses its own CUDA stream, so that the
+    preparation of one request (conversion from ``itk.Image``, upload to the
+    device) overlaps with the computation of another.
+
+    Admission is limited by a memory budget: a request is only started once
+    the estimated device memory of all requests in flight, including its
+    own, fits in `memory_budget`. A request larger than the budget is
+    started once no other request is in flight.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of worker threads, i.e. the maximum number of requests in
+        flight.
+    memory_budget : int, optional
+        Device memory budget in bytes. If None, admission is only limited by
+        `max_workers`.
+    memory_factor : float, optional
+        Estimated device memory of a request as a multiple of the size of
+        its image arguments, to account for outputs and intermediate
+        arrays.
+
+    Notes
+    -----
+    An executor must only be awaited from a single event loop.
+    """
+
+    def __init__(self, max_workers=4, memory_budget=None, memory_factor=4.0):
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='itk_cucim'
+        )
+        self.memory_budget = memory_budget
+        self.memory_factor = memory_factor
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        self._waiters = []
+
+    @property
+    def in_flight_bytes(self):
+        """Estimated device memory of the requests currently admitted."""
+        return self._in_flight_bytes
+
+    def _fits(self, nbytes):
+        if self.memory_budget is None or self._in_flight == 0:
+            return True
+        return self._in_flight_bytes + nbytes <= self.memory_budget
+
+    async def _acquire(self, nbytes):
+        loop = asyncio.get_running_loop()
+        while not self._fits(nbytes):
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+        self._in_flight_bytes += nbytes
+
+    def _release(self, nbytes):
+        self._in_flight -= 1
+        self._in_flight_bytes -= nbytes
+        # wake all waiting requests; those that still do not fit wait again
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def run(self, filter_function, *args, nbytes=None, **kwargs):
+        """Run ``filter_function(*args, **kwargs)`` on the thread pool.
+
+        Parameters
+        ----------
+        filter_function : callable
+            Typically one of the ``cucim_*`` filters.
+        nbytes : int, optional
+            Device memory of the request, overriding the estimate from the
+            size of the image arguments.
+
+        Cancelling the awaiting task cancels the request if it has not
+        started yet. A request that is already running completes in the
+        background; its memory is released once it finishes.
+        """
+        if nbytes is None:
+            nbytes = int(self.memory_factor * _input_nbytes(args, kwargs))
+        await self._acquire(nbytes)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._pool.submit(
+                _run_on_stream, filter_function, args, kwargs
+            )
+        except BaseException:
+            self._release(nbytes)
+            raise
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release, nbytes)
+            except RuntimeError:
+                # the event loop was closed while the request was running
+                pass
+
+        # Registered before wrap_future's callback, so the memory is
+        # released before the awaiting task resumes.
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wrap_future(future, loop=loop)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def map(self, filter_function, images, **kwargs):
+        """Apply `filter_function` to each of `images` concurrently.
+
+        Returns an awaitable for the list of results, in order.
+        """
+        return asyncio.gather(
+            *(self.run(filter_function, image, **kwargs) for image in images)
+        )
+
+    def shutdown(self, wait=True):
+        """Shut down the thread pool."""
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """The executor used by `run`, created on first use."""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = FilterExecutor()
+    return _default_executor
+
+
+async def run(filter_function, *args, **kwargs):
+    """Await ``filter_function(*args, **kwargs)`` on the default executor."""
+    return await default_executor().run(filter_function, *args, **kwargs)
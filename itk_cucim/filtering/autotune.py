@@ -0,0 +1,318 @@
+"""Selection of the fastest strategy of a filter engine, persisted on disk.
+
+Filter engines with several interchangeable strategies (e.g. direct
+versus FFT convolution, whole-image versus tiled processing) pass them to
+`dispatch`. The first time a shape class is seen, every strategy is
+timed and the fastest is recorded in a `TuningCache`; later calls in the
+same shape class run the recorded strategy directly.
+
+Tuning is opt-in: unless ``ITK_CUCIM_AUTOTUNE=1`` is set, the first
+(default) strategy is always run. The tuning cache is stored as JSON, one
+file per machine fingerprint, in ``$ITK_CUCIM_TUNING_CACHE`` or else
+``~/.cache/itk_cucim/autotune``.
+
+Only strategies with results identical to the default strategy are tuned
+by default. Strategies whose results differ by rounding, such as FFT
+convolution, are added to the candidates if ``ITK_CUCIM_AUTOTUNE_FFT=1``
+is also set.
+"""
+import collections
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+import cupy as cp
+import numpy as np
+
+# Exceptions of a strategy that does not support its input; the strategy is
+# then skipped. Other exceptions are errors and propagate.
+_UNSUPPORTED = (NotImplementedError, cp.cuda.memory.OutOfMemoryError)
+
+
+def machine_fingerprint():
+    """Description of the device and software that timings depend on."""
+    device = cp.cuda.Device()
+    properties = cp.cuda.runtime.getDeviceProperties(device.id)
+    name = properties['name']
+    if isinstance(name, bytes):
+        name = name.decode()
+    try:
+        import cucim
+        cucim_version = cucim.__version__
+    except (ImportError, AttributeError):
+        cucim_version = None
+    return dict(
+        device=name,
+        compute_capability=device.compute_capability,
+        total_memory=int(properties['totalGlobalMem']),
+        runtime_version=cp.cuda.runtime.runtimeGetVersion(),
+        driver_version=cp.cuda.runtime.driverGetVersion(),
+        cupy=cp.__version__,
+        cucim=cucim_version,
+    )
+
+
+def _fingerprint_digest(fingerprint):
+    text = json.dumps(fingerprint, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _default_directory():
+    directory = os.environ.get('ITK_CUCIM_TUNING_CACHE')
+    if directory:
+        return directory
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(cache_home, 'itk_cucim', 'autotune')
+
+
+def shape_class(shape, dtype, *parameters):
+    """Key of the inputs that are expected to share the fastest strategy.
+
+    Each extent of `shape` is rounded up to a power of two. `parameters`
+    are further values that affect the choice, e.g. kernel sizes.
+    """
+    extents = 'x'.join(
+        str(1 << max(int(s) - 1, 0).bit_length()) for s in shape
+    )
+    key = [np.dtype(dtype).name, extents]
+    key.extend(str(p) for p in parameters)
+    return '|'.join(key)
+
+
+TuningStatistics = collections.namedtuple(
+    'TuningStatistics', ['hits', 'tunings', 'entries'],
+)
+
+
+class TuningCache:
+    """On-disk record of the fastest strategy per operation and shape class.
+
+    Entries are stored in a JSON file named after the digest of the
+    machine fingerprint, so that caches of different devices or library
+    versions do not mix. The file is rewritten after each tuning, merged
+    with entries recorded meanwhile by other processes.
+
+    Parameters
+    ----------
+    directory : str or os.PathLike, optional
+        Directory of the cache files. Defaults to
+        ``$ITK_CUCIM_TUNING_CACHE`` or ``~/.cache/itk_cucim/autotune``.
+    fingerprint : dict, optional
+        Machine fingerprint, by default that of the current CUDA device,
+        see `machine_fingerprint`.
+    repeat : int, optional
+        Number of timed runs per strategy, after an untimed warm-up run.
+
+    Examples
+    --------
+    >>> tuning_cache = autotune.get_tuning_cache()
+    >>> tuning_cache.entries()
+    {'separable_convolve': {'float32|64x256x256|33x33x33': {
+        'choice': 'direct', 'timings': {'direct': 0.0021, ...}}}}
+    >>> tuning_cache.reset('separable_convolve')
+    """
+
+    def __init__(self, directory=None, fingerprint=None, repeat=2):
+        if directory is None:
+            directory = _default_directory()
+        self.directory = os.fspath(directory)
+        if fingerprint is None:
+            fingerprint = machine_fingerprint()
+        self.fingerprint = fingerprint
+        self.repeat = repeat
+        self.path = os.path.join(
+            self.directory, _fingerprint_digest(fingerprint) + '.json'
+        )
+        self._lock = threading.RLock()
+        self._entries = self._read()
+        self._hits = 0
+        self._tunings = 0
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                contents = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if contents.get('fingerprint') != self.fingerprint:
+            return {}
+        return contents.get('entries', {})
+
+    def _write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        contents = dict(fingerprint=self.fingerprint, entries=self._entries)
+        # write to a temporary file first so that readers never see a
+        # partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(contents, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, operation, key):
+        """The recorded strategy of `operation` for shape class `key`, or
+        None."""
+        with self._lock:
+            entry = self._entries.get(operation, {}).get(key)
+        return None if entry is None else entry['choice']
+
+    def record(self, operation, key, choice, timings):
+        """Record `choice` as the strategy of `operation` for `key`.
+
+        `timings` maps the strategy names to their time per call in
+        seconds, or None for strategies that do not support the input.
+        """
+        with self._lock:
+            entries = self._read()
+            for name, operation_entries in self._entries.items():
+                entries.setdefault(name, {}).update(operation_entries)
+            entries.setdefault(operation, {})[key] = dict(
+                choice=choice, timings=timings,
+            )
+            self._entries = entries
+            self._write()
+
+    def entries(self):
+        """Copy of all entries, as ``{operation: {key: {'choice': name,
+        'timings': {name: seconds}}}}``."""
+        with self._lock:
+            return json.loads(json.dumps(self._entries))
+
+    def reset(self, operation=None):
+        """Remove the entries of `operation`, or all entries, also from
+        disk, so that they are tuned again."""
+        with self._lock:
+            if operation is None:
+                self._entries = {}
+            else:
+                self._entries.pop(operation, None)
+            if os.path.exists(self.path) or self._entries:
+                self._write()
+
+    def statistics(self):
+        """Number of calls dispatched from the cache, of tunings and of
+        recorded entries."""
+        with self._lock:
+            return TuningStatistics(
+                hits=self._hits,
+                tunings=self._tunings,
+                entries=sum(len(e) for e in self._entries.values()),
+            )
+
+    def _time(self, strategy, args, kwargs):
+        """``(result, seconds per call)`` of a strategy."""
+        result = strategy(*args, **kwargs)  # warm up kernel compilation
+        seconds = math.inf
+        for _ in range(self.repeat):
+            cp.cuda.Device().synchronize()
+            start = time.perf_counter()
+            result = strategy(*args, **kwargs)
+            cp.cuda.Device().synchronize()
+            seconds = min(seconds, time.perf_counter() - start)
+        return result, seconds
+
+    def dispatch(self, operation, key, strategies, *args, **kwargs):
+        """Call the fastest of `strategies` with `args` and `kwargs`.
+
+        Parameters
+        ----------
+        operation : str
+            Name of the operation the strategies implement.
+        key : str
+            Shape class of the input, see `shape_class`.
+        strategies : dict
+            Callables implementing the operation, by name. All must return
+            the same result; the first one is the default. Strategies raise
+            ``NotImplementedError`` for inputs they do not support.
+
+        Returns
+        -------
+        result
+            The result of the chosen strategy.
+        """
+        choice = self.lookup(operation, key)
+        if choice in strategies:
+            with self._lock:
+                self._hits += 1
+            return strategies[choice](*args, **kwargs)
+        if len(strategies) == 1:
+            strategy, = strategies.values()
+            return strategy(*args, **kwargs)
+
+        timings = {}
+        results = {}
+        error = None
+        for name, strategy in strategies.items():
+            try:
+                results[name], timings[name] = self._time(
+                    strategy, args, kwargs
+                )
+            except _UNSUPPORTED as e:
+                timings[name] = None
+                error = e
+        if not results:
+            raise error
+        choice = min(results, key=timings.get)
+        with self._lock:
+            self._tunings += 1
+        self.record(operation, key, choice, timings)
+        if choice != name:
+            # buffers passed in `args` or `kwargs`, e.g. an output array,
+            # hold what the last strategy run wrote to them
+            return strategies[choice](*args, **kwargs)
+        return results[choice]
+
+
+_tuning_cache = None
+_tuning_cache_lock = threading.Lock()
+
+
+def get_tuning_cache():
+    """The `TuningCache` used by the filters, created on first use."""
+    global _tuning_cache
+    with _tuning_cache_lock:
+        if _tuning_cache is None:
+            _tuning_cache = TuningCache()
+        return _tuning_cache
+
+
+def set_tuning_cache(tuning_cache):
+    """Replace the `TuningCache` used by the filters; None restores the
+    default on next use."""
+    global _tuning_cache
+    with _tuning_cache_lock:
+        _tuning_cache = tuning_cache
+
+
+def _flag(name):
+    return os.environ.get(name, '0').lower() in ('1', 'true', 'on', 'yes')
+
+
+def enabled():
+    """Whether filters are tuned, i.e. ``ITK_CUCIM_AUTOTUNE`` is 1."""
+    return _flag('ITK_CUCIM_AUTOTUNE')
+
+
+def fft_enabled():
+    """Whether FFT strategies, whose results differ from those of the
+    direct strategies by rounding, are tuned, i.e. tuning is enabled and
+    ``ITK_CUCIM_AUTOTUNE_FFT`` is 1."""
+    return enabled() and _flag('ITK_CUCIM_AUTOTUNE_FFT')
+
+
+def dispatch(operation, key, strategies, *args, **kwargs):
+    """`TuningCache.dispatch` with the filters' tuning cache.
+
+    If tuning is disabled, the first strategy is called.
+    """
+    if not enabled():
+        strategy = next(iter(strategies.values()))
+        return strategy(*args, **kwargs)
+    return get_tuning_cache().dispatch(
+        operation, key, strategies, *args, **kwargs
+    )
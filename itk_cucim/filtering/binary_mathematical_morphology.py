@@ -0,0 +1,378 @@
+"""cuCIM accelerated filters of ITK's BinaryMathematicalMorphology module."""
+import functools
+import math
+
+import cupy as cp
+import cupyx.scipy.ndimage as ndi
+import itk
+import numpy as np
+from itk.support import helpers
+
+from ._array_path import accept_array_like_fast_path
+from .distance_map import _euclidean_distance
+
+# Ball structuring elements with a smaller radius along all axes are applied
+# with their footprint; for larger ones thresholding a distance transform is
+# faster, as its cost does not depend on the radius.
+_DISTANCE_TRANSFORM_MINIMUM_RADIUS = 3
+
+
+def _kernel_footprint(kernel):
+    """Boolean footprint of an ``itk.FlatStructuringElement``, in array axis
+    order.
+
+    The ITK Python wrapping does not expose the buffer of a structuring
+    element, so the footprint is obtained by dilating a single pixel.
+    """
+    radius = tuple(kernel.GetRadius())[::-1]
+    impulse = np.zeros([2 * r + 1 for r in radius], dtype=np.uint8)
+    impulse[radius] = 1
+    footprint = itk.binary_dilate_image_filter(
+        itk.image_view_from_array(impulse), kernel=kernel, foreground_value=1
+    )
+    return itk.array_from_image(footprint).astype(bool)
+
+
+def _ball_metric(radius):
+    """Sampling and threshold of a distance transform equivalent to a ball.
+
+    ``itk.FlatStructuringElement.Ball(radius)`` contains the offsets ``d``
+    with ``sum((2 * d[i] / (2 * radius[i] + 1))**2) <= 1``. With the integer
+    sampling returned, the squared distance of an offset is an integer and
+    the ball is the set of offsets with a distance of at most `threshold`.
+    No squared distance is within 1/4 of ``threshold**2``, so the comparison
+    is exact in double precision.
+    """
+    widths = [2 * r + 1 for r in radius]
+    lcm = functools.reduce(lambda a, b: a * b // math.gcd(a, b), widths)
+    sampling = tuple(lcm // w for w in widths)
+    return sampling, lcm / 2
+
+
+def _ball_footprint(radius):
+    """Footprint of ``itk.FlatStructuringElement.Ball`` in array axis order."""
+    sampling, threshold = _ball_metric(radius)
+    offsets = np.indices([2 * r + 1 for r in radius]) - np.reshape(
+        radius, (-1, ) + (1, ) * len(radius)
+    )
+    squared_distance = sum(
+        (o * s) ** 2 for o, s in zip(offsets, sampling)
+    )
+    return 4 * squared_distance <= (2 * threshold) ** 2
+
+
+def _ball_radius(footprint):
+    """The radius of `footprint` if it is a ball that is large enough to be
+    applied by thresholding a distance transform, else None."""
+    radius = tuple((s - 1) // 2 for s in footprint.shape)
+    if min(radius) < _DISTANCE_TRANSFORM_MINIMUM_RADIUS:
+        return None
+    if not np.array_equal(footprint, _ball_footprint(radius)):
+        return None
+    return radius
+
+
+def _structuring_element(kernel, ndim):
+    """``(footprint, ball_radius)`` of `kernel`, on the device.
+
+    `kernel` defaults to a box of radius 1, as for the ITK filters.
+    """
+    if kernel is None:
+        footprint = np.ones((3, ) * ndim, dtype=bool)
+    else:
+        footprint = _kernel_footprint(kernel)
+    return cp.asarray(footprint), _ball_radius(footprint)
+
+
+def _dilate(mask, footprint, ball_radius, border_value=False):
+    """Binary dilation of `mask` as by ``itk.BinaryDilateImageFilter``.
+
+    If `border_value` is True, voxels outside of `mask` are foreground.
+    """
+    if ball_radius is None:
+        return ndi.binary_dilation(
+            mask, structure=footprint, border_value=int(border_value)
+        )
+    if border_value:
+        return _dilate(
+            cp.pad(mask, 1, constant_values=True), footprint, ball_radius
+        )[(slice(1, -1), ) * mask.ndim]
+    if not mask.any():
+        return mask.copy()
+    sampling, threshold = _ball_metric(ball_radius)
+    distance = _euclidean_distance(~mask, sampling, float64_distances=True)
+    return distance <= threshold
+
+
+def _erode(mask, footprint, ball_radius, border_value=True):
+    """Binary erosion of `mask` as by ``itk.BinaryErodeImageFilter``.
+
+    If `border_value` is True, voxels outside of `mask` are foreground.
+    """
+    if ball_radius is None:
+        # ITK erodes by the reflected structuring element
+        reflected = footprint[(slice(None, None, -1), ) * footprint.ndim]
+        return ndi.binary_erosion(
+            mask, structure=reflected, border_value=int(border_value)
+        )
+    if not border_value:
+        return _erode(
+            cp.pad(mask, 1, constant_values=False), footprint, ball_radius
+        )[(slice(1, -1), ) * mask.ndim]
+    if mask.all():
+        return mask.copy()
+    sampling, threshold = _ball_metric(ball_radius)
+    distance = _euclidean_distance(mask, sampling, float64_distances=True)
+    return distance > threshold
+
+
+def _pixel_type_range(dtype):
+    """Lowest and largest value of `dtype`, as ``NumericTraits``
+    ``NonpositiveMin`` and ``max``."""
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+    else:
+        info = np.finfo(dtype)
+    return info.min, info.max
+
+
+def _binary_values(dtype, foreground_value, background_value):
+    """Default foreground and background values of the ITK binary filters:
+    the largest and lowest value of the pixel type."""
+    lowest, largest = _pixel_type_range(dtype)
+    if foreground_value is None:
+        foreground_value = largest
+    if background_value is None:
+        background_value = lowest
+    return foreground_value, background_value
+
+
+def _binary_dilate_array(
+    image,
+    spacing,
+    kernel=None,
+    foreground_value=None,
+    background_value=None,
+    boundary_to_foreground=False,
+):
+    """Array implementation of `cucim_binary_dilate_image_filter`.
+
+    `image` is a NumPy or CuPy array and `kernel` an
+    ``itk.FlatStructuringElement``. `spacing` is unused, as the kernel is
+    in pixels. Other parameters are as for ``itk.BinaryDilateImageFilter``.
+    """
+    image = cp.asarray(image)
+    foreground_value, _ = _binary_values(
+        image.dtype, foreground_value, background_value
+    )
+    footprint, ball_radius = _structuring_element(kernel, image.ndim)
+    dilated = _dilate(
+        image == foreground_value, footprint, ball_radius,
+        border_value=boundary_to_foreground,
+    )
+    return cp.where(dilated, image.dtype.type(foreground_value), image)
+
+
+def _binary_erode_array(
+    image,
+    spacing,
+    kernel=None,
+    foreground_value=None,
+    background_value=None,
+    boundary_to_foreground=True,
+):
+    """Array implementation of `cucim_binary_erode_image_filter`.
+
+    Parameters are as for `_binary_dilate_array`.
+    """
+    image = cp.asarray(image)
+    foreground_value, background_value = _binary_values(
+        image.dtype, foreground_value, background_value
+    )
+    footprint, ball_radius = _structuring_element(kernel, image.ndim)
+    foreground = image == foreground_value
+    eroded = _erode(
+        foreground, footprint, ball_radius,
+        border_value=boundary_to_foreground,
+    )
+    return cp.where(
+        foreground & ~eroded, image.dtype.type(background_value), image
+    )
+
+
+def _binary_morphological_opening_array(
+    image,
+    spacing,
+    kernel=None,
+    foreground_value=None,
+    background_value=None,
+):
+    """Array implementation of
+    `cucim_binary_morphological_opening_image_filter`.
+
+    Parameters are as for `_binary_dilate_array`.
+    """
+    image = cp.asarray(image)
+    foreground_value, background_value = _binary_values(
+        image.dtype, foreground_value, background_value
+    )
+    footprint, ball_radius = _structuring_element(kernel, image.ndim)
+    foreground = image == foreground_value
+    eroded = _erode(foreground, footprint, ball_radius)
+    opened = _dilate(eroded, footprint, ball_radius)
+    # as the ITK filter: an erosion followed by a dilation of its output
+    output = cp.where(
+        foreground & ~eroded, image.dtype.type(background_value), image
+    )
+    output[opened] = foreground_value
+    return output
+
+
+def _binary_morphological_closing_array(
+    image,
+    spacing,
+    kernel=None,
+    foreground_value=None,
+    safe_border=True,
+):
+    """Array implementation of
+    `cucim_binary_morphological_closing_image_filter`.
+
+    Parameters are as for `_binary_dilate_array`.
+    """
+    image = cp.asarray(image)
+    foreground_value, _ = _binary_values(image.dtype, foreground_value, None)
+    footprint, ball_radius = _structuring_element(kernel, image.ndim)
+    foreground = image == foreground_value
+    if safe_border:
+        # pad, so that the dilation is not cut off by the image boundary
+        pad = [(s - 1) // 2 for s in footprint.shape]
+        foreground = cp.pad(foreground, [(p, p) for p in pad])
+    dilated = _dilate(foreground, footprint, ball_radius)
+    closed = _erode(dilated, footprint, ball_radius)
+    if safe_border:
+        closed = closed[
+            tuple(slice(p, p + s) for p, s in zip(pad, image.shape))
+        ]
+    return cp.where(closed, image.dtype.type(foreground_value), image)
+
+
+def _run_kernel_image_filter(input_image, ref_filt, array_filter, parameters):
+    """Execute `array_filter` in a ``PyImageFilter`` with the output
+    information of `ref_filt`.
+
+    `parameters` maps the keyword arguments of `array_filter` to the names
+    of the getters of `ref_filt`.
+    """
+    wrapper = itk.PyImageFilter.New(input_image)
+
+    def generate_output_information(wrapper):
+        ref_filt.UpdateOutputInformation()
+        ref_output = ref_filt.GetOutput()
+        wrapper_output = wrapper.GetOutput()
+        # Copy image metadata as computed by the reference CPU filter
+        wrapper_output.CopyInformation(ref_output)
+    wrapper.SetPyGenerateOutputInformation(generate_output_information)
+
+    def generate_data(wrapper):
+        input_image = wrapper.GetInput()
+        input_array = itk.array_view_from_image(input_image)
+
+        output_image = wrapper.GetOutput()
+        output_image.SetBufferedRegion(output_image.GetRequestedRegion())
+        output_image.Allocate()
+        output_array = itk.array_view_from_image(output_image)
+
+        kwargs = {
+            name: getattr(ref_filt, getter)()
+            for name, getter in parameters.items()
+        }
+        output = array_filter(
+            input_array,
+            tuple(input_image.GetSpacing())[::-1],
+            kernel=ref_filt.GetKernel(),
+            **kwargs,
+        )
+        output_array[:] = output.get()[:]
+    wrapper.SetPyGenerateData(generate_data)
+
+    wrapper.Update()
+
+    return wrapper.GetOutput()
+
+
+@accept_array_like_fast_path(_binary_dilate_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_binary_dilate_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.binary_dilate_image_filter``.
+
+    Ball kernels (``itk.FlatStructuringElement.Ball``) with a radius of at
+    least 3 along each axis are applied by thresholding a Euclidean distance
+    transform, with a cost independent of the radius. Other kernels are
+    applied with their footprint. The output is identical to ITK's.
+    """
+    input_image = args[0]
+    ref_filt = itk.BinaryDilateImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _binary_dilate_array,
+        dict(
+            foreground_value='GetForegroundValue',
+            background_value='GetBackgroundValue',
+            boundary_to_foreground='GetBoundaryToForeground',
+        ),
+    )
+
+
+@accept_array_like_fast_path(_binary_erode_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_binary_erode_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.binary_erode_image_filter``.
+
+    See `cucim_binary_dilate_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.BinaryErodeImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _binary_erode_array,
+        dict(
+            foreground_value='GetForegroundValue',
+            background_value='GetBackgroundValue',
+            boundary_to_foreground='GetBoundaryToForeground',
+        ),
+    )
+
+
+@accept_array_like_fast_path(_binary_morphological_opening_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_binary_morphological_opening_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.binary_morphological_opening_image_filter``.
+
+    See `cucim_binary_dilate_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.BinaryMorphologicalOpeningImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _binary_morphological_opening_array,
+        dict(
+            foreground_value='GetForegroundValue',
+            background_value='GetBackgroundValue',
+        ),
+    )
+
+
+@accept_array_like_fast_path(_binary_morphological_closing_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_binary_morphological_closing_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.binary_morphological_closing_image_filter``.
+
+    See `cucim_binary_dilate_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.BinaryMorphologicalClosingImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _binary_morphological_closing_array,
+        dict(
+            foreground_value='GetForegroundValue',
+            safe_border='GetSafeBorder',
+        ),
+    )
@@ -0,0 +1,340 @@
+"""Content-addressed cache of filter results."""
+import collections
+import functools
+import hashlib
+import os
+import pickle
+import threading
+
+import cupy as cp
+import itk
+import numpy as np
+
+from ._array_path import _container_type
+
+try:
+    # xxHash is considerably faster than the hashlib algorithms for large
+    # buffers; it is not a hard dependency.
+    import xxhash
+
+    def _hasher():
+        return xxhash.xxh3_128()
+except ImportError:
+    def _hasher():
+        return hashlib.blake2b(digest_size=16)
+
+
+def _update_with_array(hasher, array):
+    array = np.ascontiguousarray(cp.asnumpy(array))
+    hasher.update(repr((array.shape, array.dtype.str)).encode())
+    hasher.update(memoryview(array.reshape(-1).view(np.uint8)))
+
+
+def _update_with_value(hasher, value):
+    """Add an argument of a filter call to `hasher`.
+
+    Returns False if the value cannot be hashed by content.
+    """
+    if isinstance(value, itk.Image):
+        # pixel type, dimension and all metadata that ITK filters propagate
+        hasher.update(type(value).__name__.encode())
+        hasher.update(repr((
+            tuple(value.GetLargestPossibleRegion().GetIndex()),
+            tuple(value.GetSpacing()),
+            tuple(value.GetOrigin()),
+            itk.array_from_matrix(value.GetDirection()).tolist(),
+        )).encode())
+        _update_with_array(hasher, itk.array_view_from_image(value))
+        return True
+    container = _container_type(value)
+    if container == 'xarray':
+        hasher.update(repr((value.dims, value.name)).encode())
+        for dim in value.dims:
+            if dim in value.coords:
+                _update_with_array(hasher, np.asarray(value.coords[dim]))
+        hasher.update(repr(sorted(
+            (k, repr(v)) for k, v in value.attrs.items()
+        )).encode())
+        _update_with_array(hasher, value.data)
+        return True
+    if container == 'torch':
+        hasher.update(repr(('torch', str(value.device))).encode())
+        _update_with_array(hasher, value.detach().cpu().numpy())
+        return True
+    if container is not None:
+        hasher.update(container.encode())
+        _update_with_array(hasher, value)
+        return True
+    if isinstance(value, itk.Object):
+        return False
+    if isinstance(value, (list, tuple)):
+        hasher.update(type(value).__name__.encode())
+        return all(_update_with_value(hasher, v) for v in value)
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        hasher.update(repr(value).encode())
+        return True
+    if isinstance(value, np.generic):
+        hasher.update(repr(value.item()).encode())
+        return True
+    return False
+
+
+def _nbytes(value):
+    """Memory held by a cached result."""
+    if isinstance(value, itk.Image):
+        return itk.array_view_from_image(value).nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    container = _container_type(value)
+    if container == 'xarray':
+        return value.data.nbytes
+    if container == 'torch':
+        return value.element_size() * value.nelement()
+    if container is not None:
+        return value.nbytes
+    return 0
+
+
+def _copy(value):
+    """Deep copy of a result, so the cache and caller do not share buffers."""
+    if isinstance(value, itk.Image):
+        duplicate = itk.image_duplicator(value)
+        duplicate.SetMetaDataDictionary(value.GetMetaDataDictionary())
+        return duplicate
+    if isinstance(value, tuple):
+        copies = [_copy(v) for v in value]
+        if hasattr(value, '_fields'):
+            # named tuples, e.g. the results of the statistics filters
+            return type(value)(*copies)
+        return tuple(copies)
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    container = _container_type(value)
+    if container == 'xarray':
+        return value.copy(deep=True)
+    if container == 'torch':
+        return value.clone()
+    if container is not None:
+        return value.copy()
+    return value
+
+
+def _metadata(image):
+    """Entries of the metadata dictionary of an ``itk.Image`` that are not
+    restored by pickle."""
+    ignore_keys = {'origin', 'spacing', 'direction'}
+    return {k: v for k, v in dict(image).items() if k not in ignore_keys}
+
+
+class _SpilledImage:
+    """An ``itk.Image`` as spilled to disk, with the state that pickle does
+    not restore: the region indices and the metadata dictionary."""
+
+    def __init__(self, image):
+        self.image = image
+        self.regions = [
+            (tuple(region.GetIndex()), tuple(region.GetSize()))
+            for region in (
+                image.GetLargestPossibleRegion(),
+                image.GetBufferedRegion(),
+                image.GetRequestedRegion(),
+            )
+        ]
+        self.metadata = _metadata(image)
+
+    def restore(self):
+        image = self.image
+        setters = (
+            image.SetLargestPossibleRegion,
+            image.SetBufferedRegion,
+            image.SetRequestedRegion,
+        )
+        for setter, (index, size) in zip(setters, self.regions):
+            region = itk.ImageRegion[image.GetImageDimension()]()
+            region.SetIndex(index)
+            region.SetSize(size)
+            setter(region)
+        for k, v in self.metadata.items():
+            image[k] = v
+        return image
+
+
+def _map_images(function, value):
+    """Apply `function` to the images in a result, recursing into tuples,
+    lists and dicts."""
+    if isinstance(value, (itk.Image, _SpilledImage)):
+        return function(value)
+    if isinstance(value, tuple):
+        mapped = [_map_images(function, v) for v in value]
+        if hasattr(value, '_fields'):
+            return type(value)(*mapped)
+        return tuple(mapped)
+    if isinstance(value, list):
+        return [_map_images(function, v) for v in value]
+    if isinstance(value, dict):
+        return {k: _map_images(function, v) for k, v in value.items()}
+    return value
+
+
+def _dump(value, f):
+    value = _map_images(_SpilledImage, value)
+    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load(f):
+    return _map_images(_SpilledImage.restore, pickle.load(f))
+
+
+CacheStatistics = collections.namedtuple(
+    'CacheStatistics',
+    ['hits', 'misses', 'evictions', 'disk_hits', 'bypasses', 'entries',
+     'nbytes'],
+)
+
+
+class ResultCache:
+    """Opt-in cache of the results of the ``cucim_*`` filters.
+
+    Results are keyed by a content hash of the image buffers, their ITK
+    metadata (pixel type, region index, spacing, origin, direction), the
+    filter and its parameters. A cache hit returns a copy of the stored
+    result, identical in pixels and metadata to the result of the original
+    call.
+
+    Entries are held in memory up to `max_bytes` and evicted in least
+    recently used order. If `directory` is given, evicted entries are
+    spilled to it and reloaded on a later hit.
+
+    Calls with arguments that cannot be hashed by content (e.g. ITK objects
+    other than images) are passed through to the filter and counted as
+    bypasses.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Memory budget of the in-memory entries.
+    directory : str or os.PathLike, optional
+        Directory to spill evicted entries to. Entries are stored with
+        `pickle`, so only use a directory that is not writable by others.
+
+    Examples
+    --------
+    >>> cache = ResultCache(max_bytes=2**30)
+    >>> smooth = cache.wrap(smoothing.cucim_discrete_gaussian_image_filter)
+    >>> smoothed = smooth(image, variance=4)  # computed
+    >>> smoothed = smooth(image, variance=4)  # from the cache
+    """
+
+    def __init__(self, max_bytes=1 << 30, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = None if directory is None else os.fspath(directory)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_hits = 0
+        self._bypasses = 0
+
+    def key(self, filter_function, *args, **kwargs):
+        """The cache key of a filter call, or None if it is not cacheable."""
+        hasher = _hasher()
+        name = f"{filter_function.__module__}.{filter_function.__qualname__}"
+        hasher.update(name.encode())
+        for value in args:
+            if not _update_with_value(hasher, value):
+                return None
+        for keyword in sorted(kwargs):
+            hasher.update(keyword.encode())
+            if not _update_with_value(hasher, kwargs[keyword]):
+                return None
+        return hasher.hexdigest()
+
+    def __call__(self, filter_function, *args, **kwargs):
+        """Return ``filter_function(*args, **kwargs)``, from the cache if
+        possible."""
+        key = self.key(filter_function, *args, **kwargs)
+        if key is None:
+            with self._lock:
+                self._bypasses += 1
+            return filter_function(*args, **kwargs)
+        with self._lock:
+            result = self._lookup(key)
+        if result is not None:
+            return _copy(result)
+        result = filter_function(*args, **kwargs)
+        with self._lock:
+            self._misses += 1
+            self._insert(key, _copy(result))
+        return result
+
+    def wrap(self, filter_function):
+        """Wrap `filter_function` so that its calls go through the cache."""
+        @functools.wraps(filter_function)
+        def cached_filter(*args, **kwargs):
+            return self(filter_function, *args, **kwargs)
+        return cached_filter
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _lookup(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return self._entries[key]
+        if self.directory is not None:
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    result = _load(f)
+                os.remove(path)
+                self._hits += 1
+                self._disk_hits += 1
+                self._insert(key, result)
+                return result
+        return None
+
+    def _insert(self, key, result):
+        nbytes = _nbytes(result)
+        if key in self._entries:
+            self._nbytes -= _nbytes(self._entries.pop(key))
+        self._entries[key] = result
+        self._nbytes += nbytes
+        while self._nbytes > self.max_bytes and self._entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._nbytes -= _nbytes(evicted)
+            self._evictions += 1
+            if self.directory is not None:
+                with open(self._path(evicted_key), 'wb') as f:
+                    _dump(evicted, f)
+
+    def statistics(self):
+        """Hit, miss, eviction and bypass counts and the in-memory size."""
+        with self._lock:
+            return CacheStatistics(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                disk_hits=self._disk_hits,
+                bypasses=self._bypasses,
+                entries=len(self._entries),
+                nbytes=self._nbytes,
+            )
+
+    def clear(self):
+        """Remove all entries, including those spilled to disk."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            if self.directory is not None:
+                for name in os.listdir(self.directory):
+                    if name.endswith('.pickle'):
+                        os.remove(os.path.join(self.directory, name))
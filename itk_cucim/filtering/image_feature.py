@@ -8,9 +8,62 @@ import itk
 import numpy as np
 from itk.support import helpers
 
-from ._discrete_gaussian import discrete_gaussian_derivative_filter
+from ._array_path import accept_array_like_fast_path, itk_to_array_order
+from ._discrete_gaussian import (
+    discrete_gaussian_derivative_filter,
+    discrete_gaussian_derivative_kernels,
+    separable_convolve,
+)
+from ._image_filter import CucimImageFilter
+from .scratch import get_scratch_pool
 
 
+def _discrete_gaussian_derivative_kwargs(
+    ndim, spacing, variance, order, maximum_error, maximum_kernel_width,
+    use_image_spacing, normalize_across_scale,
+):
+    """Keyword arguments of `discrete_gaussian_derivative_filter` for ITK
+    parameters."""
+    variance = itk_to_array_order(variance, ndim)
+    if not use_image_spacing:
+        spacing = (1.0, ) * ndim
+    return dict(
+        sigma=tuple(math.sqrt(v) for v in variance),
+        order=itk_to_array_order(order, ndim, dtype=int),
+        spacing=spacing,
+        normalize_across_scale=normalize_across_scale,
+        max_error=itk_to_array_order(maximum_error, ndim),
+        max_half_width=maximum_kernel_width - 1,
+    )
+
+
+def _discrete_gaussian_derivative_array(
+    image,
+    spacing,
+    variance=0.0,
+    order=1,
+    maximum_error=0.01,
+    maximum_kernel_width=32,
+    use_image_spacing=True,
+    normalize_across_scale=False,
+):
+    """Array implementation of
+    `cucim_discrete_gaussian_derivative_image_filter`.
+
+    `image` is a NumPy or CuPy array and `spacing` is in array axis order.
+    Other parameters are as for ``itk.DiscreteGaussianDerivativeImageFilter``,
+    with sequences in ITK's ``(x, y, z)`` order.
+    """
+    return discrete_gaussian_derivative_filter(
+        cp.asarray(image),
+        **_discrete_gaussian_derivative_kwargs(
+            image.ndim, spacing, variance, order, maximum_error,
+            maximum_kernel_width, use_image_spacing, normalize_across_scale,
+        )
+    )
+
+
+@accept_array_like_fast_path(_discrete_gaussian_derivative_array)
 @helpers.accept_array_like_xarray_torch
 def cucim_discrete_gaussian_derivative_image_filter(*args, **kwargs):
     input_image = args[0]
@@ -28,37 +81,67 @@ def cucim_discrete_gaussian_derivative_image_filter(*args, **kwargs):
     def generate_data(wrapper):
         input_image = wrapper.GetInput()
         input_array = itk.array_view_from_image(input_image)
-        cu_input_array = cp.array(input_array)
 
         output_image = wrapper.GetOutput()
         output_image.SetBufferedRegion(output_image.GetRequestedRegion())
         output_image.Allocate()
         output_array = itk.array_view_from_image(output_image)
 
-        maximum_error = ref_filt.GetMaximumError()
-        maximum_kernel_width = ref_filt.GetMaximumKernelWidth()
-        use_image_spacing = ref_filt.GetUseImageSpacing()
-        normalize_across_scale = ref_filt.GetNormalizeAcrossScale()
-        variance = ref_filt.GetVariance()
-        sigma = tuple(math.sqrt(v) for v in reversed(variance))
-        order = tuple(reversed(ref_filt.GetOrder()))
-
-        if use_image_spacing:
-            spacing = tuple(input_image.GetSpacing())
-        else:
-            spacing = (1.0, ) * input_array.ndim
-        cu_output_array = discrete_gaussian_derivative_filter(
-            cu_input_array,
-            sigma=sigma,
-            order=order,
-            spacing=spacing,
-            normalize_across_scale=normalize_across_scale,
-            max_error=maximum_error,
-            max_half_width=maximum_kernel_width - 1,
+        derivative_kwargs = _discrete_gaussian_derivative_kwargs(
+            input_array.ndim,
+            tuple(input_image.GetSpacing())[::-1],
+            variance=tuple(ref_filt.GetVariance()),
+            order=tuple(ref_filt.GetOrder()),
+            maximum_error=tuple(ref_filt.GetMaximumError()),
+            maximum_kernel_width=ref_filt.GetMaximumKernelWidth(),
+            use_image_spacing=ref_filt.GetUseImageSpacing(),
+            normalize_across_scale=ref_filt.GetNormalizeAcrossScale(),
         )
-        output_array[:] = cu_output_array.get()[:]
+        # the device input and output are only needed for this call
+        with get_scratch_pool().scope() as buffers:
+            cu_output_array = discrete_gaussian_derivative_filter(
+                buffers.asarray(input_array),
+                output=buffers.empty(output_array.shape, output_array.dtype),
+                **derivative_kwargs,
+            )
+            cu_output_array.get(out=output_array)
     wrapper.SetPyGenerateData(generate_data)
 
     wrapper.Update()
 
     return wrapper.GetOutput()
+
+
+class CucimDiscreteGaussianDerivativeImageFilter(CucimImageFilter):
+    """Reusable cuCIM accelerated ``itk.DiscreteGaussianDerivativeImageFilter``.
+
+    The per-axis kernels and the scratch buffers of the separable
+    convolution are kept across invocations.
+    """
+
+    _parameters = dict(
+        variance=0.0,
+        order=1,
+        maximum_error=0.01,
+        maximum_kernel_width=32,
+        use_image_spacing=True,
+        normalize_across_scale=False,
+    )
+
+    def _derive_state(self, shape, dtype, spacing):
+        ndim = len(shape)
+        kernels = discrete_gaussian_derivative_kernels(
+            ndim,
+            **_discrete_gaussian_derivative_kwargs(
+                ndim, spacing, **self._values
+            )
+        )
+        return dict(
+            kernels=[cp.asarray(h) for h in kernels],
+            scratch=[cp.empty(shape, dtype) for _ in range(min(ndim - 1, 2))],
+        )
+
+    def _generate_data(self, image, state, output):
+        separable_convolve(
+            image, state['kernels'], output=output, scratch=state['scratch']
+        )
@@ -1,10 +1,46 @@
 """cuCIM accelerated filters for the ITKImageGrid module."""
+import functools
+import math
+
 import cupy as cp
+import cupyx.scipy.ndimage as ndi
 import itk
+import numpy as np
 from cucim.skimage.transform import downscale_local_mean
 from itk.support import helpers
 
+from ._array_path import accept_array_like_fast_path, itk_to_array_order
+from ._image_filter import CucimImageFilter
+from .scratch import get_scratch_pool
+
+
+def _bin_shrink_shape(shape, shrink_factors):
+    """Output shape of a bin shrink (`shrink_factors` in array axis order)."""
+    return tuple(max(s // f, 1) for s, f in zip(shape, shrink_factors))
+
+
+def _bin_shrink_array(image, spacing, shrink_factors=1):
+    """Array implementation of `cucim_bin_shrink_image_filter`.
+
+    `image` is a NumPy or CuPy array. `shrink_factors` is a scalar or a
+    sequence in ITK's ``(x, y, z)`` order. `spacing` is unused.
+    """
+    shrink_factors = itk_to_array_order(shrink_factors, image.ndim, dtype=int)
+    expected_shape = _bin_shrink_shape(image.shape, shrink_factors)
+    cu_output_array = downscale_local_mean(cp.asarray(image), shrink_factors)
+    # Note: downscale_local_mean pads the shape up to a multiple of the
+    #       shrink factor, so we need to truncate to the expected shape.
+    out_slices = tuple(slice(s) for s in expected_shape)
+    return cu_output_array[out_slices].astype(image.dtype, copy=False)
+
 
+def _bin_shrink_grid(shape, spacing, shrink_factors=1):
+    """Output sample positions of `_bin_shrink_array` in input index units."""
+    shrink_factors = itk_to_array_order(shrink_factors, len(shape), dtype=int)
+    return tuple(((f - 1) / 2, f) for f in shrink_factors)
+
+
+@accept_array_like_fast_path(_bin_shrink_array, output_grid=_bin_shrink_grid)
 @helpers.accept_array_like_xarray_torch
 def cucim_bin_shrink_image_filter(*args, **kwargs):
     input_image = args[0]
@@ -27,25 +63,500 @@ def cucim_bin_shrink_image_filter(*args, **kwargs):
     def generate_data(wrapper):
         input_image = wrapper.GetInput()
         input_array = itk.array_view_from_image(input_image)
-        cu_input_array = cp.array(input_array)
 
         output_image = wrapper.GetOutput()
         output_image.SetBufferedRegion(output_image.GetRequestedRegion())
         output_image.Allocate()
         output_array = itk.array_view_from_image(output_image)
 
-        shrink_factors = tuple(reversed(ref_filt.GetShrinkFactors()))
-        expected_shape = tuple(
-            max(s // f, 1) for s, f in zip(input_array.shape, shrink_factors)
+        with get_scratch_pool().scope() as buffers:
+            cu_output_array = _bin_shrink_array(
+                buffers.asarray(input_array),
+                tuple(input_image.GetSpacing())[::-1],
+                shrink_factors=tuple(ref_filt.GetShrinkFactors()),
+            )
+            output_array[:] = cu_output_array.get()[:]
+    wrapper.SetPyGenerateData(generate_data)
+
+    wrapper.Update()
+
+    return wrapper.GetOutput()
+
+
+class CucimBinShrinkImageFilter(CucimImageFilter):
+    """Reusable cuCIM accelerated ``itk.BinShrinkImageFilter``.
+
+    The output buffers and the reference filter used to compute the output
+    metadata are kept across invocations.
+    """
+
+    _parameters = dict(shrink_factors=1)
+
+    def __init__(self, *args, **kwargs):
+        self._ref_filt = None
+        super().__init__(*args, **kwargs)
+
+    def _derive_state(self, shape, dtype, spacing):
+        shrink_factors = itk_to_array_order(
+            self._values['shrink_factors'], len(shape), dtype=int
         )
-        cu_output_array = downscale_local_mean(
-            cu_input_array,
-            shrink_factors,
+        output_shape = _bin_shrink_shape(shape, shrink_factors)
+        return dict(
+            shrink_factors=shrink_factors,
+            out_slices=tuple(slice(s) for s in output_shape),
         )
+
+    def _output_shape(self, shape):
+        return _bin_shrink_shape(shape, self._state['shrink_factors'])
+
+    def _generate_data(self, image, state, output):
+        cu_output_array = downscale_local_mean(image, state['shrink_factors'])
         # Note: downscale_local_mean pads the shape up to a multiple of the
         #       shrink factor, so we need to truncate to the expected shape.
-        out_slices = tuple(slice(s) for s in expected_shape)
-        output_array[:] = cu_output_array[out_slices].get()[:]
+        cp.copyto(
+            output, cu_output_array[state['out_slices']], casting='unsafe'
+        )
+
+    def _update_output_information(self, input_image, output_image):
+        image_type = type(input_image)
+        if self._ref_filt is None or self._ref_filt_type != image_type:
+            self._ref_filt = itk.BinShrinkImageFilter[
+                image_type, image_type
+            ].New()
+            self._ref_filt_type = image_type
+        self._ref_filt.SetInput(input_image)
+        self._ref_filt.SetShrinkFactors(
+            self._state['shrink_factors'][::-1]
+        )
+        self._ref_filt.UpdateOutputInformation()
+        output_image.CopyInformation(self._ref_filt.GetOutput())
+
+
+# Tolerance, in input voxels, below which a coordinate of the index mapping
+# is considered integral, and an off-diagonal matrix element zero.
+_RESAMPLE_TOLERANCE = 1e-9
+
+# Output voxels whose input continuous index is outside of
+# [-0.5, size - 0.5) along any axis are set to the default pixel value, as
+# by the ITK interpolators' IsInsideBuffer.
+# `affine` holds a row ``(matrix[k], offset[k], input_shape[k])`` per axis.
+_fill_outside_operation = '''
+    for (int k = 0; k < NDIM; k++) {
+        const double* row = &affine[k * (NDIM + 2)];
+        double c = row[NDIM];
+        for (int j = 0; j < NDIM; j++) {
+            c += row[j] * _ind.get()[j];
+        }
+        if (c < -0.5 || c >= row[NDIM + 1] - 0.5) {
+            y = (T)default_value;
+            break;
+        }
+    }
+'''
+
+
+@functools.lru_cache(maxsize=None)
+def _fill_outside_kernel(ndim):
+    # the dimensions are not collapsed so that _ind is the output index
+    return cp.ElementwiseKernel(
+        'raw float64 affine, float64 default_value',
+        'T y',
+        _fill_outside_operation,
+        f'cucim_resample_fill_outside_{ndim}d',
+        reduce_dims=False,
+        preamble=f'#define NDIM {ndim}\n',
+    )
+
+
+def _interpolation_order(interpolator):
+    """``(order, mode)`` of ``ndimage`` interpolation equivalent to the ITK
+    `interpolator`.
+
+    Linear and nearest neighbor interpolation clamp to the edge voxels, and
+    B-spline interpolation mirrors the image at its edges.
+    """
+    if interpolator is None:
+        return 1, 'nearest'
+    name = interpolator.GetNameOfClass()
+    if name == 'LinearInterpolateImageFunction':
+        return 1, 'nearest'
+    if name == 'NearestNeighborInterpolateImageFunction':
+        return 0, 'nearest'
+    if name == 'BSplineInterpolateImageFunction':
+        return itk.down_cast(interpolator).GetSplineOrder(), 'mirror'
+    raise NotImplementedError(
+        "only linear, nearest neighbor and B-spline interpolators are "
+        f"supported, not {name}"
+    )
+
+
+def _linear_transform(transform, ndim):
+    """``(matrix, offset)`` of a linear ITK `transform`, mapping a point
+    ``p`` in ITK's ``(x, y, z)`` order to ``matrix @ p + offset``."""
+    if transform is None:
+        return np.eye(ndim), np.zeros(ndim)
+    transform = itk.down_cast(transform)
+    if hasattr(transform, 'GetMatrix') and hasattr(transform, 'GetOffset'):
+        # affine, Euler, scale and other matrix offset transforms
+        return (
+            itk.array_from_matrix(transform.GetMatrix()),
+            np.array(transform.GetOffset(), dtype=np.float64),
+        )
+    if not transform.IsLinear():
+        raise NotImplementedError("only linear transforms are supported")
+    # identity, translation and compositions of linear transforms
+    offset = np.array(transform.TransformPoint([0.0] * ndim))
+    matrix = np.column_stack([
+        np.array(transform.TransformPoint(list(e))) - offset
+        for e in np.eye(ndim)
+    ])
+    return matrix, offset
+
+
+def _index_affine(linear_transform, input_geometry, output_geometry):
+    """Affine map from output to input array indices, in array axis order.
+
+    `linear_transform` is as returned by `_linear_transform`. The
+    geometries are ``(origin, spacing, direction)`` in ITK's ``(x, y, z)``
+    order, with the origin being the physical point of the first voxel of
+    the array.
+    """
+    matrix, offset = linear_transform
+    origin, spacing, direction = (np.asarray(g) for g in input_geometry)
+    to_index = np.linalg.inv(direction * spacing)
+    out_origin, out_spacing, out_direction = (
+        np.asarray(g) for g in output_geometry
+    )
+    index_matrix = to_index @ matrix @ (out_direction * out_spacing)
+    index_offset = to_index @ (matrix @ out_origin + offset - origin)
+    return index_matrix[::-1, ::-1], index_offset[::-1]
+
+
+def _binomial(n, k):
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+
+
+def _spline_taps(coordinates, order, size, mode):
+    """Input indices and weights of the `order` + 1 samples interpolating
+    each of the 1D `coordinates`, as arrays of shape
+    ``(len(coordinates), order + 1)``."""
+    if order == 0:
+        index = np.floor(coordinates + 0.5)[:, np.newaxis]
+        weights = np.ones_like(index)
+    else:
+        start = np.floor(coordinates + 0.5 * (order % 2 == 0)) - order // 2
+        index = start[:, np.newaxis] + np.arange(order + 1)
+        # centered cardinal B-spline of degree `order`
+        x = coordinates[:, np.newaxis] - index + (order + 1) / 2
+        weights = sum(
+            (-1) ** k * _binomial(order + 1, k)
+            * np.maximum(x - k, 0) ** order
+            for k in range(order + 2)
+        ) / math.factorial(order)
+    index = index.astype(np.int64)
+    if mode == 'mirror' and size > 1:
+        period = 2 * (size - 1)
+        index = np.abs(index) % period
+        index = np.where(index >= size, period - index, index)
+    else:
+        index = np.clip(index, 0, size - 1)
+    return index, weights
+
+
+# Accumulation of the interpolation taps, as ``sum(take(image) * weight)``.
+_weighted_add_kernel = cp.ElementwiseKernel(
+    'T x, float64 w',
+    'float64 y',
+    'y += (double)x * w',
+    'cucim_resample_weighted_add',
+)
+
+# Cast as ITK's ResampleImageFilter: clamp to the range of the integer
+# output type and truncate. Weighted sums of equal neighbors may fall just
+# short of an integer, which would then be truncated to the next lower
+# one, hence the scaling by 1 + 1e-12.
+_cast_integer_kernel = cp.ElementwiseKernel(
+    'F x, float64 lo, float64 hi',
+    'T y',
+    'y = (T)trunc(min(max((double)x * (1 + 1e-12), lo), hi))',
+    'cucim_resample_cast_integer',
+)
+
+
+def _resample_axis(image, axis, coordinates, order, mode, buffers):
+    """Resample `image` at the `coordinates` along `axis`.
+
+    Intermediate arrays, including the result unless it is a view of
+    `image`, are drawn from the `ScratchScope` `buffers`.
+    """
+    size = image.shape[axis]
+    shape = list(image.shape)
+    shape[axis] = len(coordinates)
+    index = np.rint(coordinates).astype(np.int64)
+    if order <= 1 and np.all(
+        np.abs(coordinates - index) <= _RESAMPLE_TOLERANCE
+    ):
+        # integral coordinates: a strided view, as for a shrink
+        step = int(index[1] - index[0]) if len(index) > 1 else 1
+        if step != 0:
+            stop = int(index[-1]) + step
+            stop = stop if stop >= 0 else None
+            axis_slice = slice(int(index[0]), stop, step)
+            return image[(slice(None), ) * axis + (axis_slice, )]
+        return cp.take(
+            image, cp.asarray(index), axis=axis,
+            out=buffers.empty(shape, image.dtype),
+        )
+    if order > 1:
+        image = ndi.spline_filter1d(
+            image, order, axis=axis, mode=mode,
+            output=buffers.empty(image.shape, cp.float64),
+        )
+    index, weights = _spline_taps(coordinates, order, size, mode)
+    index = cp.asarray(index)
+    if order == 0:
+        return cp.take(
+            image, index[:, 0], axis=axis,
+            out=buffers.empty(shape, image.dtype),
+        )
+    weight_shape = [1] * image.ndim
+    weight_shape[axis] = -1
+    weights = cp.asarray(weights)
+    term = buffers.empty(shape, image.dtype)
+    output = buffers.empty(shape, cp.float64)
+    output.fill(0)
+    for tap in range(index.shape[1]):
+        cp.take(image, index[:, tap], axis=axis, out=term)
+        _weighted_add_kernel(
+            term, weights[:, tap].reshape(weight_shape), output
+        )
+    return output
+
+
+def _cast_output(values, output):
+    """Write interpolated `values` to `output`, clamping to the range of
+    integer types and truncating as ITK's ResampleImageFilter."""
+    if output.dtype.kind in 'iu' and values.dtype != output.dtype:
+        info = np.iinfo(output.dtype)
+        _cast_integer_kernel(
+            values, float(info.min), float(info.max), output
+        )
+    else:
+        output[...] = values
+    return output
+
+
+def _resample(image, index_matrix, index_offset, output_shape, order, mode,
+              default_value, output=None):
+    """Resample `image` on the output grid of `output_shape`, whose array
+    indices map to the input array indices ``index_matrix @ i +
+    index_offset``.
+
+    Transforms without rotation or shear are applied separably, one axis
+    after the other, with strided views for integral index mappings. Other
+    transforms are applied with ``ndimage.affine_transform``. The result
+    is written to `output` if given. Intermediate arrays are drawn from
+    the scratch pool.
+    """
+    image = cp.asarray(image)
+    if output is None:
+        output = cp.empty(tuple(output_shape), image.dtype)
+    off_diagonal = index_matrix - np.diag(np.diag(index_matrix))
+    if np.all(np.abs(off_diagonal) <= _RESAMPLE_TOLERANCE):
+        return _resample_separable(
+            image, np.diag(index_matrix), index_offset, output, order,
+            mode, default_value,
+        )
+    compute_dtype = image.dtype if image.dtype.kind == 'f' else cp.float64
+    with get_scratch_pool().scope() as buffers:
+        values = output
+        if compute_dtype != output.dtype:
+            values = buffers.empty(output.shape, compute_dtype)
+        ndi.affine_transform(
+            image, cp.asarray(index_matrix), cp.asarray(index_offset),
+            output_shape=output.shape, output=values, order=order,
+            mode=mode,
+        )
+        affine = np.column_stack([index_matrix, index_offset, image.shape])
+        _fill_outside_kernel(image.ndim)(
+            cp.asarray(affine.ravel()), float(default_value), values
+        )
+        return _cast_output(values, output)
+
+
+def _resample_separable(image, scale, offset, output, order, mode,
+                        default_value):
+    """Resample with the index mapping ``scale * i + offset``, writing to
+    `output`."""
+    values = image
+    inside = []
+    with get_scratch_pool().scope() as buffers:
+        for axis, (n, a, b) in enumerate(zip(output.shape, scale, offset)):
+            coordinates = a * np.arange(n) + b
+            valid = np.flatnonzero(
+                (coordinates >= -0.5)
+                & (coordinates < image.shape[axis] - 0.5)
+            )
+            if valid.size == 0:
+                output.fill(default_value)
+                return output
+            # the valid coordinates are contiguous, as they are monotonic
+            inside.append(slice(valid[0], valid[-1] + 1))
+            values = _resample_axis(
+                values, axis, coordinates[inside[-1]], order, mode, buffers
+            )
+        if values.shape != output.shape:
+            output.fill(default_value)
+        _cast_output(values, output[tuple(inside)])
+    return output
+
+
+def _resample_array(
+    image,
+    spacing,
+    transform=None,
+    interpolator=None,
+    size=None,
+    output_spacing=None,
+    output_origin=None,
+    output_direction=None,
+    output_start_index=None,
+    default_pixel_value=0,
+):
+    """Array implementation of `cucim_resample_image_filter`.
+
+    `image` is a NumPy or CuPy array with its first voxel at the origin,
+    identity direction and `spacing` in array axis order. `transform` and
+    `interpolator` are ITK objects and other parameters are as for
+    ``itk.ResampleImageFilter``, in ITK's ``(x, y, z)`` order. Unlike for
+    the ITK filter, the output grid defaults to the input grid.
+    `output_origin` is relative to the first input voxel, also for
+    ``xarray.DataArray`` inputs with coords.
+    """
+    ndim = image.ndim
+    input_spacing = tuple(spacing)[::-1]
+    if size is None:
+        size = image.shape[::-1]
+    if output_spacing is None:
+        output_spacing = input_spacing
+    output_spacing = itk_to_array_order(output_spacing, ndim)[::-1]
+    if output_origin is None:
+        output_origin = (0.0, ) * ndim
+    if output_direction is None:
+        output_direction = np.eye(ndim)
+    output_direction = np.asarray(output_direction, dtype=np.float64)
+    if output_start_index is None:
+        output_start_index = (0, ) * ndim
+    # physical point of the first output voxel
+    output_origin = np.asarray(output_origin, dtype=np.float64) + (
+        output_direction @ (np.asarray(output_start_index) * output_spacing)
+    )
+    index_matrix, index_offset = _index_affine(
+        _linear_transform(transform, ndim),
+        (np.zeros(ndim), input_spacing, np.eye(ndim)),
+        (output_origin, output_spacing, output_direction),
+    )
+    order, mode = _interpolation_order(interpolator)
+    return _resample(
+        image, index_matrix, index_offset, tuple(size)[::-1], order, mode,
+        default_pixel_value,
+    )
+
+
+def _resample_grid(
+    shape,
+    spacing,
+    output_spacing=None,
+    output_origin=None,
+    output_start_index=None,
+    **kwargs,
+):
+    """Output sample positions of `_resample_array` in input index units,
+    ignoring the transform and output direction."""
+    ndim = len(shape)
+    start = np.zeros(ndim)
+    if output_origin is not None:
+        start = np.asarray(output_origin, dtype=np.float64)[::-1]
+    step = np.ones(ndim)
+    if output_spacing is not None:
+        step = np.asarray(itk_to_array_order(output_spacing, ndim)) / spacing
+    if output_start_index is not None:
+        start = start + np.asarray(output_start_index)[::-1] * step * spacing
+    return tuple(zip(start / spacing, step))
+
+
+def _image_geometry(image):
+    """``(origin, spacing, direction)`` of the buffer of an ``itk.Image``,
+    with the origin being the physical point of its first voxel."""
+    start = np.array(image.GetBufferedRegion().GetIndex(), dtype=np.float64)
+    spacing = np.array(image.GetSpacing(), dtype=np.float64)
+    direction = itk.array_from_matrix(image.GetDirection())
+    origin = np.array(image.GetOrigin(), dtype=np.float64)
+    return origin + direction @ (start * spacing), spacing, direction
+
+
+@accept_array_like_fast_path(_resample_array, output_grid=_resample_grid)
+@helpers.accept_array_like_xarray_torch
+def cucim_resample_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.resample_image_filter``.
+
+    Supports linear transforms (e.g. affine, Euler, scale, translation)
+    and linear, nearest neighbor and B-spline interpolators. Transforms
+    without rotation or shear, relative to the image grids, are applied
+    separably, and integer subsampling with strided views. The output
+    metadata is computed by the ITK filter.
+
+    Array inputs are processed without creating ITK objects, see
+    `accept_array_like_fast_path`; their output grid defaults to the input
+    grid and `output_origin` is relative to their first voxel.
+    """
+    input_image = args[0]
+    ref_filt = itk.ResampleImageFilter.New(*args, **kwargs)
+    if ref_filt.GetExtrapolator() is not None:
+        raise NotImplementedError("extrapolators are not supported")
+    order, mode = _interpolation_order(ref_filt.GetInterpolator())
+    linear_transform = _linear_transform(
+        ref_filt.GetTransform(), input_image.GetImageDimension()
+    )
+    wrapper = itk.PyImageFilter.New(input_image)
+
+    def generate_output_information(wrapper):
+        ref_filt.UpdateOutputInformation()
+        ref_output = ref_filt.GetOutput()
+        wrapper_output = wrapper.GetOutput()
+        # Copy image metadata as computed by the reference CPU filter
+        wrapper_output.CopyInformation(ref_output)
+    wrapper.SetPyGenerateOutputInformation(generate_output_information)
+
+    def generate_input_requested_region(wrapper):
+        # any input voxel may be needed for the output grid
+        input_image = wrapper.GetInput()
+        input_image.SetRequestedRegionToLargestPossibleRegion()
+    wrapper.SetPyGenerateInputRequestedRegion(generate_input_requested_region)
+
+    def generate_data(wrapper):
+        input_image = wrapper.GetInput()
+        input_array = itk.array_view_from_image(input_image)
+
+        output_image = wrapper.GetOutput()
+        output_image.SetBufferedRegion(output_image.GetRequestedRegion())
+        output_image.Allocate()
+        output_array = itk.array_view_from_image(output_image)
+
+        index_matrix, index_offset = _index_affine(
+            linear_transform,
+            _image_geometry(input_image),
+            _image_geometry(output_image),
+        )
+        # the device input and output are only needed for this call
+        with get_scratch_pool().scope() as buffers:
+            output = _resample(
+                buffers.asarray(input_array), index_matrix, index_offset,
+                output_array.shape, order, mode,
+                ref_filt.GetDefaultPixelValue(),
+                output=buffers.empty(output_array.shape, output_array.dtype),
+            )
+            output.get(out=output_array)
     wrapper.SetPyGenerateData(generate_data)
 
     wrapper.Update()
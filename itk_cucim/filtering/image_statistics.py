@@ -0,0 +1,267 @@
+"""cuCIM accelerated filters for the ITKImageStatistics module.
+
+The ITK filters store their results in the filter object, to be read with
+getters after ``Update``; the ``cucim_*`` functions return them instead,
+as named tuples or, for the label statistics, as a dict of named tuples
+by label. All statistics are computed in a single pass over the image
+(and label image) by the fused reduction of `_statistics_reduction`.
+"""
+import collections
+import math
+
+import itk
+import numpy as np
+from itk.support import helpers
+
+from ._array_path import (
+    _container_type,
+    _to_array,
+    accept_array_like_fast_path,
+)
+from ._statistics_reduction import (
+    histogram_bin_edges,
+    pixel_type_range,
+    reduce_statistics,
+)
+from .scratch import get_scratch_pool
+
+MinimumMaximum = collections.namedtuple(
+    'MinimumMaximum', ['minimum', 'maximum'],
+)
+
+ImageStatistics = collections.namedtuple(
+    'ImageStatistics',
+    ['minimum', 'maximum', 'mean', 'sigma', 'variance', 'sum',
+     'sum_of_squares'],
+)
+
+LabelStatistics = collections.namedtuple(
+    'LabelStatistics',
+    ['minimum', 'maximum', 'mean', 'median', 'sigma', 'variance', 'sum',
+     'count', 'bounding_box', 'histogram'],
+)
+
+
+def _reduce(image, **kwargs):
+    """`reduce_statistics` of a NumPy or CuPy array and, if given, a label
+    array, copied to the device through the scratch pool."""
+    with get_scratch_pool().scope() as buffers:
+        labels = kwargs.pop('labels', None)
+        if labels is not None:
+            labels = buffers.asarray(labels)
+        return reduce_statistics(
+            buffers.asarray(image), labels=labels, **kwargs
+        )
+
+
+def _minimum_maximum_array(image, spacing):
+    """Array implementation of `cucim_minimum_maximum_image_filter`."""
+    reduction = _reduce(image)
+    return MinimumMaximum(
+        minimum=reduction.minimum[0].item(),
+        maximum=reduction.maximum[0].item(),
+    )
+
+
+@accept_array_like_fast_path(_minimum_maximum_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_minimum_maximum_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.MinimumMaximumImageFilter``.
+
+    Returns
+    -------
+    MinimumMaximum
+        Named tuple of the ``minimum`` and ``maximum`` pixel values, as
+        returned by ``GetMinimum`` and ``GetMaximum``.
+    """
+    input_image = args[0]
+    # validates the arguments as for the ITK filter
+    itk.MinimumMaximumImageFilter.New(*args, **kwargs)
+    return _minimum_maximum_array(
+        itk.array_view_from_image(input_image),
+        tuple(input_image.GetSpacing())[::-1],
+    )
+
+
+def _statistics_array(image, spacing):
+    """Array implementation of `cucim_statistics_image_filter`."""
+    reduction = _reduce(image)
+    count = np.float64(reduction.count[0])
+    total = np.float64(reduction.sum[0])
+    sum_of_squares = np.float64(reduction.sum_of_squares[0])
+    # ITK's formulas, also for the NaN results of images with one voxel
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = (sum_of_squares - total * total / count) / (count - 1)
+        sigma = np.sqrt(variance)
+    return ImageStatistics(
+        minimum=reduction.minimum[0].item(),
+        maximum=reduction.maximum[0].item(),
+        mean=float(mean),
+        sigma=float(sigma),
+        variance=float(variance),
+        sum=float(total),
+        sum_of_squares=float(sum_of_squares),
+    )
+
+
+@accept_array_like_fast_path(_statistics_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_statistics_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.StatisticsImageFilter``.
+
+    Returns
+    -------
+    ImageStatistics
+        Named tuple of the values returned by the ``GetMinimum``,
+        ``GetMaximum``, ``GetMean``, ``GetSigma``, ``GetVariance``,
+        ``GetSum`` and ``GetSumOfSquares`` methods of the ITK filter.
+
+    Notes
+    -----
+    For 8 and 16 bit integer images, the sums are exact and all values are
+    identical to ITK's. For other images, the sums are accumulated in
+    double precision in a different order than ITK's compensated
+    summation and may differ in the last digits.
+    """
+    input_image = args[0]
+    itk.StatisticsImageFilter.New(*args, **kwargs)
+    return _statistics_array(
+        itk.array_view_from_image(input_image),
+        tuple(input_image.GetSpacing())[::-1],
+    )
+
+
+def _input_array(value, name):
+    """View the ``itk.Image`` or array-like input `name` of a filter, e.g.
+    its label image, as a NumPy or CuPy array."""
+    if isinstance(value, itk.Image):
+        return itk.array_view_from_image(value)
+    container = _container_type(value)
+    array = None
+    if container is not None:
+        array, _ = _to_array(value, container)
+    if array is None:
+        raise TypeError(f"unsupported {name} type: {type(value)}")
+    return array
+
+
+def _median(frequencies, count, edges):
+    """Median estimate of ITK's ``LabelStatisticsImageFilter::GetMedian``:
+    the center of the first bin at which the cumulative frequency exceeds
+    half of `count`."""
+    n_bins = frequencies.size
+    cumulative = np.cumsum(frequencies)
+    b = min(int(np.searchsorted(cumulative, count // 2, side='right')),
+            n_bins - 1)
+    low, high = edges[b], edges[b + 1]
+    # NaN, as in ITK, for the infinite bins of the default histogram
+    # parameters of floating point images
+    with np.errstate(over='ignore', invalid='ignore'):
+        return float(low + (high - low) / 2)
+
+
+def _label_statistics_array(
+    image,
+    spacing,
+    label_input=None,
+    use_histograms=False,
+    histogram_parameters=None,
+):
+    """Array implementation of `cucim_label_statistics_image_filter`.
+
+    `histogram_parameters` is the ``(number_of_bins, lower, upper)`` of
+    ``SetHistogramParameters``. Returns a dict of `LabelStatistics` by
+    label, in ascending label order.
+    """
+    if label_input is None:
+        raise ValueError("label_input is required")
+    labels = _input_array(label_input, 'label_input')
+    if tuple(labels.shape) != tuple(image.shape):
+        raise ValueError("label_input must have the shape of the image")
+    edges = None
+    if use_histograms:
+        if histogram_parameters is None:
+            histogram_parameters = (256, ) + pixel_type_range(image.dtype)
+        edges = histogram_bin_edges(*histogram_parameters)
+    reduction = _reduce(
+        image, labels=labels, bins=edges, bounding_box=True
+    )
+
+    statistics = {}
+    for i, label in enumerate(reduction.labels.tolist()):
+        count = int(reduction.count[i])
+        total = float(reduction.sum[i])
+        sum_of_squares = float(reduction.sum_of_squares[i])
+        mean = total / count
+        if count > 1:
+            variance = (sum_of_squares - total * total / count) / (count - 1)
+        else:
+            variance = 0.0
+        start, stop = reduction.bounding_box[i].T
+        median = 0.0
+        histogram = None
+        if edges is not None:
+            histogram = reduction.histogram[i]
+            median = _median(histogram, count, edges)
+        statistics[label] = LabelStatistics(
+            minimum=float(reduction.minimum[i]),
+            maximum=float(reduction.maximum[i]),
+            mean=mean,
+            median=median,
+            sigma=math.sqrt(variance),
+            variance=variance,
+            sum=total,
+            count=count,
+            # ITK's (x_start, x_stop, y_start, y_stop, ...) order
+            bounding_box=tuple(
+                int(index) for ax in reversed(range(image.ndim))
+                for index in (start[ax], stop[ax])
+            ),
+            histogram=histogram,
+        )
+    return statistics
+
+
+@accept_array_like_fast_path(_label_statistics_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_label_statistics_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.LabelStatisticsImageFilter``.
+
+    The label image is passed as `label_input`, and the histogram
+    parameters, if `use_histograms` is True, as `histogram_parameters`, the
+    ``(number_of_bins, lower, upper)`` arguments of
+    ``SetHistogramParameters``.
+
+    Returns
+    -------
+    dict
+        `LabelStatistics` named tuple of each label of the label image, in
+        ascending label order, with the values returned by the getters of
+        the ITK filter for that label. ``histogram`` holds the bin
+        frequencies of the label's histogram if `use_histograms` is True,
+        and is None otherwise.
+
+    Notes
+    -----
+    As for `cucim_statistics_image_filter`, the sums of images other than
+    8 and 16 bit integer images may differ from ITK's in the last digits.
+    """
+    input_image = args[0]
+    kwargs = kwargs.copy()
+    label_image = kwargs.pop('label_input', None)
+    if label_image is None:
+        raise ValueError("label_input is required")
+    histogram_parameters = kwargs.get('histogram_parameters')
+    # ITK Python's New() picks the first wrapped label image type, so the
+    # filter has to be instantiated for the actual types
+    ref_filt = itk.LabelStatisticsImageFilter[
+        type(input_image), type(label_image)
+    ].New(*args, label_input=label_image, **kwargs)
+    return _label_statistics_array(
+        itk.array_view_from_image(input_image),
+        tuple(input_image.GetSpacing())[::-1],
+        label_input=label_image,
+        use_histograms=ref_filt.GetUseHistograms(),
+        histogram_parameters=histogram_parameters,
+    )
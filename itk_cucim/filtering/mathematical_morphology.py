@@ -0,0 +1,200 @@
+"""cuCIM accelerated filters of ITK's MathematicalMorphology module."""
+import cupy as cp
+import cupyx.scipy.ndimage as ndi
+import itk
+import numpy as np
+from itk.support import helpers
+
+from ._array_path import accept_array_like_fast_path, itk_radius_to_footprint
+from ._van_herk_gil_werman import maximum_filter, minimum_filter
+from .binary_mathematical_morphology import (
+    _kernel_footprint,
+    _pixel_type_range,
+    _run_kernel_image_filter,
+)
+
+
+def _flat_structuring_element(kernel, ndim):
+    """``(footprint, box_radius)`` of `kernel`.
+
+    `box_radius` is the radius in array axis order if `kernel` is a box,
+    else None. `kernel` defaults to a box of radius 1, as for the ITK
+    filters.
+    """
+    if kernel is None:
+        radius, footprint = itk_radius_to_footprint(1, ndim)
+        return footprint.astype(bool), radius
+    footprint = _kernel_footprint(kernel)
+    radius, box = itk_radius_to_footprint(tuple(kernel.GetRadius()), ndim)
+    if not np.array_equal(footprint, cp.asnumpy(box)):
+        radius = None
+    return cp.asarray(footprint), radius
+
+
+def _pad(image, footprint, value):
+    """Pad `image` by the radius of `footprint` with a constant `value`."""
+    pad = [(s - 1) // 2 for s in footprint.shape]
+    padded = cp.pad(image, [(p, p) for p in pad], constant_values=value)
+    crop = tuple(slice(p, p + s) for p, s in zip(pad, image.shape))
+    return padded, crop
+
+
+def _erode(image, footprint, box_radius, boundary=None):
+    """Grayscale erosion as by ``itk.GrayscaleErodeImageFilter``.
+
+    Voxels outside of `image` have the value `boundary`; by default the
+    largest value of the dtype, so that they are ignored.
+    """
+    _, largest = _pixel_type_range(image.dtype)
+    if boundary is not None and boundary != largest:
+        padded, crop = _pad(image, footprint, boundary)
+        return _erode(padded, footprint, box_radius)[crop]
+    if box_radius is not None:
+        return minimum_filter(image, box_radius)
+    return ndi.minimum_filter(
+        image, footprint=footprint, mode='constant', cval=largest
+    )
+
+
+def _dilate(image, footprint, box_radius, boundary=None):
+    """Grayscale dilation as by ``itk.GrayscaleDilateImageFilter``.
+
+    Voxels outside of `image` have the value `boundary`; by default the
+    lowest value of the dtype, so that they are ignored.
+    """
+    lowest, _ = _pixel_type_range(image.dtype)
+    if boundary is not None and boundary != lowest:
+        padded, crop = _pad(image, footprint, boundary)
+        return _dilate(padded, footprint, box_radius)[crop]
+    if box_radius is not None:
+        return maximum_filter(image, box_radius)
+    return ndi.maximum_filter(
+        image, footprint=footprint, mode='constant', cval=lowest
+    )
+
+
+def _grayscale_erode_array(image, spacing, kernel=None, boundary=None):
+    """Array implementation of `cucim_grayscale_erode_image_filter`.
+
+    `image` is a NumPy or CuPy array and `kernel` an
+    ``itk.FlatStructuringElement``. `spacing` is unused, as the kernel is
+    in pixels. `boundary` defaults to the largest value of the dtype.
+    """
+    image = cp.asarray(image)
+    footprint, box_radius = _flat_structuring_element(kernel, image.ndim)
+    return _erode(image, footprint, box_radius, boundary)
+
+
+def _grayscale_dilate_array(image, spacing, kernel=None, boundary=None):
+    """Array implementation of `cucim_grayscale_dilate_image_filter`.
+
+    Parameters are as for `_grayscale_erode_array`; `boundary` defaults to
+    the lowest value of the dtype.
+    """
+    image = cp.asarray(image)
+    footprint, box_radius = _flat_structuring_element(kernel, image.ndim)
+    return _dilate(image, footprint, box_radius, boundary)
+
+
+def _grayscale_morphological_opening_array(
+    image, spacing, kernel=None, safe_border=True
+):
+    """Array implementation of
+    `cucim_grayscale_morphological_opening_image_filter`.
+
+    Parameters are as for `_grayscale_erode_array`.
+    """
+    image = cp.asarray(image)
+    footprint, box_radius = _flat_structuring_element(kernel, image.ndim)
+    if safe_border:
+        _, largest = _pixel_type_range(image.dtype)
+        padded, crop = _pad(image, footprint, largest)
+    else:
+        padded, crop = image, Ellipsis
+    eroded = _erode(padded, footprint, box_radius)
+    return _dilate(eroded, footprint, box_radius)[crop]
+
+
+def _grayscale_morphological_closing_array(
+    image, spacing, kernel=None, safe_border=True
+):
+    """Array implementation of
+    `cucim_grayscale_morphological_closing_image_filter`.
+
+    Parameters are as for `_grayscale_erode_array`.
+    """
+    image = cp.asarray(image)
+    footprint, box_radius = _flat_structuring_element(kernel, image.ndim)
+    if safe_border:
+        lowest, _ = _pixel_type_range(image.dtype)
+        padded, crop = _pad(image, footprint, lowest)
+    else:
+        padded, crop = image, Ellipsis
+    dilated = _dilate(padded, footprint, box_radius)
+    return _erode(dilated, footprint, box_radius)[crop]
+
+
+@accept_array_like_fast_path(_grayscale_erode_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_grayscale_erode_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.grayscale_erode_image_filter``.
+
+    Box kernels (``itk.FlatStructuringElement.Box``) are applied with the
+    separable van Herk/Gil-Werman algorithm, with a cost independent of the
+    radius. Other kernels are applied with their footprint.
+    """
+    input_image = args[0]
+    ref_filt = itk.GrayscaleErodeImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _grayscale_erode_array,
+        dict(boundary='GetBoundary'),
+    )
+
+
+@accept_array_like_fast_path(_grayscale_dilate_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_grayscale_dilate_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.grayscale_dilate_image_filter``.
+
+    See `cucim_grayscale_erode_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.GrayscaleDilateImageFilter.New(*args, **kwargs)
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _grayscale_dilate_array,
+        dict(boundary='GetBoundary'),
+    )
+
+
+@accept_array_like_fast_path(_grayscale_morphological_opening_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_grayscale_morphological_opening_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.grayscale_morphological_opening_image_filter``.
+
+    See `cucim_grayscale_erode_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.GrayscaleMorphologicalOpeningImageFilter.New(
+        *args, **kwargs
+    )
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _grayscale_morphological_opening_array,
+        dict(safe_border='GetSafeBorder'),
+    )
+
+
+@accept_array_like_fast_path(_grayscale_morphological_closing_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_grayscale_morphological_closing_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.grayscale_morphological_closing_image_filter``.
+
+    See `cucim_grayscale_erode_image_filter` for the handling of kernels.
+    """
+    input_image = args[0]
+    ref_filt = itk.GrayscaleMorphologicalClosingImageFilter.New(
+        *args, **kwargs
+    )
+    return _run_kernel_image_filter(
+        input_image, ref_filt, _grayscale_morphological_closing_array,
+        dict(safe_border='GetSafeBorder'),
+    )
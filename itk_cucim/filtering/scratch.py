@@ -0,0 +1,220 @@
+"""Pool of device scratch buffers shared by the filter engines.
+
+The filters draw their device input copies, intermediate arrays and, where
+the result is copied back to an ``itk.Image``, output arrays from a
+`ScratchPool` and return them when done. Buffers are kept in buckets of
+similar size, so a loop over same-shaped images reuses the buffers of the
+previous iteration instead of allocating new ones.
+"""
+import collections
+import contextlib
+import threading
+
+import cupy as cp
+import numpy as np
+
+# Smaller requests are served by CuPy's allocator directly.
+_MIN_NBYTES = 1 << 16
+
+
+def _bucket(nbytes):
+    """Size of the buffers serving requests of `nbytes`: the next size of
+    the form ``2**k * (4 + j) / 4`` with ``j`` in ``0..3``."""
+    k = max(int(nbytes) - 1, 1).bit_length() - 3
+    step = 1 << max(k, 0)
+    return -(-nbytes // step) * step
+
+
+ScratchStatistics = collections.namedtuple(
+    'ScratchStatistics',
+    ['acquisitions', 'reuses', 'allocations', 'overflows', 'nbytes',
+     'in_use_nbytes', 'peak_nbytes', 'reuse_rate'],
+)
+
+
+class ScratchPool:
+    """Size-bucketed pool of device buffers.
+
+    Buffers are reused on the CUDA stream they were acquired on, so that a
+    buffer is never handed out while kernels of another stream may still
+    use it.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Memory cap of the buffers held by the pool, in use or free. Free
+        buffers are released to CuPy, least recently used first, to stay
+        below the cap; requests that would exceed it anyway are allocated
+        outside of the pool and counted as overflows.
+
+    Examples
+    --------
+    >>> pool = scratch.get_scratch_pool()
+    >>> with pool.scope() as buffers:
+    ...     device_image = buffers.asarray(host_image)
+    ...     smoothed = buffers.empty(device_image.shape, np.float32)
+    ...     ...
+    >>> pool.statistics().reuse_rate
+    """
+
+    def __init__(self, max_bytes=1 << 31):
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # (stream, bucket) -> free buffers, least recently released first
+        self._free = collections.OrderedDict()
+        # pointer -> (stream, bucket, buffer) of the buffers in use
+        self._in_use = {}
+        self._nbytes = 0
+        self._in_use_nbytes = 0
+        self._peak_nbytes = 0
+        self._acquisitions = 0
+        self._reuses = 0
+        self._allocations = 0
+        self._overflows = 0
+
+    def empty(self, shape, dtype):
+        """An uninitialized CuPy array from the pool.
+
+        Return it with `release` once it is no longer used.
+        """
+        dtype = np.dtype(dtype)
+        shape = tuple(int(s) for s in np.atleast_1d(shape))
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if nbytes < _MIN_NBYTES:
+            return cp.empty(shape, dtype)
+        bucket = _bucket(nbytes)
+        stream = cp.cuda.get_current_stream().ptr
+        with self._lock:
+            self._acquisitions += 1
+            buffer = self._pop_free(stream, bucket)
+            if buffer is not None:
+                self._reuses += 1
+            else:
+                self._trim(self.max_bytes - bucket)
+                if self._nbytes + bucket > self.max_bytes:
+                    self._overflows += 1
+                    return cp.empty(shape, dtype)
+                buffer = cp.empty(bucket, np.uint8)
+                self._allocations += 1
+                self._nbytes += bucket
+                self._peak_nbytes = max(self._peak_nbytes, self._nbytes)
+            self._in_use[buffer.data.ptr] = (stream, bucket, buffer)
+            self._in_use_nbytes += bucket
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def asarray(self, array):
+        """`array` on the device; host arrays are copied into a buffer of
+        the pool, CuPy arrays are returned as is."""
+        if isinstance(array, cp.ndarray):
+            return array
+        array = np.asarray(array)
+        device_array = self.empty(array.shape, array.dtype)
+        device_array.set(np.ascontiguousarray(array))
+        return device_array
+
+    def release(self, *arrays):
+        """Return arrays obtained from `empty` or `asarray` to the pool.
+
+        Arrays that were not drawn from the pool are ignored.
+        """
+        with self._lock:
+            for array in arrays:
+                entry = self._in_use.pop(array.data.ptr, None)
+                if entry is None:
+                    continue
+                stream, bucket, buffer = entry
+                self._in_use_nbytes -= bucket
+                key = (stream, bucket)
+                self._free.setdefault(key, []).append(buffer)
+                self._free.move_to_end(key)
+            self._trim(self.max_bytes)
+
+    @contextlib.contextmanager
+    def scope(self):
+        """Context manager yielding a `ScratchScope`, whose arrays are
+        returned to the pool on exit."""
+        buffers = ScratchScope(self)
+        try:
+            yield buffers
+        finally:
+            self.release(*buffers.arrays)
+
+    def _pop_free(self, stream, bucket):
+        buffers = self._free.get((stream, bucket))
+        if not buffers:
+            return None
+        buffer = buffers.pop()
+        if not buffers:
+            del self._free[(stream, bucket)]
+        return buffer
+
+    def _trim(self, max_bytes):
+        """Free the least recently released buffers until the pool holds at
+        most `max_bytes`."""
+        while self._nbytes > max_bytes and self._free:
+            key, buffers = next(iter(self._free.items()))
+            buffers.pop(0)
+            if not buffers:
+                del self._free[key]
+            self._nbytes -= key[1]
+
+    def statistics(self):
+        """Acquisition counts and the memory held by the pool."""
+        with self._lock:
+            return ScratchStatistics(
+                acquisitions=self._acquisitions,
+                reuses=self._reuses,
+                allocations=self._allocations,
+                overflows=self._overflows,
+                nbytes=self._nbytes,
+                in_use_nbytes=self._in_use_nbytes,
+                peak_nbytes=self._peak_nbytes,
+                reuse_rate=self._reuses / max(self._acquisitions, 1),
+            )
+
+    def clear(self):
+        """Release all free buffers to CuPy."""
+        with self._lock:
+            self._trim(0)
+
+
+class ScratchScope:
+    """Arrays drawn from a `ScratchPool` within `ScratchPool.scope`."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.arrays = []
+
+    def empty(self, shape, dtype):
+        """See `ScratchPool.empty`."""
+        array = self.pool.empty(shape, dtype)
+        self.arrays.append(array)
+        return array
+
+    def asarray(self, array):
+        """See `ScratchPool.asarray`."""
+        device_array = self.pool.asarray(array)
+        if device_array is not array:
+            self.arrays.append(device_array)
+        return device_array
+
+
+_scratch_pool = None
+_scratch_pool_lock = threading.Lock()
+
+
+def get_scratch_pool():
+    """The `ScratchPool` used by the filters, created on first use."""
+    global _scratch_pool
+    with _scratch_pool_lock:
+        if _scratch_pool is None:
+            _scratch_pool = ScratchPool()
+        return _scratch_pool
+
+
+def set_scratch_pool(pool):
+    """Replace the `ScratchPool` used by the filters; None restores a new
+    default pool on next use."""
+    global _scratch_pool
+    with _scratch_pool_lock:
+        _scratch_pool = pool
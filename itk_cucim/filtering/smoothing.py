@@ -1,4 +1,6 @@
 """cuCIM accelerated filters for the ITKSmoothing module."""
+import functools
+import inspect
 import math
 import warnings
 
@@ -8,11 +10,123 @@ import itk
 import numpy as np
 from itk.support import helpers
 
-from ._discrete_gaussian import discrete_gaussian_filter
+from . import autotune
+from ._array_path import (
+    accept_array_like_fast_path,
+    itk_radius_to_footprint,
+    itk_to_array_order,
+)
+from ._discrete_gaussian import (
+    discrete_gaussian_derivative_kernels,
+    discrete_gaussian_filter,
+    normalized_discrete_gaussian_filter,
+    separable_convolve,
+)
+from ._image_filter import CucimImageFilter
+from ._masking import as_mask_array, masked_filter
+from .scratch import get_scratch_pool
 
 
+def _cast_result(array, dtype):
+    """Cast a floating point result to `dtype`, truncating for integer types
+    as ITK's ``static_cast`` and the other smoothing paths do."""
+    return array.astype(dtype, copy=False)
+
+
+def _masked_output(image, mask):
+    """Copy of `image` to write masked results into, and `mask` on the same
+    device."""
+    xp = cp.get_array_module(image)
+    mask = as_mask_array(mask, image.shape)
+    if xp is np:
+        mask = cp.asnumpy(mask)
+    else:
+        mask = cp.asarray(mask)
+    return xp.array(image, copy=True), mask
+
+
+def _discrete_gaussian_kwargs(
+    ndim, spacing, variance, maximum_error, maximum_kernel_width,
+    use_image_spacing,
+):
+    """Keyword arguments of `discrete_gaussian_filter` for ITK parameters."""
+    variance = itk_to_array_order(variance, ndim)
+    if not use_image_spacing:
+        spacing = (1.0, ) * ndim
+    return dict(
+        sigma=tuple(math.sqrt(v) for v in variance),
+        spacing=spacing,
+        max_error=itk_to_array_order(maximum_error, ndim),
+        max_half_width=maximum_kernel_width - 1,
+    )
+
+
+def _discrete_gaussian_array(
+    image,
+    spacing,
+    variance=0.0,
+    maximum_error=0.01,
+    maximum_kernel_width=32,
+    use_image_spacing=True,
+    mask=None,
+    normalized_convolution=False,
+):
+    """Array implementation of `cucim_discrete_gaussian_image_filter`.
+
+    `image` is a NumPy or CuPy array and `spacing` is in array axis order.
+    Other parameters are as for ``itk.DiscreteGaussianImageFilter``, with
+    sequences in ITK's ``(x, y, z)`` order.
+    """
+    if normalized_convolution and mask is None:
+        raise ValueError("normalized_convolution requires a mask")
+    ndim = image.ndim
+    gaussian_kwargs = _discrete_gaussian_kwargs(
+        ndim, spacing, variance, maximum_error, maximum_kernel_width,
+        use_image_spacing,
+    )
+    if mask is None:
+        return discrete_gaussian_filter(cp.asarray(image), **gaussian_kwargs)
+
+    kernels = discrete_gaussian_derivative_kernels(
+        ndim, order=0, **gaussian_kwargs
+    )
+    halo = [h.size // 2 for h in kernels]
+
+    def masked_gaussian(image_crop, mask_crop):
+        if normalized_convolution:
+            smoothed = normalized_discrete_gaussian_filter(
+                image_crop, mask_crop, **gaussian_kwargs
+            )
+            return _cast_result(smoothed, image_crop.dtype)
+        return discrete_gaussian_filter(image_crop, **gaussian_kwargs)
+
+    output, mask = _masked_output(image, mask)
+    return masked_filter(masked_gaussian, image, mask, halo, output)
+
+
+@accept_array_like_fast_path(_discrete_gaussian_array)
 @helpers.accept_array_like_xarray_torch
 def cucim_discrete_gaussian_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.discrete_gaussian_image_filter``.
+
+    In addition to the parameters of the ITK filter, accepts
+
+    mask : itk.Image or array-like, optional
+        Restrict the computation to the bounding box of the nonzero voxels
+        of `mask`, padded by the kernel radius. Only voxels inside of the
+        mask are smoothed; the output equals the input elsewhere.
+    normalized_convolution : bool, optional
+        If ``True``, use normalized convolution so that voxels outside of
+        `mask` do not contribute to the smoothed values inside of it.
+        Requires `mask`.
+
+    Array inputs are processed without creating ITK objects, see
+    `accept_array_like_fast_path`.
+    """
+    mask = kwargs.pop('mask', None)
+    normalized_convolution = kwargs.pop('normalized_convolution', False)
+    if normalized_convolution and mask is None:
+        raise ValueError("normalized_convolution requires a mask")
     input_image = args[0]
     ref_filt = itk.DiscreteGaussianImageFilter.New(*args, **kwargs)
     wrapper = itk.PyImageFilter.New(input_image)
@@ -28,31 +142,36 @@ def cucim_discrete_gaussian_image_filter(*args, **kwargs):
     def generate_data(wrapper):
         input_image = wrapper.GetInput()
         input_array = itk.array_view_from_image(input_image)
-        cu_input_array = cp.array(input_array)
 
         output_image = wrapper.GetOutput()
         output_image.SetBufferedRegion(output_image.GetRequestedRegion())
         output_image.Allocate()
         output_array = itk.array_view_from_image(output_image)
 
-        maximum_error = ref_filt.GetMaximumError()
-        maximum_kernel_width = ref_filt.GetMaximumKernelWidth()
-        use_image_spacing = ref_filt.GetUseImageSpacing()
-        variance = ref_filt.GetVariance()
-        sigma = tuple([math.sqrt(v) for v in reversed(variance)])
-
-        if use_image_spacing:
-            spacing = tuple(input_image.GetSpacing())
-        else:
-            spacing = (1.0, ) * input_array.ndim
-        cu_output_array = discrete_gaussian_filter(
-            cu_input_array,
-            sigma=sigma,
-            spacing=spacing,
-            max_error=maximum_error,
-            max_half_width=maximum_kernel_width - 1,
+        spacing = tuple(input_image.GetSpacing())[::-1]
+        parameters = dict(
+            variance=tuple(ref_filt.GetVariance()),
+            maximum_error=tuple(ref_filt.GetMaximumError()),
+            maximum_kernel_width=ref_filt.GetMaximumKernelWidth(),
+            use_image_spacing=ref_filt.GetUseImageSpacing(),
         )
-        output_array[:] = cu_output_array.get()[:]
+        if mask is not None:
+            output = _discrete_gaussian_array(
+                input_array, spacing, mask=mask,
+                normalized_convolution=normalized_convolution, **parameters
+            )
+            output_array[:] = cp.asnumpy(output)[:]
+            return
+        # the device input and output are only needed for this call
+        with get_scratch_pool().scope() as buffers:
+            output = discrete_gaussian_filter(
+                buffers.asarray(input_array),
+                output=buffers.empty(output_array.shape, output_array.dtype),
+                **_discrete_gaussian_kwargs(
+                    input_array.ndim, spacing, **parameters
+                ),
+            )
+            output.get(out=output_array)
     wrapper.SetPyGenerateData(generate_data)
 
     wrapper.Update()
@@ -60,8 +179,94 @@ def cucim_discrete_gaussian_image_filter(*args, **kwargs):
     return wrapper.GetOutput()
 
 
+@functools.lru_cache(maxsize=None)
+def _median_has_algorithm():
+    """Whether ``cucim.skimage.filters.median`` has the `algorithm`
+    parameter, added in cuCIM 23.02."""
+    parameters = inspect.signature(cucim.skimage.filters.median).parameters
+    return 'algorithm' in parameters
+
+
+def _median_with(algorithm):
+    """Median filter with one of the algorithms of
+    ``cucim.skimage.filters.median``, or its default if `algorithm` is
+    None.
+
+    Raises ``NotImplementedError`` for inputs the algorithm does not
+    support.
+    """
+    kwargs = {} if algorithm is None else dict(algorithm=algorithm)
+
+    def median(image, footprint, output=None):
+        if algorithm is not None and not _median_has_algorithm():
+            raise NotImplementedError(
+                "this cuCIM version has no choice of median algorithm"
+            )
+        if algorithm == 'histogram':
+            from cucim.skimage.filters._median_hist import _can_use_histogram
+            usable, reason = _can_use_histogram(image, footprint)
+            if not usable:
+                raise NotImplementedError(reason)
+        return cucim.skimage.filters.median(
+            image, footprint, out=output, mode='nearest', **kwargs
+        )
+    return median
+
+
+# cuCIM's default first, used when tuning is disabled. Algorithms that do
+# not support an input (e.g. histograms of floating point images, or any
+# choice of algorithm with cuCIM releases without the `algorithm`
+# parameter) raise NotImplementedError and are skipped by the autotuner.
+_MEDIAN_STRATEGIES = dict(
+    default=_median_with(None),
+    sorting=_median_with('sorting'),
+    histogram=_median_with('histogram'),
+)
+
+
+def _tuned_median(image, footprint, output=None):
+    """Median filter with the fastest of `_MEDIAN_STRATEGIES`."""
+    key = autotune.shape_class(
+        image.shape, image.dtype, 'x'.join(str(s) for s in footprint.shape)
+    )
+    return autotune.dispatch(
+        'median', key, _MEDIAN_STRATEGIES, image, footprint, output=output
+    )
+
+
+def _median_array(image, spacing, radius=1, mask=None):
+    """Array implementation of `cucim_median_image_filter`.
+
+    `image` is a NumPy or CuPy array. `radius` is a scalar or a sequence in
+    ITK's ``(x, y, z)`` order. `spacing` is unused.
+    """
+    radius, footprint = itk_radius_to_footprint(radius, image.ndim)
+
+    def median(image_crop, mask_crop=None):
+        return _tuned_median(image_crop, footprint)
+
+    if mask is None:
+        return median(cp.asarray(image))
+    output, mask = _masked_output(image, mask)
+    return masked_filter(median, image, mask, radius, output)
+
+
+@accept_array_like_fast_path(_median_array)
 @helpers.accept_array_like_xarray_torch
 def cucim_median_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.median_image_filter``.
+
+    In addition to the parameters of the ITK filter, accepts
+
+    mask : itk.Image or array-like, optional
+        Restrict the computation to the bounding box of the nonzero voxels
+        of `mask`, padded by the filter radius. Only voxels inside of the
+        mask are filtered; the output equals the input elsewhere.
+
+    Array inputs are processed without creating ITK objects, see
+    `accept_array_like_fast_path`.
+    """
+    mask = kwargs.pop('mask', None)
     input_image = args[0]
     ref_filt = itk.MedianImageFilter.New(*args, **kwargs)
     wrapper = itk.PyImageFilter.New(input_image)
@@ -77,20 +282,84 @@ def cucim_median_image_filter(*args, **kwargs):
     def generate_data(wrapper):
         input_image = wrapper.GetInput()
         input_array = itk.array_view_from_image(input_image)
-        cu_input_array = cp.array(input_array)
 
         output_image = wrapper.GetOutput()
         output_image.SetBufferedRegion(output_image.GetRequestedRegion())
         output_image.Allocate()
         output_array = itk.array_view_from_image(output_image)
 
-        radius = ref_filt.GetRadius()
-        footprint = cp.ones([r*2+1 for r in reversed(radius)])
-
-        cu_output_array = cucim.skimage.filters.median(cu_input_array, footprint, mode='nearest')
-        output_array[:] = cu_output_array.get()[:]
+        radius = tuple(ref_filt.GetRadius())
+        if mask is not None:
+            output = _median_array(
+                input_array,
+                tuple(input_image.GetSpacing())[::-1],
+                radius=radius,
+                mask=mask,
+            )
+            output_array[:] = cp.asnumpy(output)[:]
+            return
+        _, footprint = itk_radius_to_footprint(radius, input_array.ndim)
+        # the device input and output are only needed for this call
+        with get_scratch_pool().scope() as buffers:
+            output = _tuned_median(
+                buffers.asarray(input_array), footprint,
+                output=buffers.empty(output_array.shape, output_array.dtype),
+            )
+            output.get(out=output_array)
     wrapper.SetPyGenerateData(generate_data)
 
     wrapper.Update()
 
     return wrapper.GetOutput()
+
+
+class CucimDiscreteGaussianImageFilter(CucimImageFilter):
+    """Reusable cuCIM accelerated ``itk.DiscreteGaussianImageFilter``.
+
+    The per-axis kernels and the scratch buffers of the separable
+    convolution are kept across invocations.
+    """
+
+    _parameters = dict(
+        variance=0.0,
+        maximum_error=0.01,
+        maximum_kernel_width=32,
+        use_image_spacing=True,
+    )
+
+    def _derive_state(self, shape, dtype, spacing):
+        ndim = len(shape)
+        gaussian_kwargs = _discrete_gaussian_kwargs(
+            ndim, spacing, **self._values
+        )
+        kernels = discrete_gaussian_derivative_kernels(
+            ndim, order=0, **gaussian_kwargs
+        )
+        return dict(
+            kernels=[cp.asarray(h) for h in kernels],
+            scratch=[cp.empty(shape, dtype) for _ in range(min(ndim - 1, 2))],
+        )
+
+    def _generate_data(self, image, state, output):
+        separable_convolve(
+            image, state['kernels'], output=output, scratch=state['scratch']
+        )
+
+
+class CucimMedianImageFilter(CucimImageFilter):
+    """Reusable cuCIM accelerated ``itk.MedianImageFilter``.
+
+    The footprint is kept across invocations. The median algorithm is
+    chosen as for `cucim_median_image_filter`.
+    """
+
+    _parameters = dict(radius=1)
+
+    def _derive_state(self, shape, dtype, spacing):
+        _, footprint = itk_radius_to_footprint(
+            self._values['radius'], len(shape)
+        )
+        return dict(footprint=footprint)
+
+    def _generate_data(self, image, state, output):
+        _tuned_median(image, state['footprint'], output=output)
@@ -0,0 +1,389 @@
+"""cuCIM accelerated filters for the ITKThresholding module."""
+import cupy as cp
+import itk
+import numpy as np
+from itk.support import helpers
+
+from ._array_path import accept_array_like_fast_path
+from ._image_filter import CucimImageFilter
+from ._statistics_reduction import (
+    _value_bins,
+    histogram_bin_edges,
+    pixel_type_range,
+    rebin,
+    reduce_statistics,
+)
+from .distance_map import _allocate_like
+from .image_statistics import _input_array
+from .scratch import get_scratch_pool
+
+# Labels pixels in ``[lower, upper]`` with `inside_value`, as
+# ``itk.BinaryThresholdImageFilter``.
+_binary_threshold_kernel = cp.ElementwiseKernel(
+    'T x, T lower, T upper, Y inside_value, Y outside_value',
+    'Y y',
+    'y = (lower <= x && x <= upper) ? inside_value : outside_value',
+    'cucim_binary_threshold',
+)
+
+# Zeroes the output outside of the mask, as ``itk.MaskImageFilter``.
+_mask_output_kernel = cp.ElementwiseKernel(
+    'M mask',
+    'Y y',
+    'if (mask == 0) { y = 0; }',
+    'cucim_mask_output',
+)
+
+
+def _histogram_range(minimum, maximum, n_bins, auto_minimum_maximum, dtype):
+    """``(lower, upper)`` of the histogram of ``itk.ImageToHistogramFilter``
+    as configured by ``itk.HistogramThresholdImageFilter``."""
+    if auto_minimum_maximum:
+        minimum, maximum = float(minimum), float(maximum)
+        return minimum, maximum + ((maximum - minimum) / n_bins) / 100
+    lower, upper = pixel_type_range(dtype)
+    return lower - 0.5, upper + 0.5
+
+
+def _selected_statistics(image, selection, bins=None):
+    """``(minimum, maximum, histogram)`` of the pixels of the CuPy array
+    `image`, of all of them or of those where the boolean CuPy array
+    `selection` is True."""
+    if selection is None:
+        reduction = reduce_statistics(image, bins=bins)
+        index = 0
+    else:
+        # the selected pixels are those of label 1
+        reduction = reduce_statistics(image, labels=selection, bins=bins)
+        indices = np.flatnonzero(reduction.labels == 1)
+        if indices.size == 0:
+            # as in ITK, the range of no pixels is the reversed range of
+            # the dtype and the histogram is empty
+            lower, upper = pixel_type_range(image.dtype)
+            histogram = None
+            if bins is not None:
+                histogram = np.zeros_like(reduction.histogram[0, :])
+            return (
+                image.dtype.type(upper), image.dtype.type(lower), histogram
+            )
+        index = indices[0]
+    histogram = None
+    if bins is not None:
+        histogram = reduction.histogram[index]
+    return reduction.minimum[index], reduction.maximum[index], histogram
+
+
+def _otsu_histogram(image, n_bins, auto_minimum_maximum, selection=None):
+    """``(frequencies, edges)`` of the histogram of the CuPy array `image`
+    used by ``itk.OtsuThresholdImageFilter``, restricted to the pixels
+    where `selection` is True if given.
+
+    The histogram of 8 and 16 bit integer images is computed with one bin
+    per value in a single pass and rebinned; other images take a pass for
+    the minimum and maximum, if needed, and one for the histogram.
+    """
+    dtype = image.dtype
+    if dtype.kind in 'iu' and dtype.itemsize <= 2:
+        minimum, maximum, histogram = _selected_statistics(
+            image, selection, bins='values'
+        )
+        lower, n_values = _value_bins(dtype)
+        values = np.arange(lower, lower + n_values, dtype=np.float64)
+        edges = histogram_bin_edges(n_bins, *_histogram_range(
+            minimum, maximum, n_bins, auto_minimum_maximum, dtype,
+        ))
+        return rebin(histogram, values, edges), edges
+    minimum = maximum = None
+    if auto_minimum_maximum:
+        minimum, maximum, _ = _selected_statistics(image, selection)
+    edges = histogram_bin_edges(n_bins, *_histogram_range(
+        minimum, maximum, n_bins, auto_minimum_maximum, dtype,
+    ))
+    return _selected_statistics(image, selection, bins=edges)[2], edges
+
+
+def _almost_equal(a, b):
+    """``itk::Math::FloatAlmostEqual`` with its default tolerances."""
+    a, b = np.float64(a), np.float64(b)
+    if abs(a - b) <= 0.1 * np.finfo(np.float64).eps:
+        return True
+    if (a < 0) != (b < 0):
+        return False
+    ulps = int(np.array(a).view(np.int64)) - int(np.array(b).view(np.int64))
+    return abs(ulps) <= 4
+
+
+def _otsu_threshold_index(frequencies, edges):
+    """Index of the bin ending at the Otsu threshold, as computed by
+    ``itk.OtsuMultipleThresholdsCalculator`` for a single threshold."""
+    n_bins = frequencies.size
+    centers = (edges[:-1] + edges[1:]) / 2
+    frequencies = frequencies.tolist()
+    total = sum(frequencies)
+    if total == 0:
+        # all of ITK's comparisons of the NaN variances fail
+        return 0
+    global_mean = 0.0
+    for center, frequency in zip(centers.tolist(), frequencies):
+        global_mean += center * frequency
+    global_mean /= total
+
+    def between_class_variance(frequency, mean):
+        # the second class holds the remaining frequencies
+        remainder = total - frequency
+        remainder_mean = 0.0
+        if remainder > 0:
+            remainder_mean = (
+                global_mean * total - mean * frequency
+            ) / remainder
+        return (
+            frequency * (mean * mean)
+            + remainder * (remainder_mean * remainder_mean)
+        ) / total
+
+    frequency = frequencies[0]
+    mean = float(centers[0]) if frequency > 0 else 0.0
+    best_variance = between_class_variance(frequency, mean)
+    best_index = 0
+    for index in range(1, n_bins - 1):
+        previous_frequency = frequency
+        frequency += frequencies[index]
+        if frequency > 0:
+            mean = (
+                mean * previous_frequency
+                + float(centers[index]) * frequencies[index]
+            ) / frequency
+        else:
+            mean = 0.0
+        candidate = between_class_variance(frequency, mean)
+        if (candidate > best_variance
+                and not _almost_equal(best_variance, candidate)):
+            best_variance, best_index = candidate, index
+    return best_index
+
+
+def _otsu_threshold(
+    image,
+    number_of_histogram_bins=256,
+    auto_minimum_maximum=None,
+    return_bin_midpoint=False,
+    selection=None,
+):
+    """Otsu threshold of the CuPy array `image`, of its dtype, as returned by
+    ``itk.OtsuThresholdImageFilter.GetThreshold``.
+
+    `auto_minimum_maximum` defaults to ITK's default, False for 8 bit
+    integer images and True otherwise. If given, only the pixels where the
+    boolean CuPy array `selection` is True are considered.
+    """
+    dtype = image.dtype
+    if auto_minimum_maximum is None:
+        auto_minimum_maximum = dtype.kind == 'f' or dtype.itemsize != 1
+    frequencies, edges = _otsu_histogram(
+        image, int(number_of_histogram_bins), auto_minimum_maximum,
+        selection,
+    )
+    index = _otsu_threshold_index(frequencies, edges)
+    if return_bin_midpoint:
+        threshold = (edges[index] + edges[index + 1]) / 2
+    else:
+        threshold = edges[index + 1]
+    # static_cast to the pixel type: truncation for integer images
+    return np.array(threshold).astype(dtype)[()]
+
+
+def _otsu_output_dtype(dtype):
+    """Output dtype of ITK Python's default ``OtsuThresholdImageFilter``
+    instantiation: the input dtype for integer images, int16 otherwise."""
+    dtype = np.dtype(dtype)
+    return dtype if dtype.kind in 'iu' else np.dtype(np.int16)
+
+
+def _binary_threshold(image, threshold, inside_value, outside_value, out):
+    """Label the pixels of `image` at or below `threshold` with
+    `inside_value` and the others with `outside_value`, into `out`."""
+    lower = pixel_type_range(image.dtype)[0]
+    if threshold < lower:
+        raise ValueError(
+            "Lower threshold cannot be greater than upper threshold."
+        )
+    _binary_threshold_kernel(
+        image,
+        image.dtype.type(lower),
+        image.dtype.type(threshold),
+        out.dtype.type(inside_value),
+        out.dtype.type(outside_value),
+        out,
+    )
+    return out
+
+
+def _mask_value(dtype):
+    """Default mask value of ``itk.OtsuThresholdImageFilter``: the maximum
+    of the mask pixel type."""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'b':
+        return True
+    if dtype.kind == 'f':
+        return np.finfo(dtype).max
+    return np.iinfo(dtype).max
+
+
+def _masked_otsu_threshold(
+    image,
+    mask,
+    mask_value,
+    mask_output,
+    out,
+    inside_value,
+    outside_value,
+    **kwargs,
+):
+    """Otsu threshold the CuPy array `image` into `out`, considering only
+    the pixels where the CuPy array `mask`, if not None, is `mask_value`.
+
+    With `mask_output`, the output is 0 where `mask` is 0.
+    """
+    selection = None
+    if mask is not None:
+        selection = mask == mask.dtype.type(mask_value)
+    threshold = _otsu_threshold(image, selection=selection, **kwargs)
+    _binary_threshold(image, threshold, inside_value, outside_value, out)
+    if mask is not None and mask_output:
+        _mask_output_kernel(mask, out)
+    return out
+
+
+def _otsu_threshold_array(
+    image,
+    spacing,
+    number_of_histogram_bins=256,
+    auto_minimum_maximum=None,
+    return_bin_midpoint=False,
+    inside_value=None,
+    outside_value=0,
+    mask_image=None,
+    mask_value=None,
+    mask_output=True,
+):
+    """Array implementation of `cucim_otsu_threshold_image_filter`.
+
+    The output is of the dtype of ITK Python's default instantiation, see
+    `_otsu_output_dtype`, and `inside_value` defaults to its maximum.
+    `mask_value` defaults to the maximum of the dtype of `mask_image`.
+    """
+    image = cp.asarray(image)
+    output_dtype = _otsu_output_dtype(image.dtype)
+    if inside_value is None:
+        inside_value = np.iinfo(output_dtype).max
+    mask = None
+    if mask_image is not None:
+        mask = cp.asarray(_input_array(mask_image, 'mask_image'))
+        if tuple(mask.shape) != tuple(image.shape):
+            raise ValueError("mask_image must have the shape of the image")
+        if mask_value is None:
+            mask_value = _mask_value(mask.dtype)
+    return _masked_otsu_threshold(
+        image,
+        mask,
+        mask_value,
+        mask_output,
+        cp.empty(image.shape, output_dtype),
+        number_of_histogram_bins=number_of_histogram_bins,
+        auto_minimum_maximum=auto_minimum_maximum,
+        return_bin_midpoint=return_bin_midpoint,
+        inside_value=inside_value,
+        outside_value=outside_value,
+    )
+
+
+@accept_array_like_fast_path(_otsu_threshold_array)
+@helpers.accept_array_like_xarray_torch
+def cucim_otsu_threshold_image_filter(*args, **kwargs):
+    """cuCIM accelerated ``itk.OtsuThresholdImageFilter``.
+
+    The threshold and the output are identical to ITK's, with or without
+    a mask image.
+    """
+    input_image = args[0]
+    ref_filt = itk.OtsuThresholdImageFilter.New(*args, **kwargs)
+    mask_image = ref_filt.GetMaskImage()
+
+    output_pixel_type = itk.template(ref_filt.GetOutput())[1][0]
+    output_image = _allocate_like(input_image, output_pixel_type)
+    output_array = itk.array_view_from_image(output_image)
+    with get_scratch_pool().scope() as buffers:
+        cu_input = buffers.asarray(itk.array_view_from_image(input_image))
+        cu_mask = None
+        if mask_image is not None:
+            cu_mask = buffers.asarray(itk.array_view_from_image(mask_image))
+        cu_output = _masked_otsu_threshold(
+            cu_input,
+            cu_mask,
+            ref_filt.GetMaskValue(),
+            ref_filt.GetMaskOutput(),
+            buffers.empty(cu_input.shape, output_array.dtype),
+            number_of_histogram_bins=ref_filt.GetNumberOfHistogramBins(),
+            auto_minimum_maximum=ref_filt.GetAutoMinimumMaximum(),
+            return_bin_midpoint=ref_filt.GetReturnBinMidpoint(),
+            inside_value=ref_filt.GetInsideValue(),
+            outside_value=ref_filt.GetOutsideValue(),
+        )
+        cu_output.get(out=output_array)
+    return output_image
+
+
+class CucimOtsuThresholdImageFilter(CucimImageFilter):
+    """Reusable cuCIM accelerated ``itk.OtsuThresholdImageFilter``.
+
+    The output is of the dtype of `cucim_otsu_threshold_image_filter` and
+    the threshold of the last invocation is returned by ``GetThreshold``.
+    An `inside_value` of None stands for the maximum of the output dtype
+    and an `auto_minimum_maximum` of None for ITK's default.
+    """
+
+    _parameters = dict(
+        number_of_histogram_bins=256,
+        auto_minimum_maximum=None,
+        return_bin_midpoint=False,
+        inside_value=None,
+        outside_value=0,
+    )
+
+    def __init__(self, *args, **kwargs):
+        self._threshold = None
+        super().__init__(*args, **kwargs)
+
+    def GetThreshold(self):
+        """The threshold computed by the last ``Update``."""
+        return self._threshold
+
+    def _derive_state(self, shape, dtype, spacing):
+        inside_value = self._values['inside_value']
+        if inside_value is None:
+            inside_value = np.iinfo(self._output_dtype(dtype)).max
+        return dict(inside_value=inside_value)
+
+    def _output_dtype(self, dtype):
+        return _otsu_output_dtype(dtype)
+
+    def _output_pixel_type(self, pixel_type):
+        if pixel_type in (itk.F, itk.D):
+            return itk.SS
+        return pixel_type
+
+    def _generate_data(self, image, state, output):
+        self._threshold = _otsu_threshold(
+            image,
+            number_of_histogram_bins=self._values[
+                'number_of_histogram_bins'],
+            auto_minimum_maximum=self._values['auto_minimum_maximum'],
+            return_bin_midpoint=self._values['return_bin_midpoint'],
+        )
+        _binary_threshold(
+            image,
+            self._threshold,
+            state['inside_value'],
+            self._values['outside_value'],
+            output,
+        )
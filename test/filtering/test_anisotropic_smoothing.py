@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import anisotropic_smoothing
+
+
+class TestAnisotropicSmoothing:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        array = itk.array_from_image(itk.imread(data))[:40]
+        self.image = itk.image_from_array(array.astype(np.float32))
+        self.image.SetSpacing([0.9, 1.3, 2.0])
+        self.image_f64 = itk.image_from_array(array.astype(np.float64))
+
+    def _filters(self, curvature):
+        if curvature:
+            return (
+                itk.curvature_anisotropic_diffusion_image_filter,
+                anisotropic_smoothing.cucim_curvature_anisotropic_diffusion_image_filter,  # noqa
+            )
+        return (
+            itk.gradient_anisotropic_diffusion_image_filter,
+            anisotropic_smoothing.cucim_gradient_anisotropic_diffusion_image_filter,  # noqa
+        )
+
+    @pytest.mark.parametrize("curvature", [False, True])
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            dict(time_step=0.05),
+            dict(number_of_iterations=5, time_step=0.04,
+                 conductance_parameter=2.0),
+            dict(number_of_iterations=4, time_step=0.03,
+                 conductance_scaling_update_interval=3),
+            dict(number_of_iterations=3, time_step=0.0625,
+                 use_image_spacing=False),
+        ],
+    )
+    def test_anisotropic_diffusion_image_filter(self, curvature, kwargs):
+        itk_filter, cucim_filter = self._filters(curvature)
+        expected = itk_filter(self.image, **kwargs)
+        output = cucim_filter(self.image, **kwargs)
+        itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        # the average gradient magnitude is summed in a different order
+        np.testing.assert_allclose(expected, output, rtol=1e-5, atol=1e-4)
+
+    @pytest.mark.parametrize("curvature", [False, True])
+    @pytest.mark.parametrize(
+        "name",
+        ['fixed_average_gradient_magnitude', 'FixedAverageGradientMagnitude'],
+    )
+    def test_fixed_average_gradient_magnitude(self, curvature, name):
+        itk_filter, cucim_filter = self._filters(curvature)
+        kwargs = {
+            'number_of_iterations': 3,
+            'time_step': 0.05,
+            name: 20.0,
+        }
+        for image in [self.image, self.image_f64]:
+            expected = itk_filter(image, **kwargs)
+            output = cucim_filter(image, **kwargs)
+            np.testing.assert_allclose(expected, output, rtol=1e-6, atol=1e-5)
+
+    @pytest.mark.parametrize("curvature", [False, True])
+    def test_2d(self, curvature):
+        itk_filter, cucim_filter = self._filters(curvature)
+        array = itk.array_from_image(self.image)[20]
+        image = itk.image_from_array(np.ascontiguousarray(array))
+        expected = itk_filter(image, number_of_iterations=5, time_step=0.1)
+        output = cucim_filter(image, number_of_iterations=5, time_step=0.1)
+        np.testing.assert_allclose(expected, output, rtol=1e-5, atol=1e-4)
+
+    def test_numpy_input(self):
+        array = itk.array_view_from_image(self.image_f64)
+        kwargs = dict(number_of_iterations=2, time_step=0.05)
+        expected = itk.curvature_anisotropic_diffusion_image_filter(
+            self.image_f64, **kwargs
+        )
+        output = anisotropic_smoothing.cucim_curvature_anisotropic_diffusion_image_filter(  # noqa
+            array, **kwargs
+        )
+        assert isinstance(output, np.ndarray)
+        assert output.dtype == np.float64
+        np.testing.assert_allclose(expected, output, rtol=1e-9, atol=1e-9)
+
+    def test_unstable_time_step(self):
+        array = itk.array_view_from_image(self.image)
+        with pytest.warns(UserWarning, match="unstable time step"):
+            anisotropic_smoothing.cucim_gradient_anisotropic_diffusion_image_filter(  # noqa
+                array, time_step=0.2
+            )
+        with pytest.raises(ValueError):
+            anisotropic_smoothing.cucim_gradient_anisotropic_diffusion_image_filter(  # noqa
+                array, conductance_scaling_update_interval=0
+            )
+
+    @pytest.mark.parametrize("curvature", [False, True])
+    def test_no_allocation_per_iteration(self, curvature):
+        import cupy as cp
+
+        class MallocCounter(cp.cuda.MemoryHook):
+            name = 'MallocCounter'
+
+            def __init__(self):
+                self.count = 0
+
+            def malloc_preprocess(self, **kwargs):
+                self.count += 1
+
+        array = cp.asarray(itk.array_view_from_image(self.image))
+        counts = []
+        for number_of_iterations in [1, 1, 20]:
+            with MallocCounter() as counter:
+                anisotropic_smoothing._anisotropic_diffusion(
+                    array, (1.0, 1.0, 1.0), curvature, time_step=0.05,
+                    number_of_iterations=number_of_iterations,
+                )
+            counts.append(counter.count)
+        # the first call compiles the kernels
+        assert counts[1] == counts[2]
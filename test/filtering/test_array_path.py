@@ -0,0 +1,96 @@
+import cupy as cp
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import distance_map, image_grid, smoothing
+
+
+class TestArrayPath:
+    def setup_class(self):
+        rng = np.random.default_rng(5)
+        self.array = rng.standard_normal((48, 64), dtype=np.float32)
+        self.spacing = (0.5, 2.0)  # ITK (x, y) order
+
+    def _itk_image(self):
+        image = itk.image_from_array(self.array)
+        image.SetSpacing(self.spacing)
+        return image
+
+    def test_numpy_spacing_keyword(self):
+        kwargs = dict(variance=(2, 3), use_image_spacing=True)
+        expected = smoothing.cucim_discrete_gaussian_image_filter(
+            self._itk_image(), **kwargs
+        )
+        result = smoothing.cucim_discrete_gaussian_image_filter(
+            self.array, spacing=self.spacing, **kwargs
+        )
+        assert isinstance(result, np.ndarray)
+        np.testing.assert_allclose(result, np.asarray(expected), atol=1e-5)
+
+    def test_cupy_input(self):
+        expected = smoothing.cucim_median_image_filter(self.array, radius=2)
+        result = smoothing.cucim_median_image_filter(
+            cp.asarray(self.array), radius=2
+        )
+        assert isinstance(result, cp.ndarray)
+        np.testing.assert_array_equal(result.get(), expected)
+
+    def test_cupy_input_unsupported_argument(self):
+        with pytest.raises(TypeError):
+            smoothing.cucim_median_image_filter(
+                cp.asarray(self.array), radius=2, number_of_work_units=1
+            )
+
+    def test_unsupported_argument_falls_back_to_itk(self):
+        expected = smoothing.cucim_median_image_filter(self.array, radius=2)
+        result = smoothing.cucim_median_image_filter(
+            self.array, radius=2, number_of_work_units=1
+        )
+        np.testing.assert_array_equal(result, expected)
+
+    def test_distance_map_dtype(self):
+        binary = (self.array > 0).astype(np.uint8)
+        expected = distance_map.cucim_signed_maurer_distance_map_image_filter(
+            itk.image_view_from_array(binary)
+        )
+        result = distance_map.cucim_signed_maurer_distance_map_image_filter(
+            binary
+        )
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(result, np.asarray(expected), atol=1e-5)
+
+    @pytest.mark.parametrize("device", ["cpu", "cuda"])
+    def test_torch_input(self, device):
+        torch = pytest.importorskip("torch")
+        # a leading dimension of size 1 denotes a scalar image
+        array = self.array[np.newaxis]
+        tensor = torch.from_numpy(array).to(device)
+        result = smoothing.cucim_discrete_gaussian_image_filter(
+            tensor, variance=2
+        )
+        assert isinstance(result, torch.Tensor)
+        assert result.device == tensor.device
+        expected = smoothing.cucim_discrete_gaussian_image_filter(
+            itk.image_view_from_array(array), variance=2
+        )
+        np.testing.assert_allclose(
+            result.cpu().numpy(), np.asarray(expected), atol=1e-5
+        )
+
+    def test_xarray_input(self):
+        pytest.importorskip("xarray")
+        image = self._itk_image()
+        image.SetOrigin((3.0, -2.0))
+        data_array = itk.xarray_from_image(image)
+        kwargs = dict(shrink_factors=(2, 3))
+        expected = itk.xarray_from_image(
+            image_grid.cucim_bin_shrink_image_filter(image, **kwargs)
+        )
+        result = image_grid.cucim_bin_shrink_image_filter(data_array, **kwargs)
+        assert result.dims == expected.dims
+        for dim in result.dims:
+            np.testing.assert_allclose(
+                result.coords[dim], expected.coords[dim]
+            )
+        np.testing.assert_allclose(result.values, expected.values, atol=1e-5)
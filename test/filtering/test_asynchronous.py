@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import asynchronous, smoothing
+
+
+def _delayed_smooth(image, delay=0.02, **kwargs):
+    # keeps requests in flight long enough to observe the scheduling
+    time.sleep(delay)
+    return smoothing.cucim_discrete_gaussian_image_filter(image, **kwargs)
+
+
+def _read_and_smooth(path, **kwargs):
+    image = itk.imread(path)
+    return smoothing.cucim_discrete_gaussian_image_filter(image, **kwargs)
+
+
+class TestFilterExecutor:
+    def setup_class(self):
+        rng = np.random.default_rng(2)
+        self.images = [
+            rng.standard_normal((32, 32), dtype=np.float32)
+            for _ in range(32)
+        ]
+
+    def test_results_match_synchronous_calls(self):
+        async def main():
+            with asynchronous.FilterExecutor(max_workers=4) as executor:
+                return await executor.map(
+                    smoothing.cucim_discrete_gaussian_image_filter,
+                    self.images,
+                    variance=2,
+                )
+        results = asyncio.run(main())
+        for image, result in zip(self.images, results):
+            expected = smoothing.cucim_discrete_gaussian_image_filter(
+                image, variance=2
+            )
+            np.testing.assert_array_equal(result, expected)
+
+    def test_concurrent_throughput(self, tmp_path):
+        # each request reads its image from disk and uploads it to the
+        # device, which overlaps with the kernels of other requests
+        rng = np.random.default_rng(3)
+        paths = []
+        for i in range(16):
+            path = str(tmp_path / f"image{i}.mha")
+            itk.imwrite(
+                itk.image_from_array(
+                    rng.standard_normal((64, 128, 128), dtype=np.float32)
+                ),
+                path,
+            )
+            paths.append(path)
+        # warm up kernel compilation
+        _read_and_smooth(paths[0], variance=4)
+
+        start = time.perf_counter()
+        for path in paths:
+            _read_and_smooth(path, variance=4)
+        serial = time.perf_counter() - start
+
+        async def main():
+            with asynchronous.FilterExecutor(max_workers=8) as executor:
+                return await executor.map(
+                    _read_and_smooth, paths, variance=4
+                )
+        start = time.perf_counter()
+        asyncio.run(main())
+        concurrent = time.perf_counter() - start
+        assert concurrent < serial
+
+    def test_memory_budget(self):
+        nbytes = self.images[0].nbytes
+        budget = 3 * nbytes
+        peak = 0
+
+        async def main():
+            nonlocal peak
+            executor = asynchronous.FilterExecutor(
+                max_workers=8, memory_budget=budget, memory_factor=1.0
+            )
+
+            async def watch():
+                nonlocal peak
+                while True:
+                    peak = max(peak, executor.in_flight_bytes)
+                    await asyncio.sleep(0.001)
+            watcher = asyncio.ensure_future(watch())
+            await executor.map(_delayed_smooth, self.images, variance=2)
+            watcher.cancel()
+            executor.shutdown()
+            return executor.in_flight_bytes
+        assert asyncio.run(main()) == 0
+        assert 0 < peak <= budget
+
+    def test_vector_image_counts_against_budget(self):
+        array = np.stack([self.images[0]] * 3, axis=-1)
+        vector_image = itk.image_from_array(array, is_vector=True)
+        assert asynchronous._input_nbytes((vector_image, ), {}) == (
+            array.nbytes
+        )
+
+    def test_request_larger_than_budget(self):
+        async def main():
+            executor = asynchronous.FilterExecutor(memory_budget=1)
+            result = await executor.run(
+                smoothing.cucim_median_image_filter, self.images[0]
+            )
+            executor.shutdown()
+            return result
+        assert asyncio.run(main()).shape == self.images[0].shape
+
+    def test_cancellation(self):
+        async def main():
+            executor = asynchronous.FilterExecutor(max_workers=1)
+            running = asyncio.ensure_future(
+                executor.run(_delayed_smooth, self.images[0], delay=0.2)
+            )
+            queued = asyncio.ensure_future(
+                executor.run(_delayed_smooth, self.images[1], delay=0.2)
+            )
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            running.cancel()
+            for task in (running, queued):
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            # the running request completes in the background
+            executor.shutdown(wait=True)
+            await asyncio.sleep(0)
+            return executor.in_flight_bytes
+        assert asyncio.run(main()) == 0
+
+    def test_default_executor(self):
+        result = asyncio.run(
+            asynchronous.run(
+                smoothing.cucim_median_image_filter, self.images[0], radius=1
+            )
+        )
+        expected = smoothing.cucim_median_image_filter(
+            self.images[0], radius=1
+        )
+        np.testing.assert_array_equal(result, expected)
@@ -0,0 +1,220 @@
+import time
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import autotune, image_feature, smoothing
+
+FINGERPRINT = dict(device='test device', compute_capability='80')
+
+
+def _sleeper(seconds, calls, name):
+    def strategy(x):
+        calls.append(name)
+        time.sleep(seconds)
+        return x + 1
+    return strategy
+
+
+def _unsupported(x):
+    raise NotImplementedError
+
+
+class TestAutotune:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        # uint8 data
+        self.image = itk.imread(data)
+        self.image_f32 = self.image.astype(np.float32)
+
+    @pytest.fixture
+    def tuning_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('ITK_CUCIM_AUTOTUNE', '1')
+        monkeypatch.delenv('ITK_CUCIM_AUTOTUNE_FFT', raising=False)
+        tuning_cache = autotune.TuningCache(tmp_path, repeat=1)
+        autotune.set_tuning_cache(tuning_cache)
+        yield tuning_cache
+        autotune.set_tuning_cache(None)
+
+    def test_dispatch_records_fastest(self, tmp_path):
+        tuning_cache = autotune.TuningCache(
+            tmp_path, fingerprint=FINGERPRINT, repeat=1
+        )
+        calls = []
+        strategies = dict(
+            slow=_sleeper(0.05, calls, 'slow'),
+            unsupported=_unsupported,
+            fast=_sleeper(0.0, calls, 'fast'),
+        )
+        key = autotune.shape_class((100, 200), np.float32, 5)
+        assert key == 'float32|128x256|5'
+        assert tuning_cache.dispatch('op', key, strategies, 1) == 2
+        assert tuning_cache.lookup('op', key) == 'fast'
+        timings = tuning_cache.entries()['op'][key]['timings']
+        assert timings['unsupported'] is None
+        assert timings['fast'] < timings['slow']
+
+        # later calls dispatch from the cache without tuning
+        calls.clear()
+        assert tuning_cache.dispatch('op', key, strategies, 1) == 2
+        assert calls == ['fast']
+        stats = tuning_cache.statistics()
+        assert (stats.hits, stats.tunings, stats.entries) == (1, 1, 1)
+
+        # the choice is persisted per machine fingerprint
+        reloaded = autotune.TuningCache(tmp_path, fingerprint=FINGERPRINT)
+        assert reloaded.lookup('op', key) == 'fast'
+        other_machine = autotune.TuningCache(
+            tmp_path, fingerprint=dict(FINGERPRINT, device='other')
+        )
+        assert other_machine.lookup('op', key) is None
+
+        reloaded.reset('op')
+        assert reloaded.entries() == {}
+        assert autotune.TuningCache(
+            tmp_path, fingerprint=FINGERPRINT
+        ).entries() == {}
+
+    def test_dispatch_shared_output(self, tmp_path):
+        # all strategies write into the same output; the result is that of
+        # the chosen one, not of the last one timed
+        def writer(value, seconds):
+            def strategy(x, output):
+                time.sleep(seconds)
+                output[...] = value
+                return output
+            return strategy
+
+        tuning_cache = autotune.TuningCache(
+            tmp_path, fingerprint=FINGERPRINT, repeat=1
+        )
+        strategies = dict(fast=writer(1, 0.0), slow=writer(2, 0.05))
+        output = np.zeros(3)
+        result = tuning_cache.dispatch(
+            'op', 'key', strategies, None, output=output
+        )
+        assert tuning_cache.lookup('op', 'key') == 'fast'
+        assert result is output
+        np.testing.assert_array_equal(output, 1)
+
+    def test_dispatch_unsupported(self, tmp_path):
+        tuning_cache = autotune.TuningCache(tmp_path, fingerprint=FINGERPRINT)
+        with pytest.raises(NotImplementedError):
+            tuning_cache.dispatch(
+                'op', 'key', dict(a=_unsupported, b=_unsupported), 1
+            )
+        assert tuning_cache.entries() == {}
+
+    def test_dispatch_error(self, tmp_path):
+        # errors other than NotImplementedError are not taken for an
+        # unsupported input
+        def broken(x):
+            raise ValueError("bug")
+
+        tuning_cache = autotune.TuningCache(tmp_path, fingerprint=FINGERPRINT)
+        with pytest.raises(ValueError):
+            tuning_cache.dispatch(
+                'op', 'key', dict(a=broken, b=_sleeper(0.0, [], 'b')), 1
+            )
+        assert tuning_cache.entries() == {}
+
+    @pytest.mark.parametrize("value", [None, '0'])
+    def test_disabled(self, tuning_cache, monkeypatch, value):
+        # tuning is opt-in
+        if value is None:
+            monkeypatch.delenv('ITK_CUCIM_AUTOTUNE')
+        else:
+            monkeypatch.setenv('ITK_CUCIM_AUTOTUNE', value)
+        assert not autotune.enabled()
+        calls = []
+        strategies = dict(
+            first=_sleeper(0.05, calls, 'first'),
+            second=_sleeper(0.0, calls, 'second'),
+        )
+        autotune.dispatch('op', 'key', strategies, 1)
+        assert calls == ['first']
+        assert tuning_cache.entries() == {}
+
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_median_strategies(self, tuning_cache, floating):
+        image = self.image_f32 if floating else self.image
+        expected = itk.median_image_filter(image, radius=2)
+        for _ in range(2):
+            output = smoothing.cucim_median_image_filter(image, radius=2)
+            np.testing.assert_array_equal(expected, output)
+        assert tuning_cache.statistics().tunings == 1
+        assert 'median' in tuning_cache.entries()
+
+    def test_median_filter_object_strategies(self, tuning_cache):
+        # the filter class shares the tuned strategy of the function
+        expected = itk.median_image_filter(self.image_f32, radius=2)
+        smoothing.cucim_median_image_filter(self.image_f32, radius=2)
+        median = smoothing.CucimMedianImageFilter.New(radius=2)
+        np.testing.assert_array_equal(expected, median(self.image_f32))
+        stats = tuning_cache.statistics()
+        assert (stats.hits, stats.tunings) == (1, 1)
+
+    def _separable_convolve_input(self):
+        from itk_cucim.filtering import _discrete_gaussian
+
+        import cupy as cp
+
+        image = cp.asarray(itk.array_from_image(self.image_f32))
+        kernels = _discrete_gaussian.discrete_gaussian_derivative_kernels(
+            image.ndim, sigma=(1.0, 8.0, 12.0), order=(0, 1, 0),
+            max_error=0.001, max_half_width=63,
+        )
+        return image, [cp.asarray(h) for h in kernels]
+
+    def test_separable_convolve_strategies(self, tuning_cache):
+        from itk_cucim.filtering import _discrete_gaussian
+
+        import cupy as cp
+
+        image, kernels = self._separable_convolve_input()
+        expected = _discrete_gaussian.separable_convolve(image, kernels)
+        tiled = _discrete_gaussian._tiled_separable_convolve(
+            image, kernels, tile=16
+        )
+        cp.testing.assert_array_equal(tiled, expected)
+
+        # by default, only strategies with identical results are tuned
+        output = _discrete_gaussian.tuned_separable_convolve(image, kernels)
+        cp.testing.assert_array_equal(output, expected)
+        entry, = tuning_cache.entries()['separable_convolve'].values()
+        assert 'tiled16' in entry['timings']
+        assert 'fft' not in entry['timings']
+
+    def test_separable_convolve_fft(self, tuning_cache, monkeypatch):
+        from itk_cucim.filtering import _discrete_gaussian
+
+        import cupy as cp
+
+        monkeypatch.setenv('ITK_CUCIM_AUTOTUNE_FFT', '1')
+        image, kernels = self._separable_convolve_input()
+        expected = _discrete_gaussian.separable_convolve(image, kernels)
+        cp.testing.assert_allclose(
+            _discrete_gaussian._fft_separable_convolve(image, kernels),
+            expected, rtol=0, atol=1e-3,
+        )
+        output = _discrete_gaussian.tuned_separable_convolve(image, kernels)
+        cp.testing.assert_allclose(output, expected, rtol=0, atol=1e-3)
+        entry, = tuning_cache.entries()['separable_convolve'].values()
+        assert {'direct', 'fft', 'tiled16'} <= set(entry['timings'])
+
+    def test_discrete_gaussian_derivative(self, tuning_cache, monkeypatch):
+        kwargs = dict(variance=[4.0, 30.0, 1.0], order=[1, 0, 0])
+        cucim_filter = (
+            image_feature.cucim_discrete_gaussian_derivative_image_filter
+        )
+        monkeypatch.setenv('ITK_CUCIM_AUTOTUNE', '0')
+        untuned = cucim_filter(self.image_f32, **kwargs)
+        monkeypatch.setenv('ITK_CUCIM_AUTOTUNE', '1')
+        for _ in range(2):
+            # the output does not depend on the chosen strategy
+            output = cucim_filter(self.image_f32, **kwargs)
+            np.testing.assert_array_equal(untuned, output)
+        stats = tuning_cache.statistics()
+        assert (stats.hits, stats.tunings) == (1, 1)
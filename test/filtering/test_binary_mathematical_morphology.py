@@ -0,0 +1,145 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import binary_mathematical_morphology as morphology
+
+
+def _asymmetric_kernel():
+    kernel_image = itk.Image[itk.B, 2].New()
+    kernel_image.SetRegions([5, 5])
+    kernel_image.Allocate()
+    kernel_image.FillBuffer(False)
+    for index in [(2, 2), (3, 2), (4, 0), (2, 1)]:
+        kernel_image.SetPixel(index, True)
+    return itk.FlatStructuringElement[2].FromImage(kernel_image)
+
+
+class TestBinaryMathematicalMorphology:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "horse.png"
+        horse = itk.array_from_image(itk.imread(data))[..., 0] > 0
+        # foreground 200, background 0 and a third value that is not
+        # changed unless covered by the structuring element
+        array = np.where(horse, 200, 0).astype(np.uint8)
+        array[::7, ::5][array[::7, ::5] == 0] = 7
+        # foreground touching the image boundary
+        array[:10, 100:200] = 200
+        self.image = itk.image_view_from_array(array)
+        self.kwargs = dict(foreground_value=200)
+
+    def _kernels(self):
+        ball = itk.FlatStructuringElement[2].Ball
+        return [
+            ball([1, 1]),
+            ball([6, 6]),
+            ball([15, 15]),
+            ball([9, 4]),
+            itk.FlatStructuringElement[2].Box([4, 4]),
+            _asymmetric_kernel(),
+        ]
+
+    def _compare(self, itk_filter, cucim_filter, kwargs):
+        for kernel in self._kernels():
+            expected = itk_filter(self.image, kernel=kernel, **kwargs)
+            output = cucim_filter(self.image, kernel=kernel, **kwargs)
+            itk.comparison_image_filter(
+                expected, output, verify_input_information=True
+            )
+            np.testing.assert_array_equal(expected, output)
+
+    @pytest.mark.parametrize("boundary_to_foreground", [False, True])
+    def test_binary_dilate_image_filter(self, boundary_to_foreground):
+        self._compare(
+            itk.binary_dilate_image_filter,
+            morphology.cucim_binary_dilate_image_filter,
+            dict(boundary_to_foreground=boundary_to_foreground, **self.kwargs),
+        )
+
+    @pytest.mark.parametrize("boundary_to_foreground", [False, True])
+    def test_binary_erode_image_filter(self, boundary_to_foreground):
+        self._compare(
+            itk.binary_erode_image_filter,
+            morphology.cucim_binary_erode_image_filter,
+            dict(
+                boundary_to_foreground=boundary_to_foreground,
+                background_value=7,
+                **self.kwargs,
+            ),
+        )
+
+    def test_binary_morphological_opening_image_filter(self):
+        self._compare(
+            itk.binary_morphological_opening_image_filter,
+            morphology.cucim_binary_morphological_opening_image_filter,
+            dict(background_value=7, **self.kwargs),
+        )
+
+    @pytest.mark.parametrize("safe_border", [False, True])
+    def test_binary_morphological_closing_image_filter(self, safe_border):
+        self._compare(
+            itk.binary_morphological_closing_image_filter,
+            morphology.cucim_binary_morphological_closing_image_filter,
+            dict(safe_border=safe_border, **self.kwargs),
+        )
+
+    def test_default_kernel_and_values(self):
+        array = np.where(itk.array_view_from_image(self.image) == 200, 255, 0)
+        image = itk.image_view_from_array(array.astype(np.uint8))
+        for itk_filter, cucim_filter in [
+            (itk.binary_dilate_image_filter,
+             morphology.cucim_binary_dilate_image_filter),
+            (itk.binary_erode_image_filter,
+             morphology.cucim_binary_erode_image_filter),
+        ]:
+            np.testing.assert_array_equal(
+                itk_filter(image), cucim_filter(image)
+            )
+
+    def test_ball_3d(self):
+        rng = np.random.default_rng(0)
+        array = np.zeros((40, 48, 44), dtype=np.uint8)
+        array[tuple(rng.integers(0, 40, (3, 12)))] = 1
+        array[15:25, 20:30, 18:40] = 1
+        image = itk.image_view_from_array(array)
+        for radius in [(5, 5, 5), (7, 4, 3)]:
+            kernel = itk.FlatStructuringElement[3].Ball(radius)
+            kwargs = dict(kernel=kernel, foreground_value=1)
+            expected = itk.binary_morphological_closing_image_filter(
+                image, **kwargs
+            )
+            output = morphology.cucim_binary_morphological_closing_image_filter(  # noqa
+                image, **kwargs
+            )
+            np.testing.assert_array_equal(expected, output)
+
+    def test_ball_radius(self):
+        ball = itk.FlatStructuringElement[2].Ball
+        footprint = morphology._kernel_footprint(ball([9, 4]))
+        assert footprint.shape == (9, 19)
+        assert morphology._ball_radius(footprint) == (4, 9)
+        np.testing.assert_array_equal(
+            footprint, morphology._ball_footprint((4, 9))
+        )
+        # small balls and other elements are applied with their footprint
+        assert morphology._ball_radius(
+            morphology._kernel_footprint(ball([2, 2]))
+        ) is None
+        box = itk.FlatStructuringElement[2].Box([5, 5])
+        assert morphology._ball_radius(
+            morphology._kernel_footprint(box)
+        ) is None
+
+    def test_numpy_input(self):
+        array = itk.array_view_from_image(self.image)
+        kernel = itk.FlatStructuringElement[2].Ball([12, 12])
+        expected = itk.binary_dilate_image_filter(
+            self.image, kernel=kernel, **self.kwargs
+        )
+        output = morphology.cucim_binary_dilate_image_filter(
+            array, kernel=kernel, **self.kwargs
+        )
+        assert isinstance(output, np.ndarray)
+        np.testing.assert_array_equal(expected, output)
@@ -0,0 +1,199 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import cache, image_grid, image_statistics, smoothing
+
+
+class TestResultCache:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        # uint8 data
+        self.image = itk.imread(data)
+
+    def _assert_identical(self, expected, result):
+        itk.comparison_image_filter(
+            expected, result, verify_input_information=True
+        )
+        np.testing.assert_array_equal(expected, result)
+        assert type(expected) is type(result)
+        assert tuple(expected.GetSpacing()) == tuple(result.GetSpacing())
+        assert tuple(expected.GetOrigin()) == tuple(result.GetOrigin())
+        np.testing.assert_array_equal(
+            itk.array_from_matrix(expected.GetDirection()),
+            itk.array_from_matrix(result.GetDirection()),
+        )
+        for region in ['LargestPossibleRegion', 'BufferedRegion']:
+            expected_region = getattr(expected, 'Get' + region)()
+            result_region = getattr(result, 'Get' + region)()
+            assert tuple(expected_region.GetIndex()) == tuple(
+                result_region.GetIndex()
+            )
+            assert tuple(expected_region.GetSize()) == tuple(
+                result_region.GetSize()
+            )
+        assert self._metadata(expected) == self._metadata(result)
+
+    @staticmethod
+    def _metadata(image):
+        geometry = {'origin', 'spacing', 'direction'}
+        return {k: v for k, v in dict(image).items() if k not in geometry}
+
+    def test_hit_returns_identical_image(self):
+        result_cache = cache.ResultCache()
+        shrink = result_cache.wrap(image_grid.cucim_bin_shrink_image_filter)
+        first = shrink(self.image, shrink_factors=2)
+        second = shrink(self.image, shrink_factors=2)
+        stats = result_cache.statistics()
+        assert (stats.hits, stats.misses) == (1, 1)
+        self._assert_identical(first, second)
+        # the caller does not share buffers with the cache
+        assert first is not second
+        first[0, 0, 0] = first[0, 0, 0] + 1
+        self._assert_identical(second, shrink(self.image, shrink_factors=2))
+
+    def test_key_depends_on_content_metadata_and_parameters(self):
+        result_cache = cache.ResultCache()
+        f = smoothing.cucim_median_image_filter
+        key = result_cache.key(f, self.image, radius=1)
+        assert key == result_cache.key(f, itk.image_duplicator(self.image),
+                                       radius=1)
+        assert key != result_cache.key(f, self.image, radius=2)
+        assert key != result_cache.key(
+            smoothing.cucim_discrete_gaussian_image_filter, self.image,
+            radius=1,
+        )
+        moved = itk.image_duplicator(self.image)
+        moved.SetOrigin([o + 1 for o in self.image.GetOrigin()])
+        assert key != result_cache.key(f, moved, radius=1)
+        modified = itk.image_duplicator(self.image)
+        modified[0, 0, 0] = modified[0, 0, 0] + 1
+        assert key != result_cache.key(f, modified, radius=1)
+
+    def test_lru_eviction(self):
+        rng = np.random.default_rng()
+        images = [
+            rng.standard_normal((32, 32), dtype=np.float32) for _ in range(3)
+        ]
+        result_cache = cache.ResultCache(max_bytes=2 * images[0].nbytes)
+        median = result_cache.wrap(smoothing.cucim_median_image_filter)
+        median(images[0])
+        median(images[1])
+        median(images[0])  # images[0] becomes the most recently used
+        median(images[2])  # evicts images[1]
+        stats = result_cache.statistics()
+        assert stats.evictions == 1
+        assert stats.entries == 2
+        assert stats.nbytes <= result_cache.max_bytes
+        median(images[0])
+        assert result_cache.statistics().hits == 2
+        median(images[1])
+        assert result_cache.statistics().misses == 4
+
+    def test_disk_spill(self, tmp_path):
+        result_cache = cache.ResultCache(max_bytes=0, directory=tmp_path)
+        shrink = result_cache.wrap(image_grid.cucim_bin_shrink_image_filter)
+        expected = shrink(self.image, shrink_factors=(2, 3, 1))
+        assert result_cache.statistics().entries == 0
+        assert len(list(tmp_path.iterdir())) == 1
+        result = shrink(self.image, shrink_factors=(2, 3, 1))
+        stats = result_cache.statistics()
+        assert (stats.hits, stats.disk_hits) == (1, 1)
+        self._assert_identical(expected, result)
+        result_cache.clear()
+        assert len(list(tmp_path.iterdir())) == 0
+
+    def test_disk_spill_start_index(self, tmp_path):
+        result_cache = cache.ResultCache(max_bytes=0, directory=tmp_path)
+        resample = result_cache.wrap(image_grid.cucim_resample_image_filter)
+        kwargs = dict(
+            size=[40, 30, 20],
+            output_start_index=[2, -3, 1],
+            output_spacing=tuple(self.image.GetSpacing()),
+            output_origin=tuple(self.image.GetOrigin()),
+        )
+        expected = resample(self.image, **kwargs)
+        assert tuple(expected.GetLargestPossibleRegion().GetIndex()) == (
+            2, -3, 1
+        )
+        result = resample(self.image, **kwargs)
+        assert result_cache.statistics().disk_hits == 1
+        self._assert_identical(expected, result)
+
+    def test_disk_spill_nested_images(self, tmp_path):
+        result_cache = cache.ResultCache(max_bytes=0, directory=tmp_path)
+
+        def images_with_metadata(image):
+            shrunk = image_grid.cucim_bin_shrink_image_filter(
+                image, shrink_factors=2
+            )
+            shrunk['Modality'] = 'MR'
+            coarse = image_grid.cucim_bin_shrink_image_filter(
+                image, shrink_factors=3
+            )
+            return {'images': (shrunk, [coarse])}
+
+        cached = result_cache.wrap(images_with_metadata)
+        expected = cached(self.image)
+        result = cached(self.image)
+        assert result_cache.statistics().disk_hits == 1
+        assert result['images'][0]['Modality'] == 'MR'
+        self._assert_identical(expected['images'][0], result['images'][0])
+        self._assert_identical(
+            expected['images'][1][0], result['images'][1][0]
+        )
+
+    def test_uncacheable_arguments_bypass(self):
+        result_cache = cache.ResultCache()
+        median = result_cache.wrap(smoothing.cucim_median_image_filter)
+        radius = itk.Size[3]()
+        radius.Fill(1)
+        median(self.image, radius=radius)
+        median(self.image, radius=radius)
+        stats = result_cache.statistics()
+        assert stats.bypasses == 2
+        assert stats.entries == 0
+
+    def test_hit_returns_identical_statistics(self):
+        result_cache = cache.ResultCache()
+        statistics = result_cache.wrap(
+            image_statistics.cucim_statistics_image_filter
+        )
+        first = statistics(self.image)
+        second = statistics(self.image)
+        assert result_cache.statistics().hits == 1
+        assert type(first) is type(second)
+        assert first == second
+        assert second.mean == first.mean
+
+    def test_hit_returns_independent_label_statistics(self):
+        result_cache = cache.ResultCache()
+        label_statistics = result_cache.wrap(
+            image_statistics.cucim_label_statistics_image_filter
+        )
+        labels = itk.binary_threshold_image_filter(
+            self.image, lower_threshold=50, inside_value=1
+        )
+        first = label_statistics(
+            self.image, label_input=labels, use_histograms=True
+        )
+        second = label_statistics(
+            self.image, label_input=labels, use_histograms=True
+        )
+        assert result_cache.statistics().hits == 1
+        assert type(first) is type(second)
+        assert list(first) == list(second)
+        for label in first:
+            assert type(first[label]) is type(second[label])
+            assert first[label].mean == second[label].mean
+            np.testing.assert_array_equal(
+                first[label].histogram, second[label].histogram
+            )
+        # the caller does not share the histograms with the cache
+        first[1].histogram[:] = 0
+        third = label_statistics(
+            self.image, label_input=labels, use_histograms=True
+        )
+        np.testing.assert_array_equal(third[1].histogram, second[1].histogram)
@@ -58,3 +58,228 @@ class TestDistanceMap:
     def test_signed_maurer_distance_map_image_filter_numpy_input(self):
         image = itk.array_view_from_image(self.image)
         self._compare_signed_maurer_distance(image, squared_distance=False)
+
+    def test_signed_maurer_distance_map_image_filter_object(self):
+        image = itk.image_duplicator(self.image)
+        image.SetSpacing((1.5, 3.3))
+        distance = distance_map.CucimSignedMaurerDistanceMapImageFilter.New(
+            inside_is_positive=True
+        )
+        expected = itk.signed_maurer_distance_map_image_filter(
+            image, inside_is_positive=True
+        )
+        output = distance(image)
+        itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        np.testing.assert_allclose(expected, output, atol=4e-4, rtol=1e-6)
+
+
+class TestDanielssonDistanceMap:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "horse.png"
+        binary_horse = itk.imread(data)[..., 0] > 0
+        # label the features, so that the Voronoi map is not trivial
+        rng = np.random.default_rng(0)
+        labels = binary_horse * rng.integers(1, 5, binary_horse.shape)
+        self.image = itk.image_view_from_array(labels.astype(np.uint8))
+
+    def _reference(self, image, **kwargs):
+        output_type = itk.Image[itk.F, image.GetImageDimension()]
+        ref_filt = itk.DanielssonDistanceMapImageFilter[
+            type(image), output_type
+        ].New(image, **kwargs)
+        ref_filt.Update()
+        return ref_filt.GetOutput(), ref_filt.GetVoronoiMap()
+
+    @pytest.mark.parametrize("input_is_binary", [False, True])
+    @pytest.mark.parametrize("squared_distance", [False, True])
+    @pytest.mark.parametrize("spacing", [None, (1.5, 3.3)])
+    def test_danielsson_distance_map_image_filter(
+        self, spacing, squared_distance, input_is_binary
+    ):
+        image = itk.image_duplicator(self.image)
+        if spacing is not None:
+            image.SetSpacing(spacing)
+        kwargs = dict(
+            squared_distance=squared_distance,
+            input_is_binary=input_is_binary,
+        )
+        distance_ref, voronoi_ref = self._reference(image, **kwargs)
+        distance, voronoi, vectors = (
+            distance_map.cucim_danielsson_distance_map_image_filter(
+                image, **kwargs
+            )
+        )
+        for ref, output in [(distance_ref, distance), (voronoi_ref, voronoi)]:
+            itk.comparison_image_filter(
+                ref, output, verify_input_information=True
+            )
+            assert type(ref) == type(output)
+
+        # Danielsson's algorithm is approximate, while the distances
+        # computed here are exact. Only a small fraction of pixels differ.
+        distance_ref = itk.array_view_from_image(distance_ref)
+        distance = itk.array_view_from_image(distance)
+        assert np.all(distance <= distance_ref * (1 + 1e-5) + 1e-4)
+        assert np.mean(np.abs(distance_ref - distance) < 1e-3) > 0.99
+        # the closest feature is ambiguous where several are equally close
+        assert np.mean(np.asarray(voronoi_ref) == np.asarray(voronoi)) > 0.99
+
+        # the vectors point to the feature giving the distance and label
+        vectors = itk.array_view_from_image(vectors)
+        assert vectors.shape == distance.shape + (2, )
+        spacing = image.GetSpacing()
+        feature_index = np.indices(distance.shape) + np.moveaxis(
+            vectors[..., ::-1].astype(int), -1, 0
+        )
+        labels = itk.array_view_from_image(image)[tuple(feature_index)]
+        if input_is_binary:
+            labels = (labels != 0).astype(labels.dtype)
+        np.testing.assert_array_equal(labels, voronoi)
+        expected = (vectors[..., 0] * spacing[0]) ** 2 + (
+            vectors[..., 1] * spacing[1]
+        ) ** 2
+        if not squared_distance:
+            expected = np.sqrt(expected)
+        np.testing.assert_allclose(distance, expected, atol=1e-4, rtol=1e-5)
+
+    def test_danielsson_distance_map_image_filter_vectors(self):
+        # features with unique closest feature, so vectors match ITK exactly
+        array = np.zeros((5, 7), dtype=np.uint8)
+        array[1, 1] = 3
+        array[3, 6] = 7
+        image = itk.image_view_from_array(array)
+        ref_filt = itk.DanielssonDistanceMapImageFilter[
+            type(image), itk.Image[itk.F, 2]
+        ].New(image)
+        ref_filt.Update()
+        vectors_ref = ref_filt.GetVectorDistanceMap()
+        _, _, vectors = distance_map.cucim_danielsson_distance_map_image_filter(
+            image
+        )
+        for y in range(array.shape[0]):
+            for x in range(array.shape[1]):
+                np.testing.assert_array_equal(
+                    tuple(vectors_ref.GetPixel([x, y])),
+                    tuple(vectors.GetPixel([x, y])),
+                )
+
+    def test_danielsson_distance_map_image_filter_numpy_input(self):
+        array = itk.array_view_from_image(self.image)
+        distance, voronoi, vectors = (
+            distance_map.cucim_danielsson_distance_map_image_filter(
+                array, spacing=(1.5, 3.3)
+            )
+        )
+        assert isinstance(distance, np.ndarray)
+        assert distance.dtype == np.float32
+        assert voronoi.dtype == array.dtype
+        assert vectors.shape == array.shape + (2, )
+        image = itk.image_duplicator(self.image)
+        image.SetSpacing((1.5, 3.3))
+        distance_ref, _ = self._reference(image)
+        distance_ref = itk.array_view_from_image(distance_ref)
+        assert np.mean(np.abs(distance_ref - distance) < 1e-3) > 0.99
+
+
+class TestMultiLabelSignedMaurerDistanceMap:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "horse.png"
+        binary_horse = itk.imread(data)[..., 0] > 0
+        # split the horse into touching labels by quadrant
+        y, x = np.indices(binary_horse.shape)
+        quadrant = 1 + (y > binary_horse.shape[0] // 2) + 2 * (x > 150)
+        labels = binary_horse * quadrant
+        self.labels = (1, 2, 3, 4)
+        self.image = itk.image_view_from_array(labels.astype(np.uint8))
+
+    def _reference(self, image, label, **kwargs):
+        array = itk.array_view_from_image(image)
+        mask = itk.image_view_from_array((array == label).view(np.uint8))
+        mask.CopyInformation(image)
+        return itk.array_from_image(
+            itk.signed_maurer_distance_map_image_filter(mask, **kwargs)
+        )
+
+    @pytest.mark.parametrize("maximum_distance", [None, 12.5])
+    @pytest.mark.parametrize("inside_is_positive", [False, True])
+    @pytest.mark.parametrize("squared_distance", [False, True])
+    @pytest.mark.parametrize("spacing", [None, (1.5, 3.3)])
+    def test_stacked(
+        self, spacing, squared_distance, inside_is_positive, maximum_distance
+    ):
+        image = itk.image_duplicator(self.image)
+        if spacing is not None:
+            image.SetSpacing(spacing)
+        kwargs = dict(
+            squared_distance=squared_distance,
+            inside_is_positive=inside_is_positive,
+        )
+        distance = distance_map.cucim_multi_label_signed_maurer_distance_map_image_filter(  # noqa
+            image, maximum_distance=maximum_distance, **kwargs
+        )
+        assert distance.GetNumberOfComponentsPerPixel() == len(self.labels)
+        assert distance.GetSpacing() == image.GetSpacing()
+        assert distance.GetOrigin() == image.GetOrigin()
+        assert distance.GetDirection() == image.GetDirection()
+        distance = itk.array_view_from_image(distance)
+        assert distance.shape == image.shape + (len(self.labels), )
+        rtol = 1e-4 if squared_distance else 1e-6
+        for i, label in enumerate(self.labels):
+            expected = self._reference(image, label, **kwargs)
+            if maximum_distance is not None:
+                limit = maximum_distance
+                if squared_distance:
+                    limit *= limit
+                expected = np.clip(expected, -limit, limit)
+            np.testing.assert_allclose(
+                expected, distance[..., i], atol=4e-4, rtol=rtol
+            )
+
+    @pytest.mark.parametrize("maximum_distance", [None, 12.5])
+    def test_nearest(self, maximum_distance):
+        image = itk.image_duplicator(self.image)
+        image.SetSpacing((1.5, 3.3))
+        distance = distance_map.cucim_multi_label_signed_maurer_distance_map_image_filter(  # noqa
+            image, maximum_distance=maximum_distance, output='nearest',
+        )
+        assert isinstance(distance, itk.Image[itk.F, 2])
+        array = itk.array_view_from_image(image)
+        expected = np.full(array.shape, np.inf)
+        for label in self.labels:
+            # the outside distance of the signed distance map is the
+            # distance to the closest voxel of the label
+            label_distance = self._reference(image, label)
+            label_distance[array == label] = np.inf
+            expected = np.minimum(expected, label_distance)
+        if maximum_distance is not None:
+            expected = np.minimum(expected, maximum_distance)
+        np.testing.assert_allclose(expected, distance, atol=4e-4, rtol=1e-6)
+
+    def test_labels(self):
+        array = itk.array_view_from_image(self.image)
+        distance = distance_map.cucim_multi_label_signed_maurer_distance_map_image_filter(  # noqa
+            array, labels=[3, 1, 7], maximum_distance=10.0, spacing=(1.5, 3.3)
+        )
+        assert isinstance(distance, np.ndarray)
+        assert distance.dtype == np.float32
+        assert distance.shape == array.shape + (3, )
+        image = itk.image_duplicator(self.image)
+        image.SetSpacing((1.5, 3.3))
+        for i, label in enumerate([3, 1]):
+            expected = np.clip(self._reference(image, label), -10, 10)
+            np.testing.assert_allclose(
+                expected, distance[..., i], atol=4e-4, rtol=1e-6
+            )
+        # labels that do not occur are outside everywhere
+        assert np.all(distance[..., 2] == 10)
+
+    def test_invalid_arguments(self):
+        f = distance_map.cucim_multi_label_signed_maurer_distance_map_image_filter  # noqa
+        with pytest.raises(ValueError):
+            f(self.image, output='unknown')
+        with pytest.raises(ValueError):
+            f(self.image, maximum_distance=0)
+        with pytest.raises(ValueError):
+            f(self.image, labels=[1, 1])
@@ -72,3 +72,15 @@ class TestImageFeatures:
             normalize_across_scale=False,
         )
         self._compare_discrete_gaussian_derivative(image, **kwargs)
+
+    def test_discrete_gaussian_derivative_image_filter_object(self):
+        kwargs = dict(variance=(3, 2, 1), order=(2, 1, 0))
+        derivative = image_feature.CucimDiscreteGaussianDerivativeImageFilter.New(  # noqa
+            self.image_f32, **kwargs
+        )
+        derivative.Update()
+        output = derivative.GetOutput()
+        expected = image_feature.cucim_discrete_gaussian_derivative_image_filter(  # noqa
+            self.image_f32, **kwargs
+        )
+        np.testing.assert_allclose(output, expected, atol=1e-5)
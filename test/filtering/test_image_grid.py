@@ -45,3 +45,142 @@ class TestImageGrid:
         rng = np.random.default_rng()
         image = rng.standard_normal((512, 256), dtype=np.float32)
         self._compare_bin_shrink(image, float_tol=1e-3, shrink_factors=(4, 2))
+
+    @pytest.mark.parametrize("shrink_factors", [2, (4, 3, 2)])
+    def test_bin_shrink_filter_object(self, shrink_factors):
+        shrink = image_grid.CucimBinShrinkImageFilter.New(
+            shrink_factors=shrink_factors
+        )
+        shrink_ref = itk.bin_shrink_image_filter(
+            self.image_f32, shrink_factors=shrink_factors
+        )
+        for _ in range(2):
+            shrink_cucim = shrink(self.image_f32)
+            comparison = itk.comparison_image_filter(
+                shrink_ref, shrink_cucim, verify_input_information=True
+            )
+            assert np.sum(np.abs(comparison)) == 0
+
+    def _resample_image(self, floating):
+        image = self.image_f32 if floating else self.image
+        image = itk.image_from_array(itk.array_from_image(image))
+        image.SetSpacing([0.9, 1.1, 1.7])
+        image.SetOrigin([3.0, -2.0, 5.0])
+        angle = 0.3
+        direction = np.array([
+            [np.cos(angle), -np.sin(angle), 0],
+            [np.sin(angle), np.cos(angle), 0],
+            [0, 0, 1],
+        ])
+        image.SetDirection(itk.matrix_from_array(direction))
+        return image
+
+    def _resample_kwargs(self, image, case):
+        grid = dict(
+            size=list(itk.size(image)),
+            output_spacing=image.GetSpacing(),
+            output_origin=image.GetOrigin(),
+            output_direction=image.GetDirection(),
+        )
+        if case == 'shrink':
+            size = [(s + 1) // 2 for s in itk.size(image)]
+            spacing = [2 * s for s in image.GetSpacing()]
+            return dict(grid, size=size, output_spacing=spacing)
+        if case == 'scale':
+            transform = itk.ScaleTransform[itk.D, 3].New()
+            transform.SetScale([1.2, 0.8, 1.0])
+            transform.SetCenter([10.0, 20.0, 30.0])
+            return dict(
+                grid, transform=transform, output_start_index=[2, -3, 1],
+                default_pixel_value=7,
+            )
+        if case == 'translation':
+            transform = itk.TranslationTransform[itk.D, 3].New()
+            transform.SetOffset([2.5, -1.25, 3.0])
+            return dict(grid, transform=transform)
+        if case == 'euler':
+            transform = itk.Euler3DTransform[itk.D].New()
+            transform.SetRotation(0.1, -0.2, 0.3)
+            transform.SetCenter([20.0, 30.0, 40.0])
+            return dict(grid, transform=transform)
+        if case == 'affine':
+            transform = itk.AffineTransform[itk.D, 3].New()
+            transform.Shear(0, 1, 0.2)
+            transform.Translate([4.0, -3.0, 1.5])
+            # larger than the input
+            size = [s + 10 for s in itk.size(image)]
+            return dict(grid, transform=transform, size=size)
+        return grid
+
+    @pytest.mark.parametrize("floating", [False, True])
+    @pytest.mark.parametrize(
+        "interpolator", [None, 'nearest', 'bspline1', 'bspline3']
+    )
+    @pytest.mark.parametrize(
+        "case", ['identity', 'shrink', 'scale', 'translation', 'euler',
+                 'affine']
+    )
+    def test_resample_filter(self, case, interpolator, floating):
+        if interpolator == 'bspline3' and not floating:
+            pytest.skip("ITK computes the coefficients in the pixel type")
+        image = self._resample_image(floating)
+        kwargs = self._resample_kwargs(image, case)
+        image_type = type(image)
+        if interpolator == 'nearest':
+            nearest = itk.NearestNeighborInterpolateImageFunction[
+                image_type, itk.D
+            ]
+            kwargs['interpolator'] = nearest.New()
+        elif interpolator is not None:
+            coefficient_type = itk.F if floating else itk.UC
+            spline = itk.BSplineInterpolateImageFunction[
+                image_type, itk.D, coefficient_type
+            ].New()
+            spline.SetSplineOrder(int(interpolator[-1]))
+            kwargs['interpolator'] = spline
+        expected = itk.resample_image_filter(image, **kwargs)
+        output = image_grid.cucim_resample_image_filter(image, **kwargs)
+        comparison = itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        if floating:
+            np.testing.assert_allclose(expected, output, rtol=0, atol=1e-3)
+        else:
+            # ITK truncates e.g. 1.999999999999993 to 1
+            assert np.max(comparison) <= 1.0
+
+    def test_resample_filter_numpy_input(self):
+        rng = np.random.default_rng(0)
+        array = rng.standard_normal((64, 48, 40)).astype(np.float32)
+        transform = itk.AffineTransform[itk.D, 3].New()
+        transform.Rotate2D(0.2)
+        transform.Translate([1.5, -2.0, 0.5])
+        kwargs = dict(
+            transform=transform, size=[20, 24, 32],
+            output_spacing=[2.0, 2.0, 2.0], output_origin=[1.0, 3.0, -2.0],
+        )
+        expected = itk.resample_image_filter(
+            itk.image_from_array(array), **kwargs
+        )
+        output = image_grid.cucim_resample_image_filter(array, **kwargs)
+        assert isinstance(output, np.ndarray)
+        assert output.shape == (32, 24, 20)
+        np.testing.assert_allclose(expected, output, rtol=0, atol=1e-4)
+        # the output grid defaults to the input grid
+        shifted = image_grid.cucim_resample_image_filter(
+            array, transform=itk.TranslationTransform[itk.D, 3].New()
+        )
+        np.testing.assert_array_equal(shifted, array)
+
+    def test_resample_filter_not_implemented(self):
+        image = self._resample_image(True)
+        interpolator = itk.GaussianInterpolateImageFunction[
+            type(image), itk.D
+        ].New()
+        with pytest.raises(NotImplementedError):
+            image_grid.cucim_resample_image_filter(
+                image, interpolator=interpolator
+            )
+        transform = itk.BSplineTransform[itk.D, 3, 3].New()
+        with pytest.raises(NotImplementedError):
+            image_grid.cucim_resample_image_filter(image, transform=transform)
@@ -0,0 +1,137 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import image_statistics
+
+
+class TestImageStatistics:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        # uint8 data
+        self.image = itk.imread(data)
+        head = itk.array_from_image(self.image)
+        rng = np.random.default_rng(0)
+        self.images = {
+            'uint8': self.image,
+            'int16': itk.image_from_array(head.astype(np.int16) * 3 - 100),
+            'uint16': itk.image_from_array(head.astype(np.uint16) * 7),
+            'float32': itk.image_from_array(
+                rng.normal(10, 50, (20, 30, 40)).astype(np.float32)
+            ),
+        }
+        labels = rng.integers(0, 3, head.shape).astype(np.uint8) * 2
+        labels[: head.shape[0] // 2] += 1
+        self.labels = itk.image_from_array(labels)
+
+    @pytest.mark.parametrize("dtype", ['uint8', 'int16', 'uint16', 'float32'])
+    def test_minimum_maximum_image_filter(self, dtype):
+        image = self.images[dtype]
+        ref_filt = itk.MinimumMaximumImageFilter.New(image)
+        ref_filt.Update()
+        result = image_statistics.cucim_minimum_maximum_image_filter(image)
+        assert result.minimum == ref_filt.GetMinimum()
+        assert result.maximum == ref_filt.GetMaximum()
+
+    @pytest.mark.parametrize("dtype", ['uint8', 'int16', 'uint16', 'float32'])
+    def test_statistics_image_filter(self, dtype):
+        image = self.images[dtype]
+        ref_filt = itk.StatisticsImageFilter.New(image)
+        ref_filt.Update()
+        result = image_statistics.cucim_statistics_image_filter(image)
+        assert result.minimum == ref_filt.GetMinimum()
+        assert result.maximum == ref_filt.GetMaximum()
+        expected = (
+            ref_filt.GetMean(),
+            ref_filt.GetSigma(),
+            ref_filt.GetVariance(),
+            ref_filt.GetSum(),
+            ref_filt.GetSumOfSquares(),
+        )
+        actual = (
+            result.mean,
+            result.sigma,
+            result.variance,
+            result.sum,
+            result.sum_of_squares,
+        )
+        if dtype == 'float32':
+            # the sums are accumulated in a different order than ITK's
+            np.testing.assert_allclose(actual, expected, rtol=1e-10)
+        else:
+            assert actual == expected
+
+    def test_statistics_image_filter_numpy_input(self):
+        image = itk.array_view_from_image(self.images['int16'])
+        ref_filt = itk.StatisticsImageFilter.New(self.images['int16'])
+        ref_filt.Update()
+        result = image_statistics.cucim_statistics_image_filter(image)
+        assert result.mean == ref_filt.GetMean()
+        assert result.sigma == ref_filt.GetSigma()
+
+    @pytest.mark.parametrize("dtype", ['uint8', 'int16', 'float32'])
+    @pytest.mark.parametrize("use_histograms", [False, True])
+    def test_label_statistics_image_filter(self, dtype, use_histograms):
+        image = self.images[dtype]
+        if dtype == 'float32':
+            image = itk.image_from_array(
+                itk.array_from_image(self.image).astype(np.float32) / 3
+            )
+        kwargs = dict(label_input=self.labels, use_histograms=use_histograms)
+        if use_histograms and dtype != 'uint8':
+            array = itk.array_view_from_image(image)
+            kwargs['histogram_parameters'] = (
+                100, float(array.min()), float(array.max())
+            )
+        ref_filt = itk.LabelStatisticsImageFilter[
+            type(image), type(self.labels)
+        ].New(image, **kwargs)
+        ref_filt.Update()
+        result = image_statistics.cucim_label_statistics_image_filter(
+            image, **kwargs
+        )
+        assert list(result) == sorted(ref_filt.GetValidLabelValues())
+        for label, statistics in result.items():
+            assert statistics.minimum == ref_filt.GetMinimum(label)
+            assert statistics.maximum == ref_filt.GetMaximum(label)
+            assert statistics.count == ref_filt.GetCount(label)
+            assert statistics.median == ref_filt.GetMedian(label)
+            assert statistics.bounding_box == tuple(
+                ref_filt.GetBoundingBox(label)
+            )
+            np.testing.assert_allclose(
+                (statistics.mean, statistics.sigma, statistics.sum),
+                (ref_filt.GetMean(label), ref_filt.GetSigma(label),
+                 ref_filt.GetSum(label)),
+                rtol=1e-10,
+            )
+            if use_histograms:
+                histogram = ref_filt.GetHistogram(label)
+                expected = [
+                    histogram.GetFrequency(i)
+                    for i in range(histogram.GetSize(0))
+                ]
+                np.testing.assert_array_equal(statistics.histogram, expected)
+            else:
+                assert statistics.histogram is None
+
+    def test_label_statistics_image_filter_numpy_input(self):
+        image = itk.array_view_from_image(self.image)
+        labels = itk.array_view_from_image(self.labels)
+        ref_filt = itk.LabelStatisticsImageFilter[
+            type(self.image), type(self.labels)
+        ].New(self.image, label_input=self.labels)
+        ref_filt.Update()
+        result = image_statistics.cucim_label_statistics_image_filter(
+            image, label_input=labels
+        )
+        assert list(result) == sorted(ref_filt.GetValidLabelValues())
+        for label, statistics in result.items():
+            assert statistics.count == ref_filt.GetCount(label)
+            assert statistics.sum == ref_filt.GetSum(label)
+
+    def test_label_statistics_image_filter_requires_labels(self):
+        with pytest.raises(ValueError):
+            image_statistics.cucim_label_statistics_image_filter(self.image)
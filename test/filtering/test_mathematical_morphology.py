@@ -0,0 +1,129 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import mathematical_morphology as morphology
+
+
+class TestMathematicalMorphology:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        # uint8 data
+        image_u8 = itk.imread(data)
+        self.image = image_u8
+
+        Caster = itk.CastImageFilter[itk.itkImagePython.itkImageUC3,
+                                     itk.itkImagePython.itkImageF3].New()
+        # float32 data
+        self.image_f32 = Caster(image_u8)
+
+    def _kernels(self):
+        se = itk.FlatStructuringElement[3]
+        return [
+            None,
+            se.Box([3, 2, 1]),
+            se.Box([8, 8, 8]),
+            # larger than the image along y and z
+            se.Box([5, 40, 30]),
+            se.Ball([2, 2, 2]),
+            se.Cross([2, 2, 2]),
+        ]
+
+    def _compare(self, itk_filter, cucim_filter, floating, **kwargs):
+        image = self.image_f32 if floating else self.image
+        for kernel in self._kernels():
+            if kernel is not None:
+                kwargs['kernel'] = kernel
+            expected = itk_filter(image, **kwargs)
+            output = cucim_filter(image, **kwargs)
+            comparison = itk.comparison_image_filter(
+                expected, output, verify_input_information=True
+            )
+            assert np.sum(comparison) == 0.0
+
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_grayscale_erode_image_filter(self, floating):
+        self._compare(
+            itk.grayscale_erode_image_filter,
+            morphology.cucim_grayscale_erode_image_filter,
+            floating,
+        )
+
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_grayscale_dilate_image_filter(self, floating):
+        self._compare(
+            itk.grayscale_dilate_image_filter,
+            morphology.cucim_grayscale_dilate_image_filter,
+            floating,
+        )
+
+    def test_boundary(self):
+        self._compare(
+            itk.grayscale_erode_image_filter,
+            morphology.cucim_grayscale_erode_image_filter,
+            False, boundary=10,
+        )
+        self._compare(
+            itk.grayscale_dilate_image_filter,
+            morphology.cucim_grayscale_dilate_image_filter,
+            False, boundary=200,
+        )
+
+    @pytest.mark.parametrize("safe_border", [False, True])
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_grayscale_morphological_opening_image_filter(
+        self, floating, safe_border
+    ):
+        self._compare(
+            itk.grayscale_morphological_opening_image_filter,
+            morphology.cucim_grayscale_morphological_opening_image_filter,
+            floating, safe_border=safe_border,
+        )
+
+    @pytest.mark.parametrize("safe_border", [False, True])
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_grayscale_morphological_closing_image_filter(
+        self, floating, safe_border
+    ):
+        self._compare(
+            itk.grayscale_morphological_closing_image_filter,
+            morphology.cucim_grayscale_morphological_closing_image_filter,
+            floating, safe_border=safe_border,
+        )
+
+    def test_numpy_input(self):
+        array = itk.array_view_from_image(self.image)
+        kernel = itk.FlatStructuringElement[3].Box([4, 3, 2])
+        expected = itk.grayscale_dilate_image_filter(self.image, kernel=kernel)
+        output = morphology.cucim_grayscale_dilate_image_filter(
+            array, kernel=kernel
+        )
+        assert isinstance(output, np.ndarray)
+        np.testing.assert_array_equal(expected, output)
+
+    @pytest.mark.parametrize("radius", [(0, 1, 2), (5, 5, 5), (20, 3, 70)])
+    def test_van_herk_gil_werman(self, radius):
+        import cupy as cp
+        import cupyx.scipy.ndimage as ndi
+
+        from itk_cucim.filtering import _van_herk_gil_werman
+
+        rng = np.random.default_rng(0)
+        image = cp.asarray(rng.integers(-1000, 1000, (31, 17, 64), np.int16))
+        size = [2 * r + 1 for r in radius]
+        cp.testing.assert_array_equal(
+            _van_herk_gil_werman.minimum_filter(image, radius),
+            ndi.minimum_filter(image, size=size, mode='nearest'),
+        )
+        cp.testing.assert_array_equal(
+            _van_herk_gil_werman.maximum_filter(image, radius),
+            ndi.maximum_filter(image, size=size, mode='nearest'),
+        )
+        # in place
+        output = image.copy()
+        _van_herk_gil_werman.minimum_filter(output, radius, output=output)
+        cp.testing.assert_array_equal(
+            output, ndi.minimum_filter(image, size=size, mode='nearest')
+        )
@@ -0,0 +1,153 @@
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import (
+    distance_map,
+    image_feature,
+    image_grid,
+    scratch,
+    smoothing,
+)
+
+
+class TestScratchPool:
+    def setup_class(self):
+        rng = np.random.default_rng(0)
+        array = rng.normal(100, 20, (64, 96, 128)).astype(np.float32)
+        self.image = itk.image_from_array(array)
+        self.image.SetSpacing([0.8, 1.0, 1.5])
+
+    @pytest.fixture
+    def pool(self, monkeypatch):
+        # a single strategy per operation, as the FFT strategies of the
+        # autotuner allocate their own work areas
+        monkeypatch.setenv('ITK_CUCIM_AUTOTUNE', '0')
+        pool = scratch.ScratchPool()
+        scratch.set_scratch_pool(pool)
+        yield pool
+        scratch.set_scratch_pool(None)
+
+    def test_reuse(self):
+        import cupy as cp
+
+        pool = scratch.ScratchPool()
+        a = pool.empty((100, 1000), np.float32)
+        assert a.shape == (100, 1000) and a.dtype == np.float32
+        pointer = a.data.ptr
+        pool.release(a)
+        # same bucket, different shape and dtype
+        b = pool.empty((420, 250), np.float32)
+        assert b.data.ptr == pointer
+        c = pool.empty((100, 1000), np.float32)
+        assert c.data.ptr != pointer
+        pool.release(b, c, cp.empty(10))
+        stats = pool.statistics()
+        assert (stats.acquisitions, stats.reuses, stats.allocations) == (
+            3, 1, 2
+        )
+        assert stats.reuse_rate == pytest.approx(1 / 3)
+        assert stats.in_use_nbytes == 0
+        assert stats.peak_nbytes == stats.nbytes >= 2 * a.nbytes
+        pool.clear()
+        assert pool.statistics().nbytes == 0
+
+    def test_scope_and_asarray(self):
+        pool = scratch.ScratchPool()
+        array = np.arange(100000, dtype=np.int32)
+        with pool.scope() as buffers:
+            device_array = buffers.asarray(array)
+            assert buffers.asarray(device_array) is device_array
+            np.testing.assert_array_equal(device_array.get(), array)
+            assert pool.statistics().in_use_nbytes >= array.nbytes
+        assert pool.statistics().in_use_nbytes == 0
+
+    def test_memory_cap(self):
+        pool = scratch.ScratchPool(max_bytes=3 << 20)
+        a = pool.empty(1 << 20, np.uint8)
+        b = pool.empty(1 << 20, np.uint8)
+        # exceeds the cap: allocated outside of the pool
+        c = pool.empty(2 << 20, np.uint8)
+        assert pool.statistics().overflows == 1
+        pool.release(a, b, c)
+        # the free buffers are trimmed to make room
+        d = pool.empty(2 << 20, np.uint8)
+        stats = pool.statistics()
+        assert stats.overflows == 1
+        assert stats.nbytes <= pool.max_bytes
+        pool.release(d)
+
+    def _count_large_allocations(self, func, min_nbytes):
+        import cupy as cp
+
+        class MallocCounter(cp.cuda.MemoryHook):
+            name = 'MallocCounter'
+
+            def __init__(self):
+                self.count = 0
+
+            def malloc_preprocess(self, **kwargs):
+                if kwargs['size'] >= min_nbytes:
+                    self.count += 1
+
+        with MallocCounter() as counter:
+            func()
+        return counter.count
+
+    @pytest.mark.parametrize("name", [
+        'discrete_gaussian', 'discrete_gaussian_derivative',
+        'resample_separable', 'resample_affine',
+    ])
+    def test_no_large_allocations_after_warm_up(self, pool, name):
+        image = self.image
+        if name == 'discrete_gaussian':
+            def func():
+                smoothing.cucim_discrete_gaussian_image_filter(
+                    image, variance=[4.0, 2.0, 1.0]
+                )
+        elif name == 'discrete_gaussian_derivative':
+            def func():
+                image_feature.cucim_discrete_gaussian_derivative_image_filter(  # noqa
+                    image, variance=2.0, order=[1, 0, 1]
+                )
+        elif name == 'resample_separable':
+            def func():
+                image_grid.cucim_resample_image_filter(
+                    image, size=[64, 48, 32], output_spacing=[1.6, 2.0, 3.0],
+                    output_origin=[0.3, 0.2, 0.1],
+                )
+        else:
+            transform = itk.Euler3DTransform[itk.D].New()
+            transform.SetRotation(0.1, 0.0, 0.2)
+
+            def func():
+                image_grid.cucim_resample_image_filter(
+                    image, transform=transform, size=[128, 96, 64],
+                    output_spacing=image.GetSpacing(),
+                )
+        input_nbytes = itk.array_view_from_image(self.image).nbytes
+        func()
+        warm = pool.statistics()
+        for _ in range(3):
+            assert self._count_large_allocations(func, input_nbytes // 8) == 0
+        stats = pool.statistics()
+        assert stats.allocations == warm.allocations
+        assert stats.reuses > warm.reuses
+
+    def test_results_do_not_alias_the_pool(self, pool):
+        array = itk.array_from_image(self.image)
+        first = image_grid.cucim_resample_image_filter(
+            array, size=[64, 48, 32], output_spacing=[2.0, 2.0, 2.0]
+        )
+        expected = first.copy()
+        image_grid.cucim_resample_image_filter(
+            array + 1, size=[64, 48, 32], output_spacing=[2.0, 2.0, 2.0]
+        )
+        np.testing.assert_array_equal(first, expected)
+        binary = (array > 100).astype(np.uint8)
+        distances = distance_map.cucim_signed_maurer_distance_map_image_filter(
+            binary
+        )
+        expected = distances.copy()
+        distance_map.cucim_signed_maurer_distance_map_image_filter(1 - binary)
+        np.testing.assert_array_equal(distances, expected)
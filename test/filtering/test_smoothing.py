@@ -83,3 +83,124 @@ class TestSmoothing:
             use_image_spacing=False,
         )
         self._compare_discrete_gaussian(image, **kwargs)
+
+    def _head_mask(self):
+        image_array = itk.array_view_from_image(self.image)
+        mask = np.zeros(image_array.shape, dtype=np.uint8)
+        center = tuple(s // 2 for s in image_array.shape)
+        mask[tuple(slice(c - 8, c + 8) for c in center)] = 1
+        return mask
+
+    @pytest.mark.parametrize("floating", [False, True])
+    def test_discrete_gaussian_image_filter_mask(self, floating):
+        if floating:
+            image = self.image_f32
+        else:
+            image = self.image
+        mask = self._head_mask()
+        kwargs = dict(variance=4, use_image_spacing=False)
+        gaussian_full = smoothing.cucim_discrete_gaussian_image_filter(
+            image, **kwargs
+        )
+        gaussian_masked = smoothing.cucim_discrete_gaussian_image_filter(
+            image, mask=mask, **kwargs
+        )
+        itk.comparison_image_filter(
+            gaussian_full, gaussian_masked, verify_input_information=True
+        )
+        inside = mask.view(bool)
+        np.testing.assert_array_equal(
+            np.asarray(gaussian_masked)[inside],
+            np.asarray(gaussian_full)[inside],
+        )
+        np.testing.assert_array_equal(
+            np.asarray(gaussian_masked)[~inside], np.asarray(image)[~inside]
+        )
+
+    def test_discrete_gaussian_image_filter_normalized_convolution(self):
+        mask = self._head_mask()
+        image_array = np.full(mask.shape, 100.0, dtype=np.float32)
+        # voxels outside of the mask must not bleed into the result
+        image_array[mask == 0] = 1000.0
+        image = itk.image_view_from_array(image_array)
+        smoothed = smoothing.cucim_discrete_gaussian_image_filter(
+            image, variance=4, mask=mask, normalized_convolution=True,
+        )
+        inside = mask.view(bool)
+        np.testing.assert_allclose(
+            np.asarray(smoothed)[inside], 100.0, rtol=1e-5
+        )
+
+    def test_discrete_gaussian_image_filter_normalized_convolution_cast(self):
+        # integer results are truncated, as on the other paths
+        mask = self._head_mask()
+        kwargs = dict(variance=4, mask=mask, normalized_convolution=True)
+        smoothed = smoothing.cucim_discrete_gaussian_image_filter(
+            self.image, **kwargs
+        )
+        smoothed_f32 = smoothing.cucim_discrete_gaussian_image_filter(
+            self.image_f32, **kwargs
+        )
+        inside = mask.view(bool)
+        np.testing.assert_array_equal(
+            np.asarray(smoothed)[inside],
+            np.asarray(smoothed_f32)[inside].astype(np.uint8),
+        )
+
+    def test_discrete_gaussian_image_filter_normalized_requires_mask(self):
+        with pytest.raises(ValueError):
+            smoothing.cucim_discrete_gaussian_image_filter(
+                self.image_f32, variance=4, normalized_convolution=True,
+            )
+
+    def test_median_image_filter_mask(self):
+        mask = self._head_mask()
+        median_full = smoothing.cucim_median_image_filter(
+            self.image, radius=2
+        )
+        median_masked = smoothing.cucim_median_image_filter(
+            self.image, radius=2, mask=mask
+        )
+        inside = mask.view(bool)
+        np.testing.assert_array_equal(
+            np.asarray(median_masked)[inside],
+            np.asarray(median_full)[inside],
+        )
+        np.testing.assert_array_equal(
+            np.asarray(median_masked)[~inside],
+            np.asarray(self.image)[~inside],
+        )
+
+    def test_discrete_gaussian_image_filter_object(self):
+        smoother = smoothing.CucimDiscreteGaussianImageFilter.New(variance=4)
+        expected = smoothing.cucim_discrete_gaussian_image_filter(
+            self.image_f32, variance=4
+        )
+        output = smoother(self.image_f32)
+        itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        np.testing.assert_allclose(output, expected, atol=1e-5)
+
+        # state and output image are reused for same-shaped inputs
+        state = smoother._state
+        assert smoother(self.image_f32) is output
+        assert smoother._state is state
+
+        # changing a parameter invalidates the derived state
+        smoother.SetVariance((3, 2, 1))
+        assert smoother.GetVariance() == (3, 2, 1)
+        expected = smoothing.cucim_discrete_gaussian_image_filter(
+            self.image_f32, variance=(3, 2, 1)
+        )
+        output = smoother(self.image_f32)
+        assert smoother._state is not state
+        np.testing.assert_allclose(output, expected, atol=1e-5)
+
+    def test_median_image_filter_object_numpy_input(self):
+        rng = np.random.default_rng()
+        median = smoothing.CucimMedianImageFilter.New(radius=2)
+        for shape in [(64, 32), (64, 32), (16, 48)]:
+            image = rng.standard_normal(shape, dtype=np.float32)
+            expected = smoothing.cucim_median_image_filter(image, radius=2)
+            np.testing.assert_array_equal(median(image), expected)
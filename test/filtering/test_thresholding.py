@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import itk
+import numpy as np
+import pytest
+
+from itk_cucim.filtering import thresholding
+
+
+class TestOtsuThreshold:
+    def setup_class(self):
+        data = Path(__file__).absolute().parent.parent / "input" / "head_mr.mha"
+        # uint8 data
+        self.image = itk.imread(data)
+        head = itk.array_from_image(self.image)
+        rng = np.random.default_rng(0)
+        self.images = {
+            'uint8': self.image,
+            'int16': itk.image_from_array(head.astype(np.int16) * 3 - 100),
+            'uint16': itk.image_from_array(head.astype(np.uint16) * 7),
+            'float32': itk.image_from_array(head.astype(np.float32) / 3),
+            'float64': itk.image_from_array(
+                rng.gamma(2.0, 1000.0, (30, 40, 50))
+            ),
+        }
+
+    @pytest.mark.parametrize(
+        "dtype", ['uint8', 'int16', 'uint16', 'float32', 'float64']
+    )
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {},
+            dict(number_of_histogram_bins=64),
+            dict(return_bin_midpoint=True),
+            dict(inside_value=1, outside_value=2),
+        ],
+    )
+    def test_otsu_threshold_image_filter(self, dtype, kwargs):
+        image = self.images[dtype]
+        expected = itk.otsu_threshold_image_filter(image, **kwargs)
+        output = thresholding.cucim_otsu_threshold_image_filter(
+            image, **kwargs
+        )
+        assert type(output) == type(expected)
+        itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        np.testing.assert_array_equal(expected, output)
+
+    def test_otsu_threshold_image_filter_numpy_input(self):
+        image = itk.array_view_from_image(self.images['int16'])
+        expected = itk.otsu_threshold_image_filter(self.images['int16'])
+        output = thresholding.cucim_otsu_threshold_image_filter(image)
+        assert output.dtype == np.int16
+        np.testing.assert_array_equal(expected, output)
+
+    @pytest.mark.parametrize("dtype", ['uint8', 'int16', 'float32'])
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {},
+            dict(mask_output=False),
+            dict(mask_value=1, inside_value=1, outside_value=2),
+        ],
+    )
+    def test_otsu_threshold_image_filter_mask(self, dtype, kwargs):
+        image = self.images[dtype]
+        head = itk.array_view_from_image(self.image)
+        # the mask is of the output pixel type, with the default mask
+        # value, another nonzero value and zeros
+        output_dtype = np.uint8 if dtype == 'uint8' else np.int16
+        mask = np.where(head > 40, np.iinfo(output_dtype).max, 0)
+        mask[: head.shape[0] // 3] = 1
+        mask = itk.image_from_array(mask.astype(output_dtype))
+        mask.CopyInformation(image)
+        expected = itk.otsu_threshold_image_filter(
+            image, mask_image=mask, **kwargs
+        )
+        output = thresholding.cucim_otsu_threshold_image_filter(
+            image, mask_image=mask, **kwargs
+        )
+        itk.comparison_image_filter(
+            expected, output, verify_input_information=True
+        )
+        np.testing.assert_array_equal(expected, output)
+
+    def test_otsu_threshold_image_filter_mask_numpy_input(self):
+        mask = itk.binary_threshold_image_filter(
+            self.image, lower_threshold=10
+        )
+        expected = itk.otsu_threshold_image_filter(
+            self.image, mask_image=mask
+        )
+        output = thresholding.cucim_otsu_threshold_image_filter(
+            itk.array_view_from_image(self.image),
+            mask_image=itk.array_view_from_image(mask),
+        )
+        np.testing.assert_array_equal(expected, output)
+
+    @pytest.mark.parametrize("dtype", ['uint8', 'float32'])
+    def test_otsu_threshold_image_filter_object(self, dtype):
+        image = self.images[dtype]
+        ref_filt = itk.OtsuThresholdImageFilter.New(image)
+        ref_filt.Update()
+        otsu = thresholding.CucimOtsuThresholdImageFilter.New()
+        for _ in range(2):
+            output = otsu(image)
+            assert otsu.GetThreshold() == ref_filt.GetThreshold()
+            itk.comparison_image_filter(
+                ref_filt.GetOutput(), output, verify_input_information=True
+            )
+            np.testing.assert_array_equal(ref_filt.GetOutput(), output)